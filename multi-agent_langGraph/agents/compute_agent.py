@@ -1,13 +1,27 @@
 import os
-import re
+import asyncio
+import operator
+import threading
 import pandas as pd
-from tqdm import tqdm
 
-from typing import TypedDict, List, Set, Optional
+from typing import TypedDict, List, Dict, Optional, Annotated, Callable
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 
 from agents.process_agent import ProcessAgent
 from agents.evaluator_agent import EvaluatorAgent
+from agents.llm_cache import llm_cache_scope
+from agents.output_parser import output_failure_scope
+from agents.instrumentation import instrumentation
+from agents.result_store import FileResultStore, pipeline_signature
+from boq.cache import ParsedFileCache, LoadedFrameCache
+from boq.corpus import CorpusStore
+from boq.datasets import DatasetRegistry, DatasetHandle
+from boq.stats import CostSketch, cost_statistics, DEFAULT_TRIM
+from boq.index import get_record_index
+
+# 파일별 결과의 계산 방식이 바뀌면 올려서 결과 저장소의 기존 결과를 무효화 (2: 비용의 천 단위 구분자 처리)
+RESULT_VERSION = 2
 
 # state 데이터 관리
 class ComputeState(TypedDict):
@@ -17,142 +31,441 @@ class ComputeState(TypedDict):
     data_dir: str
     current_file_index: int
 
-    all_item_costs: List[int]
-    files_with_data: Set[str]
-    # current_file_index: int
-    # total_cost: int
-    # total_item_count: int
-    
-    current_data: Optional[pd.DataFrame]
+    # 순차 모드에서 처리 중인 파일의 데이터셋 핸들 (데이터프레임은 DatasetRegistry에서 꺼냄)
+    current_dataset: Optional[DatasetHandle]
     candidates: Optional[List[dict]]
     validated_processes: Optional[List[dict]]
+    # 처리 중인 파일에서 교정 요청 후에도 읽지 못한 LLM 응답이 있었는지 (있으면 결과를 저장하지 않음)
+    output_failed: Optional[bool]
+    # 최종 비용 통계 (boq.stats.cost_statistics 결과: overall, projects)
+    cost_stats: Optional[dict]
+
+    # 파일별 처리 결과 (비용 포함). map-reduce 작업들과 순차 루프의 각 단계가 덧붙이기만 하는 누적 리스트
+    file_results: Annotated[List[dict], operator.add]
+
+    # 결과 저장소에 결과가 없어 새로 처리할 파일들, 파일별 내용 해시, 파이프라인 설정 해시
+    pending_files: List[str]
+    file_hashes: Dict[str, str]
+    signature: Optional[str]
     
     final_result: str
 
+# map-reduce 모드에서 파일 하나를 처리하는 작업 단위의 입력
+class FileTaskState(TypedDict):
+    original_query: str
+    target_process_name: str
+    data_dir: str
+    file_name: str
+    content_hash: Optional[str]
+    signature: Optional[str]
+
+def format_cost_result(target_process_name: str, total_item_count: int, total_cost: float, num_files_with_data: int,
+                       stats: Optional[dict] = None) -> str:
+    """stats(describe_costs 형식)가 주어지면 중앙값, P10~P90, 절사 평균, 최소/최대도 함께 표시"""
+    if not total_item_count:
+        return f"분석 결과, '{target_process_name}'에 대한 유효한 비용 데이터를 찾을 수 없습니다."
+    average_cost = total_cost / total_item_count
+    result = (
+        f"'{target_process_name}'에 대한 비용 분석 결과:\n"
+        f" - 총 {num_files_with_data}개 프로젝트(파일)에서 관련 데이터 발견\n"
+        f" - 분석된 총 유효 공종(다리 등) 수: {total_item_count}개\n"
+        f" - 평균 비용: {average_cost:,.0f}원"
+    )
+    if stats:
+        result += (
+            f"\n - 중앙값: {stats['median']:,.0f}원 (P10 {stats['p10']:,.0f}원 ~ P90 {stats['p90']:,.0f}원)\n"
+            f" - 절사 평균(상하위 {stats['trim']:.0%} 제외): {stats['trimmed_mean']:,.0f}원\n"
+            f" - 최소/최대: {stats['min']:,.0f}원 / {stats['max']:,.0f}원"
+        )
+        if stats['outliers_removed']:
+            result += f"\n - 이상치로 제외한 공종: {stats['outliers_removed']}개"
+    return result
+
+class CostProgress:
+    """
+    스트리밍 실행 시 파일 처리가 끝날 때마다 누적 통계를 갱신하는 집계기
+    snapshot()은 JSON으로 저장할 수 있는 dict(cost_progress 이벤트)를 반환
+    비용은 CostSketch로 누적하므로 공종 수와 관계없이 메모리가 일정함 (중앙값은 추정치)
+    """
+    def __init__(self, target_process_name: str, files_total: int):
+        self.target_process_name = target_process_name
+        self.files_total = files_total
+        self.files_processed = []
+        self.files_with_data = []
+        self.files_reused = 0
+        self.costs = CostSketch()
+
+    def add(self, file_result: dict) -> dict:
+        self.files_processed.append(file_result['file_name'])
+        if file_result.get('reused'):
+            self.files_reused += 1
+        if file_result['validated_processes']:
+            self.files_with_data.append(file_result['file_name'])
+        self.costs.add(file_result['costs'])
+        return self.snapshot()
+
+    def snapshot(self) -> dict:
+        item_count = self.costs.count
+        total_cost = self.costs.sum
+        return {
+            "event": "cost_progress",
+            "target_process_name": self.target_process_name,
+            "files_done": len(self.files_processed),
+            "files_total": self.files_total,
+            "last_file": self.files_processed[-1] if self.files_processed else None,
+            "files_processed": list(self.files_processed),
+            "files_with_data": list(self.files_with_data),
+            "files_reused": self.files_reused,
+            "item_count": item_count,
+            "total_cost": total_cost,
+            "running_mean": total_cost / item_count if item_count else None,
+            "running_median": self.costs.summary()['median'],
+        }
+
+def format_progress(update: dict) -> str:
+    """cost_progress 이벤트를 한 줄로 표시"""
+    mean = f"{update['running_mean']:,.0f}원" if update['running_mean'] is not None else "-"
+    median = f", 중앙값 약 {update['running_median']:,.0f}원" if update.get('running_median') is not None else ""
+    reused = f", 저장된 결과 재사용 {update['files_reused']}개" if update.get('files_reused') else ""
+    return (f"[진행 {update['files_done']}/{update['files_total']}] {update['last_file']} 완료 "
+            f"-> 누적 공종 {update['item_count']}개, 누적 평균 {mean}{median} "
+            f"(데이터 발견 파일 {len(update['files_with_data'])}개{reused})")
+
+def summarize_progress(update: Optional[dict]) -> str:
+    """중단된 실행의 마지막 cost_progress 이벤트로 부분 결과를 만듦"""
+    if not update:
+        return "처리가 끝난 파일이 없어 부분 결과가 없습니다."
+    result = format_cost_result(update['target_process_name'], update['item_count'], update['total_cost'],
+                                len(update['files_with_data']))
+    return f"{result}\n (중단됨: 전체 {update['files_total']}개 파일 중 {update['files_done']}개까지의 부분 결과)"
+
 class ComputeAgent:
-    def __init__(self, process_agent: ProcessAgent, evaluator_agent: EvaluatorAgent):
+    """
+    여러 파일에 걸쳐 특정 공종의 비용을 분석하는 서브그래프를 관리하는 에이전트
+    mode="map_reduce"(기본값)는 파일들을 최대 max_concurrency개씩 동시에 처리하고,
+    mode="sequential"은 파일을 하나씩 순회하는 기존 루프 방식으로 처리
+    parsed_cache가 주어지면 파일 로딩 시 디스크 파싱 캐시를 사용
+    result_store가 주어지면 파일별 결과를 (내용 해시, 공종명) 단위로 저장해 두고, 새 파일이나 바뀐 파일만 처리
+    corpus가 주어지면 코퍼스에 적재된 파일은 코퍼스에서 바로 읽고, 후보 공종이 없는 파일은 LLM 호출 전에 제외
+    data_cache가 주어지면 로딩한 데이터프레임을 (Orchestrator와 공유하는) 메모리 캐시에 보관
+    datasets가 주어지면 위의 캐시들 대신 해당 데이터셋 레지스트리(Orchestrator.datasets)로 파일을 읽음
+    최종 통계의 절사 평균은 위/아래 trim 비율을 제외하고, outlier_k를 주면 Tukey 울타리(k*IQR) 밖의 비용을 이상치로 제외
+    """
+    def __init__(self, process_agent: ProcessAgent, evaluator_agent: EvaluatorAgent,
+                 mode: str = "map_reduce", max_concurrency: int = 4,
+                 parsed_cache: Optional[ParsedFileCache] = None,
+                 result_store: Optional[FileResultStore] = None,
+                 corpus: Optional[CorpusStore] = None,
+                 data_cache: Optional[LoadedFrameCache] = None,
+                 datasets: Optional[DatasetRegistry] = None,
+                 trim: float = DEFAULT_TRIM, outlier_k: Optional[float] = None):
+        if mode not in ("map_reduce", "sequential"):
+            raise ValueError(f"지원하지 않는 ComputeAgent 모드입니다: {mode}")
         self.process_agent = process_agent
         self.evaluator_agent = evaluator_agent
-        self.graph = self._create_graph()
+        self.mode = mode
+        self.max_concurrency = max_concurrency
+        self.parsed_cache = parsed_cache
+        self.result_store = result_store
+        self.corpus = corpus
+        self.datasets = datasets if datasets is not None else DatasetRegistry(parsed_cache, corpus, data_cache)
+        self.trim = trim
+        self.outlier_k = outlier_k
+        # 서브그래프는 처음 실행할 때 컴파일 (세부 공종 추출만 하는 실행은 컴파일하지 않음)
+        self._graph = None
+        self._graph_lock = threading.Lock()
+
+    @property
+    def graph(self):
+        """컴파일된 서브그래프 (처음 접근할 때 컴파일)"""
+        with self._graph_lock:
+            if self._graph is None:
+                self._graph = self._create_graph()
+            return self._graph
 
-    def _load_and_parse_data(self, file_path: str) -> pd.DataFrame:
-        records = []
+    def _open_dataset(self, file_path: str, content_hash: Optional[str] = None) -> Optional[DatasetHandle]:
+        # 시작 단계에서 구한 내용 해시로 열어, 그 사이 원본이 바뀌었으면 결과를 다른 내용으로 저장하지 않도록 함
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line: continue
-                    
-                    parts = line.split(':', 1)
-                    if len(parts) != 2: continue
-                    record_id = parts[0].strip()
-                    
-                    rest_parts = parts[1].split(';')
-                    
-                    process_name = rest_parts[0].strip() if len(rest_parts) > 0 else "None"
-                    spec = rest_parts[1].strip() if len(rest_parts) > 1 else "None"
-                    total_cost = rest_parts[2].strip()
-                    
-                    records.append({
-                        'record': record_id, 
-                        '공종명': process_name, 
-                        'spec': spec,
-                        'total_cost': total_cost
-                    })
-            return pd.DataFrame(records)
+            return self.datasets.open(file_path, content_hash)
         except Exception as e:
             print(f" -> 파일 파싱 오류: {os.path.basename(file_path)} 처리 중 오류 발생 - {e}")
+            return None
+
+    def _dataset_frame(self, handle: Optional[DatasetHandle]) -> pd.DataFrame:
+        # 로딩에 실패한 파일(핸들 없음)은 빈 데이터프레임으로 처리
+        if handle is None:
             return pd.DataFrame()
+        return self.datasets.resolve(handle)
+
+    def _signature(self) -> str:
+        """파일별 결과에 영향을 주는 설정(모델, 후보 탐색 방식)의 해시. 설정이 바뀌면 저장된 결과를 쓰지 않음"""
+        agent = self.process_agent
+        return pipeline_signature(
+            version=RESULT_VERSION,
+            llm=getattr(agent.llm, "_identifying_params", type(agent.llm).__name__),
+            search_mode=agent.search_mode,
+            top_k=agent.top_k,
+            start_levels=agent.start_levels,
+            max_levels=agent.max_levels,
+            max_prompt_tokens=agent.max_prompt_tokens,
+            chunk_tokens=agent.chunk_tokens,
+            prompt_layout=(agent.prompt_layout, self.evaluator_agent.prompt_layout),
+            json_mode=(agent.json_mode, self.evaluator_agent.json_mode),
+        )
 
     def _start_computation(self, state: ComputeState) -> ComputeState:
         print("--- Compute Subgraph: 계산 시작 ---")
-        return {
+        update = {
             "current_file_index": 0,
-            "total_cost": 0,
-            "total_item_count": 0,
-            "files_with_data": set(),
+            "pending_files": list(state['available_files']),
+            "file_hashes": {},
+            "signature": None,
         }
+        if self.result_store is None and self.corpus is None:
+            return update
+
+        # 내용이 같은 파일은 이전 실행의 결과를 그대로 쓰고, 새 파일이나 바뀐 파일만 처리 대상으로 남김
+        signature = self._signature() if self.result_store is not None else None
+        reused, skipped, pending, file_hashes = [], [], [], {}
+        for file_name in state['available_files']:
+            try:
+                content_hash = self.datasets.content_hash(os.path.join(state['data_dir'], file_name))
+            except OSError:
+                # 읽을 수 없는 파일은 처리 단계에서 기존과 같이 오류를 출력하도록 그대로 넘김
+                pending.append(file_name)
+                continue
+            file_hashes[file_name] = content_hash
+            stored = self.result_store.get(content_hash, state['target_process_name'], signature) if self.result_store is not None else None
+            if stored is not None:
+                reused.append({"file_name": file_name, **stored, "reused": True})
+            elif self.corpus is not None and self.corpus.has_candidates(file_name, content_hash) is False:
+                # 코퍼스에서 깊이 1~4의 공종이 하나도 없는 것으로 확인된 파일(빈 파일 등)은 불러오지 않고 빈 결과로 처리
+                skipped.append({"file_name": file_name, "validated_processes": [], "costs": []})
+            else:
+                pending.append(file_name)
+        print(f" -> 저장된 결과 {len(reused)}개 재사용, 후보 공종이 없는 파일 {len(skipped)}개 제외, {len(pending)}개 파일 새로 계산")
+
+        update.update(pending_files=pending, file_hashes=file_hashes, signature=signature)
+        if reused or skipped:
+            update["file_results"] = reused + skipped
+        return update
+
+    def _save_file_result(self, target_process_name: str, file_name: str, content_hash: Optional[str],
+                          signature: Optional[str], validated: list, costs: list):
+        if self.result_store is None or not content_hash or not signature:
+            return
+        self.result_store.put(content_hash, target_process_name, signature, file_name, validated, costs)
 
     def _load_data_node(self, state: ComputeState) -> ComputeState:
         idx = state['current_file_index']
-        file_name = state['available_files'][idx]
+        file_name = state['pending_files'][idx]
+        file_path = os.path.join(state['data_dir'], file_name)
+        print(f"\n--- 루프 {idx + 1}: 파일 로딩 ({file_name}) ---")
+        return {"current_dataset": self._open_dataset(file_path, state['file_hashes'].get(file_name))}
+
+    async def _aload_data_node(self, state: ComputeState) -> ComputeState:
+        idx = state['current_file_index']
+        file_name = state['pending_files'][idx]
         file_path = os.path.join(state['data_dir'], file_name)
         print(f"\n--- 루프 {idx + 1}: 파일 로딩 ({file_name}) ---")
-        current_data = self._load_and_parse_data(file_path)
-        return {"current_data": current_data}
+        # 파일 파싱은 CPU 작업이므로 이벤트 루프를 막지 않도록 스레드에서 실행
+        return {"current_dataset": await asyncio.to_thread(self._open_dataset, file_path, state['file_hashes'].get(file_name))}
+
+    def _current_file_path(self, state: ComputeState) -> str:
+        return os.path.abspath(os.path.join(state['data_dir'], state['pending_files'][state['current_file_index']]))
 
     def _process_agent(self, state: ComputeState) -> ComputeState:
         print(" -> ProcessAgent 호출")
-        if state['current_data'].empty:
-            return {"candidates": []}
+        current_data = self._dataset_frame(state['current_dataset'])
+        if current_data.empty:
+            return {"candidates": [], "output_failed": False}
         
-        candidates = self.process_agent.find_parent_processes(
-            original_query=state['original_query'],
-            keyword=state['target_process_name'],
-            full_data=state['current_data']
-        )
-        return {"candidates": candidates}
+        with llm_cache_scope(self._current_file_path(state)), output_failure_scope() as failures:
+            candidates = self.process_agent.find_parent_processes(
+                original_query=state['original_query'],
+                keyword=state['target_process_name'],
+                full_data=current_data
+            )
+        return {"candidates": candidates, "output_failed": bool(failures)}
+
+    async def _aprocess_agent(self, state: ComputeState) -> ComputeState:
+        print(" -> ProcessAgent 호출")
+        current_data = self._dataset_frame(state['current_dataset'])
+        if current_data.empty:
+            return {"candidates": [], "output_failed": False}
+        
+        with llm_cache_scope(self._current_file_path(state)), output_failure_scope() as failures:
+            candidates = await self.process_agent.afind_parent_processes(
+                original_query=state['original_query'],
+                keyword=state['target_process_name'],
+                full_data=current_data
+            )
+        return {"candidates": candidates, "output_failed": bool(failures)}
 
     def _evaluator_agent(self, state: ComputeState) -> ComputeState:
         print(" -> EvaluatorAgent 호출")
         if not state['candidates']:
             return {"validated_processes": []}
             
-        validated = self.evaluator_agent.validate_parent_processes(
-            original_query=state['original_query'],
-            candidates=state['candidates'],
-            full_data=state['current_data'],
-            keyword=state['target_process_name']
-        )
-        return {"validated_processes": validated}
+        current_data = self._dataset_frame(state['current_dataset'])
+        with llm_cache_scope(self._current_file_path(state)), output_failure_scope() as failures:
+            validated = self.evaluator_agent.validate_parent_processes(
+                original_query=state['original_query'],
+                candidates=state['candidates'],
+                full_data=current_data,
+                keyword=state['target_process_name']
+            )
+        return {"validated_processes": validated, "output_failed": bool(state.get('output_failed') or failures)}
+
+    async def _aevaluator_agent(self, state: ComputeState) -> ComputeState:
+        print(" -> EvaluatorAgent 호출")
+        if not state['candidates']:
+            return {"validated_processes": []}
+            
+        current_data = self._dataset_frame(state['current_dataset'])
+        with llm_cache_scope(self._current_file_path(state)), output_failure_scope() as failures:
+            validated = await self.evaluator_agent.avalidate_parent_processes(
+                original_query=state['original_query'],
+                candidates=state['candidates'],
+                full_data=current_data,
+                keyword=state['target_process_name']
+            )
+        return {"validated_processes": validated, "output_failed": bool(state.get('output_failed') or failures)}
+
+    def _compute_parent_costs(self, validated_processes: List[dict], data: pd.DataFrame) -> List[int]:
+        """검증된 각 상위 공종에 대해 하위 공종 비용 합계를 계산"""
+        costs = []
+        record_index = get_record_index(data)
+        for parent_process in validated_processes:
+            parent_id = parent_process['record']
+            parent_name = parent_process['name']
+
+            # 하위 공종들의 비용 합계 (인덱스 생성 시 미리 계산됨)
+            # 예외처리) 하위 공종 비용 합계가 0이면 부모 공종의 비용으로 처리
+            total_cost_for_parent = record_index.subtree_cost(parent_id)
+            if total_cost_for_parent is None:
+                print(f"   - '{parent_name}' ({parent_id}): 데이터에 존재하지 않는 공종이므로 제외")
+                continue
+
+            print(f"   - '{parent_name}' ({parent_id}): 하위 공종 비용 합계 = {total_cost_for_parent:,.0f}원")
+            costs.append(total_cost_for_parent)
+        return costs
 
     def _aggregate_results(self, state: ComputeState) -> ComputeState:
-        all_item_costs = state.get('all_item_costs', [])
-        files_with_data = state.get('files_with_data', set())
         current_file_index = state['current_file_index']
         
         costs_from_this_file = []
+        file_name = state['pending_files'][current_file_index]
+        dataset = state['current_dataset']
         
         if state['validated_processes']:
-            file_name = state['available_files'][state['current_file_index']]
-            state['files_with_data'].add(file_name)
-            
-            for parent_process in state['validated_processes']:
-                parent_id = parent_process['record']
-                parent_name = parent_process['name']
-
-                # 하위 공종들의 비용 합계
-                sub_processes_df = state['current_data'][
-                    state['current_data']['record'].str.startswith(parent_id + '.')
-                ]
-                
-                if not sub_processes_df.empty:
-                    numeric_costs = pd.to_numeric(sub_processes_df['total_cost'])
-                    total_cost_for_parent = numeric_costs.sum()
-                else:
-                    total_cost_for_parent = 0
-                    
-                # 예외처리) 하위 공종 비용 합계가 0이면 부모 공종의 비용으로 처리
-                if total_cost_for_parent == 0:
-                    parent_df = state['current_data'][state['current_data']['record'] == parent_id]
-                    own_cost = pd.to_numeric(parent_df['total_cost']).iloc[0]
-                    total_cost_for_parent = own_cost
-
-                print(f"   - '{parent_name}' ({parent_id}): 하위 공종 비용 합계 = {total_cost_for_parent:,.0f}원")
-                costs_from_this_file.append(total_cost_for_parent)
+            costs_from_this_file = self._compute_parent_costs(state['validated_processes'], self._dataset_frame(dataset))
+        # 파싱에 실패한 파일이나 LLM 응답을 읽지 못한 파일은 다음 실행에서 다시 시도하도록 저장하지 않음
+        if dataset is not None and dataset['rows'] and not state.get('output_failed'):
+            self._save_file_result(state['target_process_name'], file_name, state['file_hashes'].get(file_name),
+                                   state['signature'], state['validated_processes'] or [], costs_from_this_file)
 
         next_index = current_file_index + 1
-        updated_costs = all_item_costs + costs_from_this_file
         
         return {
-            "all_item_costs": updated_costs,
-            "files_with_data": files_with_data,
-            "current_file_index": next_index 
+            "current_file_index": next_index,
+            # 이번 파일의 결과만 반환하면 file_results 리듀서가 기존 리스트 뒤에 덧붙임 (map-reduce 모드와 같은 형식)
+            "file_results": [{
+                "file_name": file_name,
+                "validated_processes": state['validated_processes'] or [],
+                "costs": costs_from_this_file,
+            }]
         }
 
+    ############################ map-reduce 모드 ############################
+    def _fan_out_files(self, state: ComputeState):
+        # 파일마다 독립적인 작업(Send)을 만들어 한 단계에서 동시에 실행 (저장된 결과가 있는 파일은 제외)
+        if not state['pending_files']:
+            return "finalize"
+        return [
+            Send("process_file", {
+                "original_query": state['original_query'],
+                "target_process_name": state['target_process_name'],
+                "data_dir": state['data_dir'],
+                "file_name": file_name,
+                "content_hash": state['file_hashes'].get(file_name),
+                "signature": state['signature'],
+            })
+            for file_name in state['pending_files']
+        ]
+
+    def _process_file(self, state: FileTaskState) -> ComputeState:
+        # 파일 하나에 대해 로딩 -> 후보 탐색 -> 검증 -> 비용 집계를 한 번에 수행
+        file_name = state['file_name']
+        print(f"\n--- 파일 처리 시작 ({file_name}) ---")
+        file_path = os.path.join(state['data_dir'], file_name)
+        dataset = self._open_dataset(file_path, state.get('content_hash'))
+        current_data = self._dataset_frame(dataset)
+
+        validated, failures = [], []
+        if not current_data.empty:
+            with llm_cache_scope(os.path.abspath(file_path)), output_failure_scope() as failures:
+                candidates = self.process_agent.find_parent_processes(
+                    original_query=state['original_query'],
+                    keyword=state['target_process_name'],
+                    full_data=current_data
+                )
+                if candidates:
+                    validated = self.evaluator_agent.validate_parent_processes(
+                        original_query=state['original_query'],
+                        candidates=candidates,
+                        full_data=current_data,
+                        keyword=state['target_process_name']
+                    )
+        return self._file_result(state, validated, current_data, output_failed=bool(failures))
+
+    async def _aprocess_file(self, state: FileTaskState) -> ComputeState:
+        # 비동기 실행 시에는 파일들의 LLM 대기 시간이 하나의 이벤트 루프에서 겹쳐짐
+        file_name = state['file_name']
+        print(f"\n--- 파일 처리 시작 ({file_name}) ---")
+        file_path = os.path.join(state['data_dir'], file_name)
+        dataset = await asyncio.to_thread(self._open_dataset, file_path, state.get('content_hash'))
+        current_data = self._dataset_frame(dataset)
+
+        validated, failures = [], []
+        if not current_data.empty:
+            with llm_cache_scope(os.path.abspath(file_path)), output_failure_scope() as failures:
+                candidates = await self.process_agent.afind_parent_processes(
+                    original_query=state['original_query'],
+                    keyword=state['target_process_name'],
+                    full_data=current_data
+                )
+                if candidates:
+                    validated = await self.evaluator_agent.avalidate_parent_processes(
+                        original_query=state['original_query'],
+                        candidates=candidates,
+                        full_data=current_data,
+                        keyword=state['target_process_name']
+                    )
+        return self._file_result(state, validated, current_data, output_failed=bool(failures))
+
+    def _file_result(self, state: FileTaskState, validated: list, current_data: pd.DataFrame,
+                     output_failed: bool = False) -> ComputeState:
+        file_name = state['file_name']
+        costs = self._compute_parent_costs(validated, current_data) if validated else []
+        # 파싱에 실패한 파일이나 LLM 응답을 읽지 못한 파일은 다음 실행에서 다시 시도하도록 저장하지 않음
+        if not current_data.empty and not output_failed:
+            self._save_file_result(state['target_process_name'], file_name, state.get('content_hash'),
+                                   state.get('signature'), validated, costs)
+        return {"file_results": [{
+            "file_name": file_name,
+            "validated_processes": validated,
+            "costs": costs,
+        }]}
+
+    def _check_pending(self, state: ComputeState) -> str:
+        if not state['pending_files']:
+            print("--- Compute Subgraph: 새로 처리할 파일 없음 ---")
+            return "finalize"
+        return "continue"
 
     def _check_if_done(self, state: ComputeState) -> str:
-        if state['current_file_index'] >= len(state['available_files']):
+        if state['current_file_index'] >= len(state['pending_files']):
             print("--- Compute Subgraph: 모든 파일 처리 완료 ---")
             return "finalize"
         else:
@@ -160,36 +473,94 @@ class ComputeAgent:
 
     def _finalize_computation(self, state: ComputeState) -> ComputeState:
         print("--- Compute Subgraph: 최종 결과 생성 ---")
-        all_costs = state.get('all_item_costs', [])
+        # 파일별 결과(map-reduce 작업 또는 순차 루프의 각 단계)를 여기서 병합
+        file_results = state.get('file_results') or []
+        files_with_data = {r['file_name'] for r in file_results if r['validated_processes']}
+        cost_stats = cost_statistics({r['file_name']: r['costs'] for r in file_results}, trim=self.trim, outlier_k=self.outlier_k)
+        overall = cost_stats['overall']
         
-        if not all_costs:
-            result = f"분석 결과, '{state['target_process_name']}'에 대한 유효한 비용 데이터를 찾을 수 없습니다."
-        else:
-            total_item_count = len(all_costs)
-            total_cost = sum(all_costs)
-            average_cost = total_cost / total_item_count
-            
-            result = (
-                f"'{state['target_process_name']}'에 대한 비용 분석 결과:\n"
-                f" - 총 {len(state['files_with_data'])}개 프로젝트(파일)에서 관련 데이터 발견\n"
-                f" - 분석된 총 유효 공종(다리 등) 수: {total_item_count}개\n"
-                f" - 평균 비용: {average_cost:,.0f}원"
-            )
-        return {"final_result": result}
+        result = format_cost_result(state['target_process_name'], overall['count'], overall['sum'], len(files_with_data), overall)
+        return {"final_result": result, "cost_stats": cost_stats}
+
+    ############################ 스트리밍 실행 ############################
+    def _progress_updates(self, progress: CostProgress, chunk: dict) -> list:
+        """서브그래프의 updates 이벤트에서 파일별 결과를 찾아 누적 통계로 변환"""
+        updates = []
+        for node_update in chunk.values():
+            file_results = (node_update or {}).get('file_results', [])
+            # 결과 저장소에서 재사용한 파일들은 한 번에 누적하여 이벤트 하나로 전달
+            reused = [file_result for file_result in file_results if file_result.get('reused')]
+            for file_result in reused:
+                progress.add(file_result)
+            if reused:
+                updates.append(progress.snapshot())
+            for file_result in file_results:
+                if not file_result.get('reused'):
+                    updates.append(progress.add(file_result))
+        return updates
+
+    def run(self, inputs: dict, on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        graph.stream으로 서브그래프를 실행하고 최종 상태를 반환
+        파일 하나의 처리가 끝날 때마다 누적 건수/평균/처리한 파일 목록(cost_progress 이벤트)으로 on_progress를 호출
+        """
+        progress = CostProgress(inputs['target_process_name'], len(inputs['available_files']))
+        final_state = {}
+        for mode, chunk in self.graph.stream(inputs, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+            elif on_progress is not None:
+                for update in self._progress_updates(progress, chunk):
+                    on_progress(update)
+        return final_state
+
+    async def arun(self, inputs: dict, on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """run의 비동기 버전 (graph.astream). 취소되면 그때까지 전달된 cost_progress가 부분 결과가 됨"""
+        progress = CostProgress(inputs['target_process_name'], len(inputs['available_files']))
+        final_state = {}
+        async for mode, chunk in self.graph.astream(inputs, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+            elif on_progress is not None:
+                for update in self._progress_updates(progress, chunk):
+                    on_progress(update)
+        return final_state
 
     def _create_graph(self) -> StateGraph:
-        """내부 로직을 수행하는 서브그래프를 생성하고 컴파일"""
+        """
+        내부 로직을 수행하는 서브그래프를 생성하고 컴파일
+        LLM을 호출하는 노드는 동기/비동기 구현을 함께 등록하여 graph.invoke와 graph.ainvoke 모두 지원
+        모든 노드는 계측 래퍼(instrumentation.node)로 등록되어, 계측이 켜져 있으면 실행 시간 등을 기록
+        """
         workflow = StateGraph(ComputeState)
 
-        workflow.add_node("start", self._start_computation)
-        workflow.add_node("load_data_node", self._load_data_node)
-        workflow.add_node("process_agent", self._process_agent)
-        workflow.add_node("evaluator_agent", self._evaluator_agent)
-        workflow.add_node("aggregate_results", self._aggregate_results)
-        workflow.add_node("finalize", self._finalize_computation)
-
+        workflow.add_node("start", instrumentation.node("compute.start", self._start_computation))
+        workflow.add_node("finalize", instrumentation.node("compute.finalize", self._finalize_computation))
         workflow.set_entry_point("start")
-        workflow.add_edge("start", "load_data_node")
+
+        if self.mode == "map_reduce":
+            # 파일 수와 관계없이 start -> process_file(병렬) -> finalize 의 고정된 단계로 실행
+            workflow.add_node("process_file", instrumentation.node("compute.process_file", self._process_file, self._aprocess_file),
+                              input_schema=FileTaskState)
+            workflow.add_conditional_edges("start", self._fan_out_files, ["process_file", "finalize"])
+            workflow.add_edge("process_file", "finalize")
+            workflow.add_edge("finalize", END)
+            return workflow.compile().with_config(max_concurrency=self.max_concurrency)
+
+        workflow.add_node("load_data_node", instrumentation.node("compute.load_data_node", self._load_data_node, self._aload_data_node))
+        workflow.add_node("process_agent", instrumentation.node("compute.process_agent", self._process_agent, self._aprocess_agent))
+        workflow.add_node("evaluator_agent", instrumentation.node("compute.evaluator_agent", self._evaluator_agent, self._aevaluator_agent))
+        workflow.add_node("aggregate_results", instrumentation.node("compute.aggregate_results", self._aggregate_results))
+
+        # 모든 파일의 결과를 저장소에서 가져온 경우 바로 최종 결과 생성
+        workflow.add_conditional_edges(
+            "start",
+            self._check_pending,
+            {
+                "continue": "load_data_node",
+                "finalize": "finalize"
+            }
+        )
         workflow.add_edge("load_data_node", "process_agent")
         workflow.add_edge("process_agent", "evaluator_agent")
         workflow.add_edge("evaluator_agent", "aggregate_results")
@@ -1,8 +1,13 @@
-import json
 import pandas as pd
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from boq.index import get_record_index
+from agents.instrumentation import chain_tag
+from agents.prompt_layout import DEFAULT_PROMPT_LAYOUT, check_prompt_layout, format_candidates
+from agents.output_parser import JsonOutputParser, json_output_llm, DEFAULT_JSON_MODE, DEFAULT_REPAIR_RETRIES
+
 # SYSTEM_PROMPT = """
 # # [역할 정의]
 # 너는 20년 경력의 건설 프로젝트 관리자(PM)이다.
@@ -77,14 +82,40 @@ HUMAN_PROMPT = """[원래 질문]
 위 [후보 상위 공종 목록]에서 [원래 질문]과 직접적으로 관련된 항목들만 필터링하여 JSON 형식으로 반환하라.
 """
 
+# 응답 JSON 스키마 (서버의 출력 형식 제약과 응답 검증에 사용)
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "validated_records": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"record": {"type": "string"}, "name": {"type": "string"}},
+                "required": ["record", "name"],
+            },
+        },
+    },
+    "required": ["validated_records"],
+}
+
 class EvaluatorAgent:
-    def __init__(self, llm):
+    """
+    prompt_layout="prefix"이면 후보 목록을 들여쓴 JSON 대신 'record|name' 행 형식으로 전달
+    응답을 끝내 JSON으로 읽지 못하면 사실 확인된 후보 목록을 그대로 반환
+    """
+    def __init__(self, llm, prompt_layout: str = DEFAULT_PROMPT_LAYOUT, json_mode: str = DEFAULT_JSON_MODE,
+                 repair_retries: int = DEFAULT_REPAIR_RETRIES):
+        check_prompt_layout(prompt_layout)
         self.llm = llm
+        self.prompt_layout = prompt_layout
+        self.json_mode = json_mode
         self.prompt_template = ChatPromptTemplate.from_messages([
             ("system", SYSTEM_PROMPT),
             ("human", HUMAN_PROMPT)
         ])
-        self.chain = self.prompt_template | self.llm | StrOutputParser()
+        self.chain = (self.prompt_template | json_output_llm(self.llm, "evaluator_agent", OUTPUT_SCHEMA, json_mode)
+                      | StrOutputParser()).with_config(tags=[chain_tag("evaluator_agent")])
+        self.output_parser = JsonOutputParser("evaluator_agent", self.llm, OUTPUT_SCHEMA, repair_retries, json_mode)
 
 
     def validate_parent_processes(self, original_query: str, candidates: list, full_data: pd.DataFrame, keyword: str) -> list:
@@ -92,6 +123,32 @@ class EvaluatorAgent:
         ProcessAgent가 찾은 상위 공종 후보 목록의 관련성을 검증하여 최종 목록을 반환합니다.
         """
         print("EvaluatorAgent: 상위 공종 후보 목록 검증 시작...")
+        fact_checked_candidates = self._fact_check(candidates, full_data)
+        if not fact_checked_candidates:
+            return []
+
+        response_json_str = self.chain.invoke(
+            self._chain_input(original_query, fact_checked_candidates, keyword)
+        ).strip()
+        print(f"EvaluatorAgent: LLM이 반환한 최종 검증 JSON: {response_json_str}")
+        return self._validated_records(self.output_parser.parse(response_json_str), fact_checked_candidates)
+
+    async def avalidate_parent_processes(self, original_query: str, candidates: list, full_data: pd.DataFrame, keyword: str) -> list:
+        """
+        validate_parent_processes의 비동기 버전
+        """
+        print("EvaluatorAgent: 상위 공종 후보 목록 검증 시작...")
+        fact_checked_candidates = self._fact_check(candidates, full_data)
+        if not fact_checked_candidates:
+            return []
+
+        response_json_str = (await self.chain.ainvoke(
+            self._chain_input(original_query, fact_checked_candidates, keyword)
+        )).strip()
+        print(f"EvaluatorAgent: LLM이 반환한 최종 검증 JSON: {response_json_str}")
+        return self._validated_records(await self.output_parser.aparse(response_json_str), fact_checked_candidates)
+
+    def _fact_check(self, candidates: list, full_data: pd.DataFrame) -> list:
         if not candidates:
             return []
         
@@ -106,6 +163,7 @@ class EvaluatorAgent:
                 unique_candidates.append(cand)
         
         # 'record'와 '공종명'이 원본 데이터와 완벽히 일치하는 후보만 필터링
+        record_index = get_record_index(full_data)
         fact_checked_candidates = []
         for cand in unique_candidates:
             record_id = cand.get("record")
@@ -114,31 +172,27 @@ class EvaluatorAgent:
             if not record_id or not record_name:
                 continue
 
-            matched_df = full_data[full_data['record'] == record_id]
-            if not matched_df.empty:
-                real_name = matched_df.iloc[0]['공종명']
+            position = record_index.position(record_id)
+            if position is not None:
+                real_name = full_data['공종명'].iloc[position]
                 if record_name in real_name or real_name in record_name:
                     fact_checked_candidates.append(cand)
 
         if not fact_checked_candidates:
             print("EvaluatorAgent: 사실 확인 후 남은 후보가 없습니다.")
-            return []
+        return fact_checked_candidates
 
-        candidate_json_str = json.dumps(fact_checked_candidates, ensure_ascii=False, indent=4)
-        
-        response_json_str = self.chain.invoke({
+    def _chain_input(self, original_query: str, fact_checked_candidates: list, keyword: str) -> dict:
+        return {
             "original_query": original_query,
-            "candidate_list": candidate_json_str,
+            "candidate_list": format_candidates(fact_checked_candidates, self.prompt_layout),
             "keyword": keyword
-        }).strip()
-
-        print(f"EvaluatorAgent: LLM이 반환한 최종 검증 JSON: {response_json_str}")
-
-        try:
-            response_data = json.loads(response_json_str)
-            validated_records = response_data.get("validated_records", [])
-            print(f"EvaluatorAgent: 최종적으로 {len(validated_records)}개의 유효한 공종을 확정했습니다.")
-            return validated_records
-        except Exception as e:
-            print(f"EvaluatorAgent: 의미 분석 중 오류 발생 - {e}. 사실 확인된 후보 목록을 반환합니다.")
-            return fact_checked_candidates
\ No newline at end of file
+        }
+
+    def _validated_records(self, response_data: Optional[dict], fact_checked_candidates: list) -> list:
+        if response_data is None:
+            print("EvaluatorAgent: 의미 분석 응답을 읽을 수 없습니다. 사실 확인된 후보 목록을 반환합니다.")
+            return fact_checked_candidates
+        validated_records = response_data.get("validated_records", [])
+        print(f"EvaluatorAgent: 최종적으로 {len(validated_records)}개의 유효한 공종을 확정했습니다.")
+        return validated_records
\ No newline at end of file
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import inspect
+import threading
+import functools
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+
+from agents.token_utils import estimate_tokens
+
+# 실행 중인 노드의 이름과 LLM 누적 시간 (노드 안에서 호출된 LLM 이벤트에 노드명을 붙이고, 노드 시간에서 LLM 시간을 분리하기 위함)
+_current_node: ContextVar[Optional[dict]] = ContextVar("instrumented_node", default=None)
+
+# 체인에 붙이는 태그의 접두어 (LLM 호출 이벤트의 chain 라벨이 됨)
+CHAIN_TAG_PREFIX = "boq:"
+# Prometheus summary로 내보내는 지표 (_sum과 _count를 함께 기록)
+_SUMMARIES = ("boq_node_duration_seconds", "boq_node_llm_seconds", "boq_llm_duration_seconds")
+
+def chain_tag(name: str) -> str:
+    return f"{CHAIN_TAG_PREFIX}{name}"
+
+def _frame_rows(state) -> Optional[int]:
+    # 상태의 데이터셋 핸들(dataset / current_dataset)이 가리키는 데이터의 행 수
+    if not isinstance(state, dict):
+        return None
+    for key in ("dataset", "current_dataset"):
+        if isinstance(state.get(key), dict):
+            return state[key].get('rows')
+    return None
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class JsonLogSink:
+    """이벤트를 한 줄에 하나의 JSON으로 기록하는 로그 싱크 (path가 없으면 표준 에러)"""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def write(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            stream = self._file or sys.stderr
+            stream.write(line + "\n")
+            stream.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class Instrumentation:
+    """
+    그래프 노드와 LLM 체인 호출의 계측기
+    - 노드: 실행 시간, 그중 LLM 대기 시간, LLM 호출 수, 데이터프레임 행 수, 오류
+    - LLM: 실행 시간, 프롬프트 글자 수, 입력/출력 토큰 수(모델이 주지 않으면 추정치), 응답 캐시 적중 여부
+    - 이벤트는 등록된 싱크(JSON 로그 등)로 보내고, 누적 지표는 Prometheus 텍스트 형식으로 내보냄
+    enabled가 False면 노드 래퍼와 콜백은 플래그만 확인하고 바로 원래 함수를 실행
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._sinks = []
+        self._gauges = {}
+        self._lock = threading.Lock()
+        # (지표 이름, 라벨 튜플) -> 값
+        self._metrics = defaultdict(float)
+        self.callback = InstrumentationCallbackHandler(self)
+
+    ############################ 설정 ############################
+    def enable(self, json_log: Optional[str] = None):
+        """계측을 켜고, json_log 경로가 주어지면 JSON 로그 싱크를 추가"""
+        if json_log:
+            self.add_sink(JsonLogSink(json_log))
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def add_sink(self, sink):
+        with self._lock:
+            self._sinks.append(sink)
+
+    def close_sinks(self):
+        with self._lock:
+            sinks, self._sinks = self._sinks, []
+        for sink in sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+
+    def register_gauges(self, prefix: str, collect: Callable[[], dict]):
+        """Prometheus 출력 시점에 collect()가 반환하는 {이름: 값}을 '{prefix}_{이름}' 게이지로 내보냄 (예: 캐시 통계)"""
+        self._gauges[prefix] = collect
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+    ############################ 기록 ############################
+    def _add(self, name: str, labels: dict, value: float):
+        self._metrics[(name, tuple(sorted(labels.items())))] += value
+
+    def _observe(self, name: str, labels: dict, value: float):
+        self._add(f"{name}_sum", labels, value)
+        self._add(f"{name}_count", labels, 1)
+
+    def emit(self, event: dict):
+        event = {"ts": round(time.time(), 6), **event}
+        with self._lock:
+            if event["type"] == "node":
+                labels = {"node": event["node"]}
+                self._add("boq_node_calls_total", labels, 1)
+                self._observe("boq_node_duration_seconds", labels, event["seconds"])
+                self._observe("boq_node_llm_seconds", labels, event["llm_seconds"])
+                if event["rows"] is not None:
+                    self._add("boq_node_rows_total", labels, event["rows"])
+                if event["error"]:
+                    self._add("boq_node_errors_total", labels, 1)
+            elif event["type"] == "llm":
+                labels = {"chain": event["chain"], "node": event["node"] or ""}
+                self._add("boq_llm_calls_total", {**labels, "cache": "hit" if event["cache_hit"] else "miss"}, 1)
+                self._observe("boq_llm_duration_seconds", labels, event["seconds"])
+                self._add("boq_llm_prompt_chars_total", labels, event["prompt_chars"])
+                self._add("boq_llm_input_tokens_total", labels, event["input_tokens"])
+                self._add("boq_llm_output_tokens_total", labels, event["output_tokens"])
+                if event["error"]:
+                    self._add("boq_llm_errors_total", labels, 1)
+            sinks = list(self._sinks)
+        for sink in sinks:
+            sink.write(event)
+
+    def _node_event(self, name: str, started: float, context: dict, state, update, error) -> dict:
+        rows = _frame_rows(update)
+        return {
+            "type": "node",
+            "node": name,
+            "seconds": round(time.perf_counter() - started, 6),
+            "llm_seconds": round(context["llm_seconds"], 6),
+            "llm_calls": context["llm_calls"],
+            "rows": rows if rows is not None else _frame_rows(state),
+            "error": error,
+        }
+
+    def _enter_node(self, name: str) -> tuple:
+        context = {"node": name, "llm_seconds": 0.0, "llm_calls": 0, "parent": _current_node.get()}
+        return context, _current_node.set(context)
+
+    def _exit_node(self, context: dict, token):
+        _current_node.reset(token)
+        # 서브그래프를 실행하는 노드(compute_node)에도 내부 노드의 LLM 시간/호출 수를 합산
+        parent = context["parent"]
+        if parent is not None:
+            parent["llm_seconds"] += context["llm_seconds"]
+            parent["llm_calls"] += context["llm_calls"]
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """노드 함수(동기/비동기)를 계측하는 래퍼"""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(state):
+                if not self.enabled:
+                    return await func(state)
+                context, token = self._enter_node(name)
+                started, update, error = time.perf_counter(), None, None
+                try:
+                    update = await func(state)
+                    return update
+                except BaseException as e:
+                    error = type(e).__name__
+                    raise
+                finally:
+                    self._exit_node(context, token)
+                    self.emit(self._node_event(name, started, context, state, update, error))
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(state):
+            if not self.enabled:
+                return func(state)
+            context, token = self._enter_node(name)
+            started, update, error = time.perf_counter(), None, None
+            try:
+                update = func(state)
+                return update
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                self._exit_node(context, token)
+                self.emit(self._node_event(name, started, context, state, update, error))
+        return wrapper
+
+    def node(self, name: str, func: Callable, afunc: Optional[Callable] = None) -> RunnableLambda:
+        """그래프에 등록할 계측된 노드 (afunc가 있으면 동기/비동기 구현을 함께 등록)"""
+        if afunc is None:
+            return RunnableLambda(self.wrap(name, func), name=name)
+        return RunnableLambda(self.wrap(name, func), afunc=self.wrap(name, afunc), name=name)
+
+    def instrument_llm(self, llm):
+        """LLM에 계측 콜백을 붙임 (이미 붙어 있으면 그대로)"""
+        callbacks = list(llm.callbacks or [])
+        if self.callback not in callbacks:
+            llm.callbacks = callbacks + [self.callback]
+        return llm
+
+    ############################ 내보내기 ############################
+    def render_prometheus(self) -> str:
+        """누적 지표를 Prometheus 텍스트 형식으로 반환"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        by_name = defaultdict(list)
+        for (name, labels), value in metrics.items():
+            by_name[name].append((labels, value))
+        for prefix, collect in self._gauges.items():
+            for key, value in collect().items():
+                by_name[f"{prefix}_{key}"].append(((), value))
+
+        lines, typed = [], set()
+        for name in sorted(by_name):
+            family = name.rsplit("_", 1)[0] if name.endswith(("_sum", "_count")) else name
+            if family not in typed:
+                metric_type = "summary" if family in _SUMMARIES else "counter" if name.endswith("_total") else "gauge"
+                lines.append(f"# TYPE {family} {metric_type}")
+                typed.add(family)
+            for labels, value in sorted(by_name[name]):
+                label_str = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+                lines.append(f"{name}{{{label_str}}} {value:g}" if label_str else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+
+class InstrumentationCallbackHandler(BaseCallbackHandler):
+    """체인 안의 LLM 호출마다 시간/프롬프트 크기/토큰 수/캐시 적중을 기록하는 LangChain 콜백"""
+    # 비동기 실행에서도 호출한 쪽의 컨텍스트(현재 노드)에서 바로 실행되도록 함
+    run_inline = True
+
+    def __init__(self, instrumentation: Instrumentation):
+        self.instrumentation = instrumentation
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        if not self.instrumentation.enabled:
+            return
+        prompt = "\n".join(str(message.content) for batch in messages for message in batch)
+        chain = next((tag[len(CHAIN_TAG_PREFIX):] for tag in tags or [] if tag.startswith(CHAIN_TAG_PREFIX)), "unknown")
+        self._runs[run_id] = (time.perf_counter(), chain, prompt, _current_node.get())
+
+    def _finish(self, run_id, response=None, error=None):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        started, chain, prompt, node_context = run
+        seconds = time.perf_counter() - started
+        input_tokens, output_tokens, cache_hit, token_source = estimate_tokens(prompt), 0, False, "estimate"
+        if response is not None:
+            generations = [generation for batch in response.generations for generation in batch]
+            output_tokens = sum(estimate_tokens(generation.text) for generation in generations)
+            cache_hit = any((generation.generation_info or {}).get("cache_hit") for generation in generations)
+            # 모델이 토큰 사용량을 주면 그 값을 사용 (캐시 적중 응답에는 total_cost만 있을 수 있음)
+            usage = [getattr(getattr(generation, "message", None), "usage_metadata", None) or {} for generation in generations]
+            if usage and all("input_tokens" in item for item in usage):
+                input_tokens = sum(item["input_tokens"] for item in usage)
+                output_tokens = sum(item["output_tokens"] for item in usage)
+                token_source = "usage"
+        if node_context is not None:
+            node_context["llm_seconds"] += seconds
+            node_context["llm_calls"] += 1
+        self.instrumentation.emit({
+            "type": "llm",
+            "chain": chain,
+            "node": node_context["node"] if node_context else None,
+            "seconds": round(seconds, 6),
+            "prompt_chars": len(prompt),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "token_source": token_source,
+            "cache_hit": cache_hit,
+            "error": error,
+        })
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, response=response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=type(error).__name__)
+
+# 프로세스 전역 계측기. BOQ_INSTRUMENTATION=1 이면 켜진 상태로 시작하고, BOQ_INSTRUMENTATION_LOG 경로에 JSON 로그를 남김
+instrumentation = Instrumentation()
+if os.environ.get("BOQ_INSTRUMENTATION", "").lower() in ("1", "true", "on"):
+    instrumentation.enable(json_log=os.environ.get("BOQ_INSTRUMENTATION_LOG"))
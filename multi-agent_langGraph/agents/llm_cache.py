@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+# 현재 LLM 호출이 어떤 데이터 파일을 기반으로 하는지 표시 (파일이 바뀌면 해당 응답만 무효화하기 위함)
+_current_data_file: ContextVar[Optional[str]] = ContextVar("llm_cache_data_file", default=None)
+
+@contextmanager
+def llm_cache_scope(data_file: Optional[str]):
+    """이 블록 안에서 저장되는 LLM 응답에 데이터 파일명을 태그로 남김"""
+    token = _current_data_file.set(data_file)
+    try:
+        yield
+    finally:
+        _current_data_file.reset(token)
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class LLMResponseCache(BaseCache):
+    """
+    SQLite 기반의 LLM 응답 디스크 캐시 (temperature=0 이므로 같은 프롬프트에는 같은 응답을 재사용)
+    - 키: 모델 설정 문자열(llm_string, 모델명 포함)의 해시 + 렌더링된 프롬프트의 해시
+    - max_entries / max_bytes를 넘으면 가장 오래 사용되지 않은 항목부터 제거 (LRU)
+    - ttl_seconds가 지난 항목은 조회되지 않고 삭제됨
+    - llm_cache_scope로 태그된 데이터 파일 단위로 무효화 가능
+    """
+    def __init__(self, db_path: str, max_entries: int = 20000, max_bytes: int = 512 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # 첫 LLM 호출 시점에 DB를 열어, 캐시를 쓰지 않는 실행에서는 파일을 만들지 않음
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    llm_hash TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    data_file TEXT,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (llm_hash, prompt_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON llm_responses(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_file ON llm_responses(data_file)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = (_hash(llm_string), _hash(prompt))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE llm_hash = ? AND prompt_hash = ?", key
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_responses WHERE llm_hash = ? AND prompt_hash = ?", key)
+                conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_responses SET last_access = ? WHERE llm_hash = ? AND prompt_hash = ?", (now,) + key)
+            conn.commit()
+            self.hits += 1
+        generations = _loads_generations(row[0])
+        # 계측 콜백이 캐시 적중을 구분할 수 있도록 표시 (저장된 응답에는 남기지 않음)
+        for generation in generations:
+            generation.generation_info = {**(generation.generation_info or {}), "cache_hit": True}
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        response = _dumps_generations(return_val)
+        size_bytes = len(response.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_hash(llm_string), _hash(prompt), _current_data_file.get(), response, size_bytes, now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses").fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        # 한도 안으로 들어올 때까지 가장 오래 사용되지 않은 항목부터 제거
+        excess_count, excess_bytes = count - self.max_entries, total_bytes - self.max_bytes
+        removed_count, removed_bytes, victims = 0, 0, []
+        for llm_hash, prompt_hash, size in conn.execute(
+            "SELECT llm_hash, prompt_hash, size_bytes FROM llm_responses ORDER BY last_access"
+        ):
+            if removed_count >= excess_count and removed_bytes >= excess_bytes:
+                break
+            victims.append((llm_hash, prompt_hash))
+            removed_count += 1
+            removed_bytes += size
+        conn.executemany("DELETE FROM llm_responses WHERE llm_hash = ? AND prompt_hash = ?", victims)
+
+    def invalidate_data_file(self, data_file: str) -> int:
+        """해당 데이터 파일을 기반으로 생성된 응답을 모두 삭제하고 삭제된 개수를 반환"""
+        with self._lock:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM llm_responses WHERE data_file = ?", (data_file,)).rowcount
+            conn.commit()
+        return deleted
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM llm_responses")
+            conn.commit()
+
+    def stats(self) -> dict:
+        # 아직 한 번도 사용하지 않은 캐시는 통계 조회만으로 DB 파일을 만들지 않음
+        if self._conn is None and not os.path.exists(self.db_path):
+            return {"hits": self.hits, "misses": self.misses, "entries": 0, "bytes": 0}
+        with self._lock:
+            count, total_bytes = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total_bytes}
+
+def _dumps_generations(generations: RETURN_VAL_TYPE) -> str:
+    # 채팅 모델의 응답은 메시지 전체(메타데이터 포함)를, 그 외에는 텍스트만 JSON으로 저장
+    serialized = []
+    for generation in generations:
+        item = {"text": generation.text, "generation_info": generation.generation_info}
+        if isinstance(generation, ChatGeneration):
+            item["message"] = message_to_dict(generation.message)
+        serialized.append(item)
+    return json.dumps(serialized, ensure_ascii=False)
+
+def _loads_generations(response: str) -> RETURN_VAL_TYPE:
+    generations = []
+    for item in json.loads(response):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item["generation_info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+    return generations
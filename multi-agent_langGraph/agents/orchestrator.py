@@ -1,10 +1,17 @@
 import os
-import json
-import pandas as pd
-from langchain_openai import ChatOpenAI
+from typing import Optional
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from boq.cache import ParsedFileCache, LoadedFrameCache, DEFAULT_DATA_CACHE_BYTES
+from boq.corpus import CorpusStore
+from boq.datasets import DatasetRegistry, DatasetHandle
+from agents.llm_cache import LLMResponseCache
+from agents.query_router import QueryRouter
+from agents.instrumentation import instrumentation, chain_tag
+from agents.output_parser import JsonOutputParser, json_output_llm, output_parse_stats, DEFAULT_JSON_MODE, DEFAULT_REPAIR_RETRIES
+
 ###################### PROMPT ######################
 SYSTEM_PROMPT = """
 # [역할 정의]
@@ -71,31 +78,82 @@ HUMAN_PROMPT = """
 [사용자 질문]: "{user_query}"
 [출력]:
 """
+
+# 응답 JSON 스키마 (서버의 출력 형식 제약과 응답 검증에 사용)
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "task": {"type": "string"},
+        "parameters": {"type": "object"},
+    },
+    "required": ["task"],
+}
 ####################################################
 
+# 규칙 기반 라우팅이 애매해서 LLM에 맡길 때 프롬프트에 넣을 최대 파일 수
+FALLBACK_TOP_FILES = 10
+
 class Orchestrator:
     """
     전체 에이전트 시스템을 지휘하는 오케스트레이터 클래스
     데이터를 로드하고, 사용자 쿼리에 따라 적절한 에이전트를 호출
     """
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, llm: Optional[BaseChatModel] = None,
+                 data_cache_bytes: int = DEFAULT_DATA_CACHE_BYTES, json_mode: str = DEFAULT_JSON_MODE,
+                 repair_retries: int = DEFAULT_REPAIR_RETRIES):
+        """
+        llm을 주면 기본 모델 대신 사용 (벤치마크의 가짜 모델 등, 응답 캐시는 붙이지 않음)
+        data_cache_bytes는 로딩한 데이터프레임을 메모리에 보관할 최대 크기 (넘으면 오래 쓰지 않은 파일부터 제거)
+        json_mode는 서버에 요청할 출력 형식 제약, repair_retries는 읽지 못한 응답의 교정 요청 횟수 (agents/output_parser.py)
+        """
+        # temperature=0 이므로 같은 프롬프트의 응답은 디스크에 캐싱하여 재사용
+        self.llm_cache = LLMResponseCache(os.path.join(data_dir, ".boq_cache", "llm_cache.sqlite"))
+
         # LLM 모델 설정
-        self.llm = ChatOpenAI(
-            model="openai/gpt-oss-120b",
-            openai_api_key="EMPTY",
-            openai_api_base="", # 사용할 LLM 모델
-            max_tokens=128000,
-            temperature=0, # 결과의 일관성을 위해 0으로 설정
-        )
+        if llm is None:
+            # langchain_openai(openai SDK)는 불러오는 데 오래 걸리므로 기본 모델을 만들 때만 import (가짜 모델을 쓰는 벤치마크는 생략)
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(
+                model="openai/gpt-oss-120b",
+                openai_api_key="EMPTY",
+                openai_api_base="", # 사용할 LLM 모델
+                max_tokens=128000,
+                temperature=0, # 결과의 일관성을 위해 0으로 설정
+                cache=self.llm_cache,
+            )
+        self.llm = llm
         
         self.data_dir = data_dir
-        self.available_files = self._get_file_list(data_dir)
+        # 파일 목록은 데이터 디렉토리의 수정 시각과 함께 보관하여, 디렉토리가 바뀌었을 때만 다시 읽음
+        self._file_list_mtime = -1
+        self.available_files = []
+        self.refresh_file_list()
         
-        # 데이터를 미리 로딩하지 않고, 필요할 때 로딩
-        self.loaded_data_cache = {}
+        # 파싱 결과는 디스크에도 캐싱하여 재시작 후에도 다시 파싱하지 않음
+        self.parsed_cache = ParsedFileCache(os.path.join(data_dir, ".boq_cache"))
+        # 데이터를 미리 로딩하지 않고, 필요할 때 로딩하여 메모리 한도 안에서 보관 (ComputeAgent와 공유)
+        self.loaded_data_cache = LoadedFrameCache(data_cache_bytes, content_hash=self.parsed_cache.content_hash)
+        # 데이터 파일 내용이 바뀌면 그 파일을 기반으로 한 LLM 응답도 함께 무효화
+        self.parsed_cache.add_invalidation_listener(self.llm_cache.invalidate_data_file)
+        # ingest.py로 만든 전체 내역서 코퍼스 (없거나 원본이 바뀐 파일은 파싱 캐시로 읽음)
+        self.corpus = CorpusStore(os.path.join(data_dir, ".boq_cache"))
+        # 그래프 상태에는 데이터셋 핸들만 넣고, 노드에서 이 레지스트리로 데이터프레임을 꺼냄 (ComputeAgent와 공유)
+        self.datasets = DatasetRegistry(parsed_cache=self.parsed_cache, corpus=self.corpus, data_cache=self.loaded_data_cache)
+
+        # 모든 에이전트가 이 LLM을 공유하므로 여기서 한 번만 계측 콜백을 붙이고, 캐시 통계를 지표로 내보냄
+        instrumentation.instrument_llm(self.llm)
+        instrumentation.register_gauges("boq_llm_cache", self.llm_cache.stats)
+        instrumentation.register_gauges("boq_parsed_cache", lambda: {"hits": self.parsed_cache.hits, "misses": self.parsed_cache.misses})
+        instrumentation.register_gauges("boq_data_cache", self.loaded_data_cache.stats)
+        instrumentation.register_gauges("boq_output_parse", output_parse_stats.stats)
         
         # 프롬프트와 체인 초기화
+        self.json_mode = json_mode
         self.task_planning_chain = self._create_task_planning_chain()
+        # 작업 계획 응답이 형식에 맞지 않으면 질문 전체를 다시 분석하지 않고 응답만 교정 요청
+        self.task_plan_parser = JsonOutputParser("orchestrator", self.llm, OUTPUT_SCHEMA, repair_retries, json_mode)
+        # 파일 목록이 바뀌면 다시 만드는 규칙 기반 라우터 (파일 목록, 라우터)
+        self._router = (None, None)
         
     def _get_file_list(self, data_dir: str) -> list:
         try:
@@ -103,51 +161,37 @@ class Orchestrator:
         except FileNotFoundError:
             print(f"오류: 데이터 디렉토리를 찾을 수 없습니다 - {data_dir}")
             return []
+
+    def refresh_file_list(self) -> list:
+        """
+        데이터 디렉토리가 바뀌었으면 다시 읽어 available_files를 갱신 (질문마다 호출하여 새로 추가된 파일을 반영)
+        파일을 추가/삭제/이름 변경하면 디렉토리의 수정 시각이 바뀌므로, 그대로이면 os.stat 한 번으로 끝남
+        """
+        try:
+            mtime = os.stat(self.data_dir).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._file_list_mtime:
+            self.available_files = self._get_file_list(self.data_dir)
+            self._file_list_mtime = mtime
+        return self.available_files
         
     def _create_task_planning_chain(self):
         prompt_template = ChatPromptTemplate.from_messages([
             ("system", SYSTEM_PROMPT),
             ("human", HUMAN_PROMPT)
         ])
-        return prompt_template | self.llm | StrOutputParser()
-        
-    def _load_data(self, file_name: str) -> pd.DataFrame:
-        # 캐시에 파일이 이미 로드되어 있는지 확인
-        if file_name in self.loaded_data_cache:
-            return self.loaded_data_cache[file_name]
+        return (prompt_template | json_output_llm(self.llm, "orchestrator", OUTPUT_SCHEMA, self.json_mode)
+                | StrOutputParser()).with_config(tags=[chain_tag("orchestrator")])
         
+    def open_dataset(self, file_name: str) -> Optional[DatasetHandle]:
+        """파일을 로딩(메모리에 있으면 그대로 사용)하고 그래프 상태에 넣을 데이터셋 핸들을 반환. 실패하면 None"""
         file_path = os.path.join(self.data_dir, file_name)
         
-        records = []
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line: continue
-                    
-                    # 데이터 파싱
-                    parts = line.split(':', 1)
-                    if len(parts) != 2: continue
-                    record_id = parts[0].strip()
-                    
-                    rest_parts = parts[1].split(';')
-                    
-                    process_name = rest_parts[0].strip() if len(rest_parts) > 0 else "None"
-                    spec = rest_parts[1].strip() if len(rest_parts) > 1 else "None"
-                    total_cost = rest_parts[2].strip() if len(rest_parts) > 2 else "0"
-                    
-                    records.append({
-                        'record': record_id, 
-                        '공종명': process_name, 
-                        'spec': spec,
-                        'total_cost': total_cost
-                    })
-            
-            df = pd.DataFrame(records)
-            self.loaded_data_cache[file_name] = df # 로드한 데이터 캐싱
-                 
-            print(f"데이터 로딩 완료: 총 {len(records)}개의 공종을 불러왔습니다.")
-            return df
+            handle = self.datasets.open(file_path)
+            print(f"데이터 로딩 완료: 총 {handle['rows']}개의 공종을 불러왔습니다.")
+            return handle
         
         except FileNotFoundError:
             print(f"오류: 데이터 파일을 찾을 수 없습니다 - {file_path}")
@@ -156,22 +200,69 @@ class Orchestrator:
             print(f"데이터 로딩 중 오류 발생: {e}")
             return None
     
+    def _get_router(self, available_files: list) -> QueryRouter:
+        files, router = self._router
+        if files != tuple(available_files):
+            router = QueryRouter(available_files)
+            self._router = (tuple(available_files), router)
+        return router
+
+    def _route_locally(self, query: str, router: QueryRouter):
+        # 파일/작업 종류/공종명이 모두 확실하면 LLM 없이 작업 계획을 만듦
+        task_plan = router.route(query)
+        if task_plan is not None:
+            print(f"Orchestrator: 규칙 기반으로 '{task_plan['task']}' 작업으로 판단됨 (LLM 호출 생략)")
+        return task_plan
+
     # 사용자 쿼리를 받아 LLM 체인을 실행하고, 작업 계획(JSON)을 반환
     def plan_task(self, query: str, available_files: list) -> dict:
         print(f"Orchestrator: '{query}'에 대한 의도 분석 시작...")
         if not available_files:
             return {"task": "error", "parameters": {"message": "사용 가능한 파일이 없습니다."}}
 
-        file_list_str = "\n".join(available_files)
-        response_json_str = self.task_planning_chain.invoke({
+        router = self._get_router(available_files)
+        task_plan = self._route_locally(query, router)
+        if task_plan is not None:
+            return task_plan
+        response_json_str = self.task_planning_chain.invoke(self._planning_input(query, router))
+        return self._parse_task_plan(self.task_plan_parser.parse(response_json_str), router)
+
+    async def aplan_task(self, query: str, available_files: list) -> dict:
+        """plan_task의 비동기 버전"""
+        print(f"Orchestrator: '{query}'에 대한 의도 분석 시작...")
+        if not available_files:
+            return {"task": "error", "parameters": {"message": "사용 가능한 파일이 없습니다."}}
+
+        router = self._get_router(available_files)
+        task_plan = self._route_locally(query, router)
+        if task_plan is not None:
+            return task_plan
+        response_json_str = await self.task_planning_chain.ainvoke(self._planning_input(query, router))
+        return self._parse_task_plan(await self.task_plan_parser.aparse(response_json_str), router)
+
+    def _planning_input(self, query: str, router: QueryRouter) -> dict:
+        # 전체 파일 목록 대신 질문과 가장 관련 있는 상위 파일만 전달
+        file_list_str = "\n".join(router.resolver.top_files(query, FALLBACK_TOP_FILES))
+        return {
             "available_files": file_list_str,
             "user_query": query
-        })
+        }
 
-        try:
-            task_plan = json.loads(response_json_str)
-            print(f"Orchestrator: '{task_plan.get('task')}' 작업으로 판단됨.")
-            return task_plan
-        except json.JSONDecodeError:
-            print(f"LLM 응답 파싱 오류: {response_json_str}")
-            return {"task": "error", "parameters": {"message": "LLM 응답 파싱 오류."}}
\ No newline at end of file
+    def _parse_task_plan(self, task_plan: Optional[dict], router: QueryRouter) -> dict:
+        # task_plan: JsonOutputParser가 읽은 응답 (보정/교정 요청 후에도 읽지 못했으면 None)
+        if task_plan is None:
+            return {"task": "error", "parameters": {"message": "LLM 응답 파싱 오류."}}
+        print(f"Orchestrator: '{task_plan.get('task')}' 작업으로 판단됨.")
+        self._correct_file_name(task_plan, router)
+        return task_plan
+
+    def _correct_file_name(self, task_plan: dict, router: QueryRouter):
+        # LLM이 목록에 없는 파일명을 반환하면 파일명 토큰으로 실제 파일을 다시 찾음
+        parameters = task_plan.get("parameters") or {}
+        file_name = parameters.get("file_name")
+        if not file_name or file_name == "None" or file_name in router.resolver.file_names:
+            return
+        resolved = router.resolver.resolve(file_name)
+        if resolved is not None:
+            print(f"Orchestrator: 존재하지 않는 파일명 '{file_name}'을 '{resolved}'(으)로 보정")
+            parameters["file_name"] = resolved
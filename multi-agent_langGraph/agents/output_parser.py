@@ -0,0 +1,207 @@
+import os
+import re
+import sys
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import defaultdict
+from typing import Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from agents.instrumentation import chain_tag
+
+# 서버에 요청하는 출력 형식 제약 (OpenAI 호환 response_format, vLLM 등이 지원)
+# - json_object: 유효한 JSON 객체만 생성 (대부분의 서버가 지원)
+# - json_schema: 에이전트별 스키마에 맞는 JSON만 생성
+# - off: 제약 없이 텍스트로 받고 로컬 보정만 사용
+JSON_MODES = ("json_object", "json_schema", "off")
+DEFAULT_JSON_MODE = os.environ.get("BOQ_JSON_MODE", "json_object")
+# 로컬 보정으로도 읽지 못한 응답에 대해 교정 요청을 보내는 최대 횟수
+DEFAULT_REPAIR_RETRIES = 1
+# 교정 요청에 넣는 원래 응답의 최대 글자 수
+MAX_REPAIR_CHARS = 8000
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S | re.I)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_JSON_TYPES = {"array": list, "object": dict, "string": str, "integer": int, "number": (int, float), "boolean": bool}
+
+# 현재 실행 중인 작업(파일 하나 등)에서 재시도 후에도 읽지 못한 응답의 에이전트 이름 목록
+_current_failures: ContextVar[Optional[list]] = ContextVar("output_parse_failures", default=None)
+
+@contextmanager
+def output_failure_scope():
+    """이 블록 안에서 끝내 파싱에 실패한 응답의 에이전트 이름을 모으는 리스트를 yield (결과 저장 여부 판단용)"""
+    failures = []
+    token = _current_failures.set(failures)
+    try:
+        yield failures
+    finally:
+        _current_failures.reset(token)
+
+class OutputParseError(ValueError):
+    """LLM 응답에서 스키마에 맞는 JSON 객체를 찾을 수 없을 때 발생"""
+
+def _check_schema(data, schema: dict) -> dict:
+    if not isinstance(data, dict):
+        raise OutputParseError("JSON 객체가 아닙니다.")
+    properties = schema.get("properties", {})
+    for key in schema.get("required", []):
+        if key not in data:
+            raise OutputParseError(f"필수 키 '{key}'가 없습니다.")
+        expected = _JSON_TYPES.get(properties.get(key, {}).get("type"))
+        if expected is not None and not isinstance(data[key], expected):
+            raise OutputParseError(f"'{key}'의 형식이 올바르지 않습니다.")
+    return data
+
+def extract_json(text: str, schema: Optional[dict] = None) -> tuple:
+    """
+    LLM 응답 문자열에서 JSON 객체를 읽어 (객체, 로컬 보정 여부)를 반환
+    그대로 읽을 수 없으면 코드 블록(```json), 앞뒤의 설명 문장, 닫는 괄호 앞의 쉼표를 보정해 다시 시도
+    schema(JSON 스키마)를 주면 required 키와 그 최상위 형식까지 확인하고, 실패하면 OutputParseError
+    """
+    text = (text or "").strip()
+    try:
+        data = json.loads(text)
+        return (_check_schema(data, schema) if schema else data), False
+    except json.JSONDecodeError:
+        pass
+
+    candidates = [match.strip() for match in _CODE_FENCE.findall(text)] + [text]
+    decoder = json.JSONDecoder()
+    error = OutputParseError("JSON 객체를 찾을 수 없습니다.")
+    for candidate in candidates:
+        for source in (candidate, _TRAILING_COMMA.sub(r"\1", candidate)):
+            # 첫 '{'부터 객체 하나만 읽고 뒤에 붙은 문장은 무시
+            start = source.find("{")
+            while start != -1:
+                try:
+                    data, _ = decoder.raw_decode(source, start)
+                    return (_check_schema(data, schema) if schema else data), True
+                except (json.JSONDecodeError, OutputParseError) as e:
+                    error = e if isinstance(e, OutputParseError) else error
+                start = source.find("{", start + 1)
+    raise error
+
+def _is_openai_chat(llm) -> bool:
+    # langchain_openai를 아직 불러오지 않았다면 ChatOpenAI 인스턴스일 수 없으므로, 확인하려고 새로 import하지 않음
+    module = sys.modules.get("langchain_openai.chat_models.base")
+    return module is not None and isinstance(llm, module.BaseChatOpenAI)
+
+def json_output_llm(llm, name: str, schema: dict, json_mode: str = DEFAULT_JSON_MODE):
+    """서버가 출력 형식 제약을 지원하는 모델(ChatOpenAI)이면 response_format을 붙인 모델을, 아니면 그대로 반환"""
+    if json_mode not in JSON_MODES:
+        raise ValueError(f"지원하지 않는 json_mode입니다: {json_mode}")
+    if json_mode == "off" or not _is_openai_chat(llm):
+        return llm
+    if json_mode == "json_object":
+        return llm.bind(response_format={"type": "json_object"})
+    return llm.bind(response_format={"type": "json_schema", "json_schema": {"name": name, "schema": schema}})
+
+class OutputParseStats:
+    """에이전트별 응답 파싱 결과 누적 (ok: 그대로 읽음, repaired: 로컬 보정, retried: 교정 요청으로 복구, failed: 실패)"""
+    OUTCOMES = ("ok", "repaired", "retried", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.OUTCOMES + ("repair_calls",), 0))
+
+    def record(self, name: str, outcome: str, repair_calls: int = 0):
+        with self._lock:
+            counts = self._counts[name]
+            counts[outcome] += 1
+            counts["repair_calls"] += repair_calls
+
+    def summary(self) -> dict:
+        """{에이전트: {ok, repaired, retried, failed, repair_calls, failure_rate}}"""
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+        for values in counts.values():
+            total = sum(values[outcome] for outcome in self.OUTCOMES)
+            values["failure_rate"] = values["failed"] / total if total else 0.0
+        return counts
+
+    def stats(self) -> dict:
+        """Prometheus 게이지용 평탄화된 통계 ('{에이전트}_{항목}')"""
+        return {f"{name}_{key}": value for name, values in self.summary().items() for key, value in values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+# 프로세스 전역 파싱 통계 (모든 에이전트가 공유)
+output_parse_stats = OutputParseStats()
+
+REPAIR_SYSTEM_PROMPT = """너는 JSON 교정기다. [원래 응답]의 내용을 바꾸지 말고, [필수 키]를 모두 가진 하나의 JSON 객체로만 다시 출력하라.
+설명, 코드 블록(```), 주석 없이 JSON 객체만 출력한다. 원래 응답에 없는 항목은 만들지 말고, 값이 없으면 빈 목록([])을 사용한다."""
+
+REPAIR_HUMAN_PROMPT = """[필수 키]
+{required_keys}
+
+[원래 응답]
+{response}
+"""
+
+class JsonOutputParser:
+    """
+    에이전트 하나의 LLM 응답을 JSON으로 읽는 파서
+    1) 그대로 또는 로컬 보정(extract_json)으로 읽음
+    2) 실패하면 큰 원래 프롬프트를 다시 보내지 않고, 실패한 응답만 짧은 교정 요청으로 최대 max_retries번 다시 받음
+    3) 그래도 실패하면 None (호출한 쪽에서 기존처럼 빈 결과/오류로 처리)
+    결과는 output_parse_stats에 에이전트별로 기록
+    """
+    def __init__(self, name: str, llm, schema: dict, max_retries: int = DEFAULT_REPAIR_RETRIES,
+                 json_mode: str = DEFAULT_JSON_MODE):
+        self.name = name
+        self.schema = schema
+        self.max_retries = max_retries
+        prompt_template = ChatPromptTemplate.from_messages([
+            ("system", REPAIR_SYSTEM_PROMPT),
+            ("human", REPAIR_HUMAN_PROMPT)
+        ])
+        self.repair_chain = (prompt_template | json_output_llm(llm, f"{name}_repair", schema, json_mode)
+                             | StrOutputParser()).with_config(tags=[chain_tag(f"{name}_repair")])
+
+    def _try_parse(self, text: str) -> tuple:
+        # (객체 또는 None, 로컬 보정 여부)
+        try:
+            return extract_json(text, self.schema)
+        except OutputParseError:
+            return None, False
+
+    def _repair_input(self, text: str) -> dict:
+        return {"required_keys": ", ".join(self.schema.get("required", [])), "response": text[:MAX_REPAIR_CHARS]}
+
+    def _finish(self, data: Optional[dict], outcome: str, repair_calls: int, text: str) -> Optional[dict]:
+        if data is None:
+            outcome = "failed"
+            print(f"{self.name}: LLM 응답을 JSON으로 읽을 수 없습니다 (교정 요청 {repair_calls}회): '{text[:200]}'")
+            failures = _current_failures.get()
+            if failures is not None:
+                failures.append(self.name)
+        elif outcome != "ok":
+            print(f"{self.name}: 형식이 잘못된 LLM 응답을 {'로컬에서 보정' if outcome == 'repaired' else '교정 요청으로 복구'}했습니다.")
+        output_parse_stats.record(self.name, outcome, repair_calls)
+        return data
+
+    def parse(self, text: str) -> Optional[dict]:
+        data, repaired = self._try_parse(text)
+        outcome, repair_calls = ("repaired" if repaired else "ok"), 0
+        # 빈 응답은 교정할 내용이 없으므로 재시도하지 않음
+        while data is None and repair_calls < self.max_retries and text.strip():
+            repair_calls += 1
+            data, _ = self._try_parse(self.repair_chain.invoke(self._repair_input(text)))
+            outcome = "retried"
+        return self._finish(data, outcome, repair_calls, text)
+
+    async def aparse(self, text: str) -> Optional[dict]:
+        """parse의 비동기 버전"""
+        data, repaired = self._try_parse(text)
+        outcome, repair_calls = ("repaired" if repaired else "ok"), 0
+        while data is None and repair_calls < self.max_retries and text.strip():
+            repair_calls += 1
+            data, _ = self._try_parse(await self.repair_chain.ainvoke(self._repair_input(text)))
+            outcome = "retried"
+        return self._finish(data, outcome, repair_calls, text)
@@ -1,8 +1,31 @@
 import json
+import asyncio
+import threading
+import numpy as np
 import pandas as pd
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from boq.index import get_record_index, record_segments
+from boq.retrieval import get_candidate_retriever
+from agents.token_utils import estimate_row_tokens, estimate_rows_tokens
+from agents.instrumentation import chain_tag
+from agents.prompt_layout import DEFAULT_PROMPT_LAYOUT, check_prompt_layout, format_rows
+from agents.output_parser import JsonOutputParser, json_output_llm, DEFAULT_JSON_MODE, DEFAULT_REPAIR_RETRIES
+
+# LLM에 보낼 최대 후보 행 수 (None이면 깊이 1~4 행 전체를 보냄)
+DEFAULT_TOP_K = 200
+
+# 한 번의 LLM 호출에 넣을 공종 리스트의 최대 추정 토큰 수와, 청크를 동시에 보낼 최대 개수
+DEFAULT_CHUNK_TOKENS = 32000
+DEFAULT_MAX_CONCURRENCY = 4
+
+# drilldown 모드 기본값: 첫 단계에 보여줄 상위 단계 수, 최대 LLM 호출 단계 수, 전체 단계 합산 프롬프트 토큰 예산
+DRILLDOWN_START_LEVELS = 2
+DRILLDOWN_MAX_LEVELS = 4
+DRILLDOWN_MAX_PROMPT_TOKENS = 30000
+
 ###################### PROMPT ######################
 SYSTEM_PROMPT = """
 # [역할 정의]
@@ -44,38 +67,332 @@ HUMAN_PROMPT = """[사용자 원본 질문]
 
 위 [사용자 원본 질문]의 전체적인 의도를 파악하여, [분석 대상 키워드]와 가장 관련 있는 공종들을 [전체 공종 리스트]에서 찾아 규칙에 맞는 JSON 형식으로 반환하라.
 """
+
+DRILLDOWN_SYSTEM_PROMPT = """
+# [역할 정의]
+너는 건설 공정표를 위에서부터 단계적으로 탐색하는, 매우 정직하고 정확한 건설 공정표 분석 전문가다.
+지금 보이는 [현재 단계 공종 리스트]는 전체 공정표의 일부이며, 네가 펼치기로 선택한 공종의 하위 공종만 다음 단계에 보여진다.
+
+# [매우 중요한 규칙 (Grounding Rule)]
+- 답변은 반드시 [현재 단계 공종 리스트]에 **실제로 존재하는 데이터**에만 근거해야 한다.
+- 절대 목록에 없는 'record'나 '공종명'을 추측하거나 만들어내서는 안 된다.
+- 'OO교', 'XX터널'과 같이 구체적인 고유 명칭을 가진 항목은 최상위 공종으로 간주하여 'matching_records'에 포함한다.
+- '교량공', '구조물공'처럼 찾는 공종을 하위에 포함하고 있을 것으로 보이는 분류 항목은 'expand_records'에 포함한다.
+- 관련 없는 항목은 어디에도 포함하지 않는다.
+
+# [출력 규칙]
+- 아래 JSON 형식으로만 반환하고, 다른 설명이나 응답은 절대 추가하지 말 것
+
+# [JSON 출력 형식]
+{{
+  "matching_records": [
+    {{
+      "record": "실제 존재하는 record 값",
+      "name": "record 값에 해당하는 실제 공종명"
+    }}
+  ],
+  "expand_records": ["하위 공종을 더 살펴볼 record 값"]
+}}
+"""
+
+# prefix 레이아웃: 파일별 공종 리스트를 먼저 두어 같은 파일에 대한 질문들이 프롬프트 앞부분(시스템 + 공종 리스트)을 공유
+PREFIX_HUMAN_PROMPT = """[전체 공종 리스트] (각 행: record|공종명)
+{process_list}
+
+[사용자 원본 질문]
+{original_query}
+
+[분석 대상 키워드]
+'{keyword}'
+
+위 [사용자 원본 질문]의 전체적인 의도를 파악하여, [분석 대상 키워드]와 가장 관련 있는 공종들을 [전체 공종 리스트]에서 찾아 규칙에 맞는 JSON 형식으로 반환하라.
+"""
+
+DRILLDOWN_HUMAN_PROMPT = """[사용자 원본 질문]
+{original_query}
+
+[분석 대상 키워드]
+'{keyword}'
+
+[현재 단계 공종 리스트]
+{process_list}
+
+위 [사용자 원본 질문]의 전체적인 의도를 파악하여, [분석 대상 키워드]에 해당하는 공종은 'matching_records'에, 하위에 해당 공종이 있을 것으로 보이는 항목은 'expand_records'에 담아 규칙에 맞는 JSON 형식으로 반환하라.
+"""
+
+DRILLDOWN_PREFIX_HUMAN_PROMPT = """[현재 단계 공종 리스트] (각 행: record|공종명)
+{process_list}
+
+[사용자 원본 질문]
+{original_query}
+
+[분석 대상 키워드]
+'{keyword}'
+
+위 [사용자 원본 질문]의 전체적인 의도를 파악하여, [분석 대상 키워드]에 해당하는 공종은 'matching_records'에, 하위에 해당 공종이 있을 것으로 보이는 항목은 'expand_records'에 담아 규칙에 맞는 JSON 형식으로 반환하라.
+"""
+
+# 응답 JSON 스키마 (서버의 출력 형식 제약과 응답 검증에 사용)
+_RECORD_LIST_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"record": {"type": "string"}, "name": {"type": "string"}},
+        "required": ["record", "name"],
+    },
+}
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {"matching_records": _RECORD_LIST_SCHEMA},
+    "required": ["matching_records"],
+}
+DRILLDOWN_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "matching_records": _RECORD_LIST_SCHEMA,
+        "expand_records": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["matching_records"],
+}
 ####################################################
 
 class ProcessAgent:
-    def __init__(self, llm):
+    """
+    데이터에서 사용자가 요청한 공종의 상위 공종 후보를 LLM으로 찾는 에이전트
+    - flat: 깊이 1~4 행(사전 필터링 후 상위 top_k개)을 한 번에 보여주고 후보를 찾음
+      공종 리스트가 chunk_tokens를 넘으면 상위 record 경계로 나누어 청크들을 동시에 보내고 결과를 병합
+    - drilldown: 상위 단계부터 보여주고, LLM이 고른 분류 항목의 하위 공종만 단계적으로 펼쳐가며 찾음
+    prompt_layout="prefix"이면 공종 리스트를 질문보다 앞에 'record|공종명' 형식으로 넣음 (agents/prompt_layout.py)
+    응답은 JsonOutputParser로 읽음: 형식이 잘못된 응답은 로컬에서 보정하고, 그래도 안 되면 그 응답(청크/단계)만 교정 요청 (agents/output_parser.py)
+    """
+    def __init__(self, llm, top_k: Optional[int] = DEFAULT_TOP_K, search_mode: str = "flat",
+                 start_levels: int = DRILLDOWN_START_LEVELS, max_levels: int = DRILLDOWN_MAX_LEVELS,
+                 max_prompt_tokens: int = DRILLDOWN_MAX_PROMPT_TOKENS,
+                 chunk_tokens: int = DEFAULT_CHUNK_TOKENS, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 prompt_layout: str = DEFAULT_PROMPT_LAYOUT, json_mode: str = DEFAULT_JSON_MODE,
+                 repair_retries: int = DEFAULT_REPAIR_RETRIES):
+        if search_mode not in ("flat", "drilldown"):
+            raise ValueError(f"지원하지 않는 search_mode입니다: {search_mode}")
+        check_prompt_layout(prompt_layout)
         self.llm = llm
+        self.top_k = top_k
+        self.search_mode = search_mode
+        self.start_levels = start_levels
+        self.max_levels = max_levels
+        self.max_prompt_tokens = max_prompt_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.prompt_layout = prompt_layout
+        self.json_mode = json_mode
+        # 사전 필터링 전/후의 누적 프롬프트 토큰 추정치
+        self.prompt_tokens_full = 0
+        self.prompt_tokens_sent = 0
+        self._stats_lock = threading.Lock()
+        prefix = prompt_layout == "prefix"
         self.prompt_template = ChatPromptTemplate.from_messages([
             ("system", SYSTEM_PROMPT),
-            ("human", HUMAN_PROMPT)
+            ("human", PREFIX_HUMAN_PROMPT if prefix else HUMAN_PROMPT)
         ])        
-        self.chain = self.prompt_template | self.llm | StrOutputParser()
+        self.chain = (self.prompt_template | json_output_llm(self.llm, "process_agent", OUTPUT_SCHEMA, json_mode) | StrOutputParser()).with_config(tags=[chain_tag("process_agent")])
+        self.drilldown_prompt_template = ChatPromptTemplate.from_messages([
+            ("system", DRILLDOWN_SYSTEM_PROMPT),
+            ("human", DRILLDOWN_PREFIX_HUMAN_PROMPT if prefix else DRILLDOWN_HUMAN_PROMPT)
+        ])
+        self.drilldown_chain = (self.drilldown_prompt_template | json_output_llm(self.llm, "process_agent_drilldown", DRILLDOWN_OUTPUT_SCHEMA, json_mode)
+                                | StrOutputParser()).with_config(tags=[chain_tag("process_agent_drilldown")])
+        self.output_parser = JsonOutputParser("process_agent", self.llm, OUTPUT_SCHEMA, repair_retries, json_mode)
+        self.drilldown_output_parser = JsonOutputParser("process_agent_drilldown", self.llm, DRILLDOWN_OUTPUT_SCHEMA, repair_retries, json_mode)
     
     def find_parent_processes(self, original_query: str, keyword: str, full_data) -> list:
         print("ProcessAgent: 상위 공종 후보 검색 시작...")
-        
-        depth = full_data['record'].str.split('.').str.len()
-        filtered_data = full_data[depth.isin([1, 2, 3, 4])].copy()
-        process_list_str = filtered_data[['record', '공종명']].to_string(index=False)
+        if self.search_mode == "drilldown":
+            parent_record_objects = self._run_drill_down(self._drill_down(original_query, keyword, full_data))
+        else:
+            inputs = self._flat_inputs(original_query, keyword, full_data)
+            if len(inputs) == 1:
+                responses = [self.chain.invoke(inputs[0])]
+            else:
+                responses = self.chain.batch(inputs, config={"max_concurrency": self.max_concurrency})
+            # 읽지 못한 청크의 응답만 교정 요청 (청크 전체를 다시 보내지 않음)
+            parent_record_objects = self._merge_responses([self.output_parser.parse(self._log_response(r)) for r in responses])
+
+        print(f"ProcessAgent: {len(parent_record_objects)}개의 상위 공종 후보를 찾았습니다.")
+        return parent_record_objects
 
-        response_json_str = self.chain.invoke({
+    async def afind_parent_processes(self, original_query: str, keyword: str, full_data) -> list:
+        """find_parent_processes의 비동기 버전 (LLM 응답을 기다리는 동안 이벤트 루프를 막지 않음)"""
+        print("ProcessAgent: 상위 공종 후보 검색 시작...")
+        if self.search_mode == "drilldown":
+            parent_record_objects = await self._arun_drill_down(self._drill_down(original_query, keyword, full_data))
+        else:
+            inputs = self._flat_inputs(original_query, keyword, full_data)
+            if len(inputs) == 1:
+                responses = [await self.chain.ainvoke(inputs[0])]
+            else:
+                responses = await self.chain.abatch(inputs, config={"max_concurrency": self.max_concurrency})
+            parent_record_objects = self._merge_responses(await asyncio.gather(
+                *(self.output_parser.aparse(self._log_response(r)) for r in responses)))
+
+        print(f"ProcessAgent: {len(parent_record_objects)}개의 상위 공종 후보를 찾았습니다.")
+        return parent_record_objects
+
+    def _flat_inputs(self, original_query: str, keyword: str, full_data) -> list:
+        # flat 모드에서 LLM에 보낼 입력 목록 (공종 리스트가 크면 청크마다 하나씩)
+        filtered_data = self._select_rows(original_query, keyword, full_data)
+        chunks = self._split_into_chunks(filtered_data)
+        if len(chunks) > 1:
+            print(f"ProcessAgent: 공종 리스트를 {len(chunks)}개 청크로 나누어 검색 (최대 {self.max_concurrency}개 동시 실행)")
+        return [{
             "original_query": original_query, # 원본 질문 전달
             "keyword": keyword,
-            "process_list": process_list_str
-        }).strip()
+            "process_list": format_rows(chunk, self.prompt_layout)
+        } for chunk in chunks]
 
+    def _log_response(self, response_json_str: str) -> str:
+        response_json_str = response_json_str.strip()
         print(f"ProcessAgent: LLM이 반환한 후보 JSON: '{response_json_str}'")
-        
+        return response_json_str
+
+    def _merge_responses(self, responses: list) -> list:
+        # 청크별 응답(읽은 JSON, 끝내 읽지 못했으면 None)을 합치고 같은 record는 한 번만 포함 (청크 순서 = 원본 순서 유지)
+        merged, seen = [], set()
+        for response_data in responses:
+            if response_data is None:
+                continue
+            for record_object in response_data.get("matching_records", []):
+                if record_object.get("record") not in seen:
+                    seen.add(record_object.get("record"))
+                    merged.append(record_object)
+        return merged
+
+    def _split_into_chunks(self, rows: pd.DataFrame) -> list:
+        """공종 리스트를 chunk_tokens 이하의 청크들로 분할. 가능한 한 상위 record가 같은 행들은 같은 청크에 둠"""
+        row_tokens = estimate_row_tokens(rows)
+        if row_tokens.sum() <= self.chunk_tokens:
+            return [rows]
+
+        # record를 문자열로 나누는 대신 단계별 정수 코드로 비교 (깊이 = -1이 아닌 코드 수)
+        # first_diff[i]: i번째 행과 i+1번째 행의 record가 처음 달라지는 단계(0부터). level단계 상위 record가 다르면 first_diff < level
+        segments = record_segments(rows['record'])
+        depths = (segments >= 0).sum(axis=1)
+        differs = segments[1:] != segments[:-1]
+        first_diff = np.where(differs.any(axis=1), differs.argmax(axis=1), segments.shape[1])
+        cumulative = np.concatenate([[0], np.cumsum(row_tokens)])
+
+        def split(start: int, end: int, level: int) -> list:
+            # [start, end) 구간이 예산을 넘으면 level 단계 record가 바뀌는 경계에서 나눈 뒤 재귀적으로 분할
+            if cumulative[end] - cumulative[start] <= self.chunk_tokens or end - start == 1:
+                return [(start, end)]
+            if depths[start:end].max() < level:
+                # 더 나눌 단계가 없으면 행 단위로 분할
+                return [(i, i + 1) for i in range(start, end)]
+            changed = np.flatnonzero(first_diff[start:end - 1] < level) + 1
+            bounds = [start] + (start + changed).tolist() + [end]
+            return [unit for lo, hi in zip(bounds, bounds[1:]) for unit in split(lo, hi, level + 1)]
+
+        # 나눈 구간들을 순서대로 예산 안에서 최대한 합쳐 청크 수를 줄임
+        chunks, chunk_start = [], 0
+        for start, end in split(0, len(rows), 1):
+            if start > chunk_start and cumulative[end] - cumulative[chunk_start] > self.chunk_tokens:
+                chunks.append((chunk_start, start))
+                chunk_start = start
+        chunks.append((chunk_start, len(rows)))
+        return [rows.iloc[start:end] for start, end in chunks]
+
+    def _select_rows(self, original_query: str, keyword: str, full_data) -> pd.DataFrame:
+        # 깊이 1~4 행 중 키워드/질문과 관련 있는 상위 k개 행과 그 상위 공종만 프롬프트에 포함
+        retriever = get_candidate_retriever(full_data)
+        all_rows = full_data[['record', '공종명']].iloc[retriever.positions]
+        if self.top_k is None:
+            return all_rows
+
+        selected_rows = full_data[['record', '공종명']].iloc[retriever.select(keyword, original_query, self.top_k)]
+        self._report_prompt_tokens(f"후보 사전 필터링 {len(all_rows)}행 -> {len(selected_rows)}행",
+                                   estimate_rows_tokens(all_rows), estimate_rows_tokens(selected_rows))
+        return selected_rows
+
+    def _report_prompt_tokens(self, label: str, full_tokens: int, sent_tokens: int):
+        # 깊이 1~4 행 전체를 보냈을 때와 비교한 프롬프트 토큰 감소율을 누적하고 출력
+        with self._stats_lock:
+            self.prompt_tokens_full += full_tokens
+            self.prompt_tokens_sent += sent_tokens
+        reduction = 1 - sent_tokens / full_tokens if full_tokens else 0
+        print(f"ProcessAgent: {label} (공종 리스트 추정 토큰 {full_tokens:,} -> {sent_tokens:,}, {reduction:.0%} 감소)")
+
+    ############################ drilldown 모드 ############################
+    # _drill_down은 단계마다 LLM 입력을 yield하고 읽은 응답(JSON, 읽지 못했으면 None)을 받아 진행하는 제너레이터로,
+    # 같은 탐색 로직을 동기/비동기 실행에서 함께 사용
+    def _run_drill_down(self, steps) -> list:
         try:
-            response_data = json.loads(response_json_str)
-            parent_record_objects = response_data.get("matching_records", [])
-            print(f"ProcessAgent: {len(parent_record_objects)}개의 상위 공종 후보를 찾았습니다.")
-            return parent_record_objects
-        except json.JSONDecodeError:
-            print("ProcessAgent: LLM의 응답이 유효한 JSON 형식이 아닙니다.")
+            request = next(steps)
+            while True:
+                request = steps.send(self.drilldown_output_parser.parse(self.drilldown_chain.invoke(request)))
+        except StopIteration as done:
+            return done.value
+
+    async def _arun_drill_down(self, steps) -> list:
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(await self.drilldown_output_parser.aparse(await self.drilldown_chain.ainvoke(request)))
+        except StopIteration as done:
+            return done.value
+
+    def _child_positions(self, record_index, records: list) -> np.ndarray:
+        # 선택된 record들의 바로 아래 단계(깊이 + 1) 행만 (하위 공종 전체가 아니라)
+        children = [np.array([], dtype=np.int64)]
+        for record in records:
+            descendants = record_index.descendant_positions(record)
+            children.append(descendants[record_index.depths[descendants] == record_index.depth(record) + 1])
+        return np.unique(np.concatenate(children))
+
+    def _drill_down(self, original_query: str, keyword: str, full_data) -> list:
+        record_index = get_record_index(full_data)
+        if len(record_index) == 0:
             return []
-        
\ No newline at end of file
+        rows = full_data[['record', '공종명']]
+        # 첫 단계: 데이터의 최상위 깊이부터 start_levels개 단계
+        positions = np.flatnonzero(record_index.depths < record_index.depths.min() + self.start_levels)
+        shown = np.array([], dtype=np.int64)
+        names = {} # 지금까지 LLM에 보여준 record -> 공종명
+        matches, pending = [], []
+        used_tokens = 0
+
+        for level in range(1, self.max_levels + 1):
+            positions = positions[~np.isin(positions, shown)]
+            if len(positions) == 0:
+                break
+            level_rows = rows.iloc[positions]
+            level_tokens = estimate_rows_tokens(level_rows)
+            if used_tokens + level_tokens > self.max_prompt_tokens:
+                print(f"ProcessAgent: 토큰 예산({self.max_prompt_tokens:,}) 초과로 {level}단계 탐색 중단")
+                break
+            used_tokens += level_tokens
+            shown = np.concatenate([shown, positions])
+            level_names = dict(zip(level_rows['record'], level_rows['공종명']))
+            names.update(level_names)
+
+            response_data = (yield {
+                "original_query": original_query,
+                "keyword": keyword,
+                "process_list": format_rows(level_rows, self.prompt_layout)
+            }) or {}
+            print(f"ProcessAgent: {level}단계({len(level_rows)}행) LLM 응답: '{json.dumps(response_data, ensure_ascii=False)}'")
+
+            # 이번 단계에 실제로 보여준 record만 인정 (Grounding)
+            matches.extend(m for m in response_data.get("matching_records", []) if m.get("record") in level_names)
+            pending = [r for r in response_data.get("expand_records", []) if r in level_names]
+            if not pending:
+                break
+            positions = self._child_positions(record_index, pending)
+
+        # 단계/토큰 예산이 끝나 더 펼치지 못한 분류 항목은 그 자체를 후보로 반환
+        unexpanded = [r for r in pending if not np.isin(self._child_positions(record_index, [r]), shown).any()]
+        if unexpanded:
+            print(f"ProcessAgent: 더 펼치지 못한 {len(unexpanded)}개 항목을 후보에 포함")
+            matches.extend({"record": r, "name": names[r]} for r in unexpanded)
+
+        retriever = get_candidate_retriever(full_data)
+        full_tokens = estimate_rows_tokens(rows.iloc[retriever.positions])
+        self._report_prompt_tokens(f"단계별 탐색 {len(shown)}행", full_tokens, used_tokens)
+        return matches
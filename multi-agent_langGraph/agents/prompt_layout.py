@@ -0,0 +1,34 @@
+import json
+import pandas as pd
+
+# 프롬프트 구성 방식
+# - legacy: 질문/키워드 뒤에 공종 리스트(to_string 정렬 표)를 두고, 검증 후보는 들여쓴 JSON으로 전달 (기존 방식)
+# - prefix: 고정된 시스템 프롬프트 바로 뒤에 파일별 공종 리스트를 먼저 두고 질문/키워드는 마지막에 둠
+#           서버(vLLM 등)의 프리픽스 캐시가 같은 파일에 대한 다른 질문들의 앞부분을 재사용할 수 있고,
+#           행은 'record|공종명' 한 줄 형식으로 보내 공백 패딩 토큰을 없앰
+PROMPT_LAYOUTS = ("legacy", "prefix")
+DEFAULT_PROMPT_LAYOUT = "legacy"
+
+# prefix 레이아웃에서 행을 구분하는 문자 (공종명에 거의 등장하지 않는 문자)
+ROW_DELIMITER = "|"
+
+def check_prompt_layout(prompt_layout: str):
+    if prompt_layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"지원하지 않는 prompt_layout입니다: {prompt_layout}")
+
+def format_rows(rows: pd.DataFrame, prompt_layout: str) -> str:
+    """공종 행들을 프롬프트에 넣을 문자열로 변환. prefix 레이아웃은 헤더 한 줄 + 'record|공종명' 행 (컬럼 단위로 결합)"""
+    if prompt_layout != "prefix":
+        return rows.to_string(index=False)
+    lines = rows[rows.columns[0]].astype(str)
+    for column in rows.columns[1:]:
+        lines = lines + ROW_DELIMITER + rows[column].astype(str)
+    return "\n".join([ROW_DELIMITER.join(rows.columns), *lines.tolist()])
+
+def format_candidates(candidates: list, prompt_layout: str) -> str:
+    """검증할 후보 목록을 프롬프트에 넣을 문자열로 변환. prefix 레이아웃은 'record|name' 행 형식"""
+    if prompt_layout != "prefix":
+        return json.dumps(candidates, ensure_ascii=False, indent=4)
+    return "\n".join([f"record{ROW_DELIMITER}name"] + [
+        f"{candidate.get('record')}{ROW_DELIMITER}{candidate.get('name')}" for candidate in candidates
+    ])
@@ -0,0 +1,152 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import Optional
+
+# 파일명 토큰 비교 시 무시하는 문자 (공백, 하이픈, 밑줄)
+_SEPARATORS = re.compile(r'[\s\-_]+')
+# 부분 일치(문자 2-gram)로 인정하는 최소 비율
+FUZZY_THRESHOLD = 0.75
+
+# 여러 파일을 기반으로 한 일반 비용 분석을 나타내는 표현
+GENERAL_CUES = ("일반", "보통", "평균", "통상", "대략", "대체로", "전반")
+# '공사'를 붙이지 않고 언급되는 대상 (Orchestrator 프롬프트의 용어 정제 규칙과 동일하게 'OO 공사'로 변환)
+STRUCTURE_WORDS = ("교량", "다리", "터널", "배수", "토공", "포장", "옹벽", "암거", "교각", "방음벽", "가드레일")
+# 'OO 공사'에서 공종명이 아니라 공사 자체를 가리키는 말
+_NON_PROCESS_WORDS = ("이", "그", "저", "해당", "전체", "이번", "본", "총")
+
+def normalize(text: str) -> str:
+    return _SEPARATORS.sub('', text).lower()
+
+def _bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def _contains_token(query: str, token: str) -> bool:
+    # 숫자로 끝나는 토큰('q1', '남일1')은 뒤에 숫자가 이어지면 다른 토큰('q10')으로 봄
+    start = query.find(token)
+    while start != -1:
+        end = start + len(token)
+        if not (token[-1].isdigit() and end < len(query) and query[end].isdigit()):
+            return True
+        start = query.find(token, start + 1)
+    return False
+
+class FileResolver:
+    """
+    파일명에 포함된 프로젝트 토큰(예: 북일-남일1, Q1, S6, E1412)으로 질문이 가리키는 파일을 찾는 인덱스
+    - 파일명을 '_'로 나눈 토큰마다 IDF 가중치를 두어, 모든 파일에 공통인 토큰(조달청 등)은 점수에 거의 영향이 없음
+    - 토큰이 질문에 그대로 있으면 1, 숫자로 끝나지 않는 토큰은 문자 2-gram이 충분히 겹치면 부분 점수
+    """
+    def __init__(self, file_names: list):
+        self.file_names = list(file_names)
+        self._tokens = []
+        for file_name in self.file_names:
+            stem = os.path.splitext(file_name)[0]
+            tokens = {normalize(token) for token in stem.split('_')}
+            self._tokens.append({token for token in tokens if token})
+
+        document_frequency = Counter(token for tokens in self._tokens for token in tokens)
+        num_files = len(self.file_names)
+        self._idf = {token: math.log((num_files + 1) / (df + 0.5)) for token, df in document_frequency.items()}
+
+    def _token_score(self, query: str, query_bigrams: set, token: str) -> float:
+        if _contains_token(query, token):
+            return 1.0
+        if token[-1].isdigit() or len(token) < 3:
+            return 0.0
+        token_bigrams = _bigrams(token)
+        coverage = len(token_bigrams & query_bigrams) / len(token_bigrams)
+        return coverage if coverage >= FUZZY_THRESHOLD else 0.0
+
+    def _match(self, query: str) -> list:
+        """(파일명, 점수, 일치한 토큰 집합) 목록을 점수 내림차순으로 반환"""
+        query = normalize(query)
+        query_bigrams = _bigrams(query)
+        matches = []
+        for file_name, tokens in zip(self.file_names, self._tokens):
+            token_scores = {token: self._token_score(query, query_bigrams, token) for token in tokens}
+            matched = {token for token, score in token_scores.items() if score > 0}
+            score = sum(self._idf[token] * token_scores[token] for token in matched)
+            matches.append((file_name, score, matched))
+        return sorted(matches, key=lambda item: item[1], reverse=True)
+
+    def rank(self, query: str) -> list:
+        """(파일명, 점수) 목록을 점수 내림차순으로 반환"""
+        return [(file_name, score) for file_name, score, _ in self._match(query)]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """
+        질문이 가리키는 파일이 하나로 확실하면 그 파일명, 아니면 None
+        점수 1위가 유일하고, 질문에서 일치한 모든 토큰을 1위 파일이 갖고 있어야 함
+        (예: '북일-남일1 Q2'처럼 서로 다른 파일의 토큰이 섞여 있으면 애매한 것으로 판단)
+        """
+        matches = self._match(query)
+        if not matches or matches[0][1] <= 0:
+            return None
+        if len(matches) > 1 and matches[1][1] >= matches[0][1]:
+            return None
+        mentioned = set().union(*(matched for _, _, matched in matches))
+        if not mentioned <= matches[0][2]:
+            return None
+        return matches[0][0]
+
+    def top_files(self, query: str, n: int) -> list:
+        """LLM에 보낼 상위 n개 파일. 토큰 점수가 같으면 파일명 전체와 겹치는 문자 2-gram 수로 순위를 정함"""
+        query_bigrams = _bigrams(normalize(query))
+        def overlap(file_name: str) -> int:
+            return len(_bigrams(normalize(os.path.splitext(file_name)[0])) & query_bigrams)
+        ranked = sorted(self.rank(query), key=lambda item: (item[1], overlap(item[0])), reverse=True)
+        return [file_name for file_name, _ in ranked[:n]]
+
+    def tokens(self) -> set:
+        return set(self._idf)
+
+def extract_process_name(query: str, file_tokens: set = frozenset()) -> Optional[str]:
+    """
+    질문에서 분석 대상 공종명을 추출. 'OO공사'가 있으면 그대로, 대상만 있으면 'OO 공사'로 변환
+    file_tokens: 파일명 토큰 ('북일-남일 공사'의 '남일'처럼 프로젝트명을 공종명으로 오인하지 않기 위함)
+    """
+    # 한글 단어 + '공사' (예: '교량공사', '배수 공사')
+    for match in re.finditer(r"([가-힣]+)\s?공사", query):
+        word = match.group(1)
+        if word in _NON_PROCESS_WORDS or any(word in token for token in file_tokens):
+            continue
+        return match.group(0)
+    for word in STRUCTURE_WORDS:
+        if word in query:
+            return f"{word} 공사"
+    return None
+
+def classify_intent(query: str, has_file: bool) -> Optional[str]:
+    """규칙 기반 작업 분류. 단서가 없거나 서로 충돌하면 None"""
+    is_general = any(cue in query for cue in GENERAL_CUES)
+    if has_file and not is_general:
+        return "sub_process_extraction"
+    if is_general and not has_file:
+        return "general_cost_analysis"
+    return None
+
+class QueryRouter:
+    """
+    LLM 호출 없이 질문을 작업 계획으로 변환하는 규칙 기반 라우터
+    파일/작업 종류/공종명이 모두 확실할 때만 계획을 반환하고, 하나라도 애매하면 None (LLM으로 위임)
+    """
+    def __init__(self, file_names: list):
+        self.resolver = FileResolver(file_names)
+
+    def route(self, query: str) -> Optional[dict]:
+        ranked = self.resolver.rank(query)
+        mentions_file = bool(ranked) and ranked[0][1] > 0
+        file_name = self.resolver.resolve(query)
+        process_name = extract_process_name(query, self.resolver.tokens())
+        # 파일을 언급했지만 하나로 정해지지 않으면 LLM이 판단
+        if process_name is None or (mentions_file and file_name is None):
+            return None
+
+        task = classify_intent(query, has_file=file_name is not None)
+        if task == "sub_process_extraction":
+            return {"task": task, "parameters": {"file_name": file_name, "process_name": process_name}}
+        if task == "general_cost_analysis":
+            return {"task": task, "parameters": {"process_name": process_name}}
+        return None
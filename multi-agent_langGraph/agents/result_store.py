@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_process_name(process_name: str) -> str:
+    """'교량 공사'와 '교량공사'가 같은 결과를 쓰도록 공백을 제거하고 소문자로 통일"""
+    return _WHITESPACE.sub('', process_name or '').lower()
+
+def pipeline_signature(**settings) -> str:
+    """결과에 영향을 주는 설정(모델, 검색 모드 등)의 해시. 설정이 바뀌면 저장된 결과를 쓰지 않음"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
+class FileResultStore:
+    """
+    파일별 비용 분석 결과(검증된 상위 공종 목록과 각 하위 공종 비용 합계)를 저장하는 SQLite 저장소
+    - 키: 파일 내용 해시 + 정규화된 공종명 + 파이프라인 설정 해시
+      (파일 경로가 아닌 내용 기준이므로 파일이 바뀌면 자연히 새로 계산하고, 이름만 바뀐 파일은 그대로 재사용)
+    - ComputeAgent는 새 파일이나 바뀐 파일만 LLM으로 처리하고 나머지는 여기서 읽어 병합
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_results (
+                    content_hash TEXT NOT NULL,
+                    process_key TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    validated_processes TEXT NOT NULL,
+                    costs TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (content_hash, process_key, signature)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, content_hash: str, process_name: str, signature: str) -> Optional[dict]:
+        """저장된 결과 {"validated_processes", "costs"}. 없으면 None"""
+        key = (content_hash, normalize_process_name(process_name), signature)
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT validated_processes, costs FROM file_results "
+                "WHERE content_hash = ? AND process_key = ? AND signature = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"validated_processes": json.loads(row[0]), "costs": json.loads(row[1])}
+
+    def put(self, content_hash: str, process_name: str, signature: str, file_name: str,
+            validated_processes: list, costs: list):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO file_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, normalize_process_name(process_name), signature, file_name,
+                 json.dumps(validated_processes, ensure_ascii=False), json.dumps([float(cost) for cost in costs]),
+                 time.time())
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM file_results")
+            conn.commit()
+
+    def stats(self) -> dict:
+        if self._conn is None and not os.path.exists(self.db_path):
+            return {"hits": self.hits, "misses": self.misses, "entries": 0}
+        with self._lock:
+            count = self._connection().execute("SELECT COUNT(*) FROM file_results").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
@@ -0,0 +1,32 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# 오프라인 환경에서도 쓸 수 있도록 토크나이저 없이 토큰 수를 추정
+# (한글 음절은 약 1토큰, 그 외 문자는 약 4글자당 1토큰)
+_HANGUL_PATTERN = '[가-힣]'
+_HANGUL = re.compile(_HANGUL_PATTERN)
+_CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """문자열의 대략적인 프롬프트 토큰 수"""
+    hangul = len(_HANGUL.findall(text))
+    return hangul + math.ceil((len(text) - hangul) / _CHARS_PER_TOKEN)
+
+def estimate_row_tokens(rows: pd.DataFrame) -> np.ndarray:
+    """to_string으로 프롬프트에 넣을 각 행의 대략적인 토큰 수 (행마다 문자열을 만들지 않고 컬럼 단위로 계산)"""
+    hangul = np.zeros(len(rows))
+    others = np.zeros(len(rows))
+    for column in rows.columns:
+        values = rows[column]
+        column_hangul = values.str.count(_HANGUL_PATTERN).to_numpy(dtype=np.float64)
+        hangul += column_hangul
+        # 컬럼 사이 공백 1글자 포함
+        others += values.str.len().to_numpy(dtype=np.float64) - column_hangul + 1
+    return hangul + others / _CHARS_PER_TOKEN
+
+def estimate_rows_tokens(rows: pd.DataFrame) -> int:
+    """to_string으로 프롬프트에 넣을 행들의 대략적인 토큰 수"""
+    return math.ceil(estimate_row_tokens(rows).sum())
@@ -0,0 +1,144 @@
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from main import get_app, build_initial_state, GRAPH_CONFIG
+from agents.compute_agent import format_progress, summarize_progress
+from agents.instrumentation import instrumentation
+
+############################ 배치 실행 ############################
+def read_queries(input_path: str) -> list:
+    """JSONL 파일에서 질문 목록을 읽음. 각 행은 {"query": "..."} (선택적으로 "id")"""
+    queries = []
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            queries.append({"id": item.get("id", line_no), "query": item["query"]})
+    return queries
+
+async def run_one(item: dict, semaphore: asyncio.Semaphore) -> dict:
+    """
+    질문 하나를 그래프로 실행하고 결과와 노드별 소요 시간을 반환
+    노드가 끝날 때마다 전달되는 updates 이벤트 사이의 시간을 해당 노드의 소요 시간으로 기록
+    일반 비용 분석의 파일별 누적 통계(custom 이벤트)는 받는 대로 출력하고, 취소되면 마지막 통계를 부분 결과로 남김
+    """
+    async with semaphore:
+        started = time.perf_counter()
+        last_event = started
+        node_timings = {}
+        state = {}
+        progress = None
+        error = None
+        try:
+            async for mode, chunk in get_app().astream(build_initial_state(item["query"]), config=GRAPH_CONFIG,
+                                                       stream_mode=["updates", "values", "custom"]):
+                if mode == "values":
+                    state = chunk
+                    continue
+                if mode == "custom":
+                    progress = chunk
+                    print(f"  ({item['id']}) {format_progress(chunk)}")
+                    continue
+                now = time.perf_counter()
+                for node_name in chunk:
+                    node_timings[node_name] = round(node_timings.get(node_name, 0) + now - last_event, 4)
+                last_event = now
+        except asyncio.CancelledError:
+            error = "cancelled"
+            if state.get("task") == "general_cost_analysis":
+                state = {**state, "final_result": summarize_progress(progress)}
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - started
+
+    return {
+        "id": item["id"],
+        "query": item["query"],
+        "task": state.get("task"),
+        "parameters": state.get("parameters"),
+        "validated_records": state.get("validated_parents"),
+        "final_result": state.get("final_result"),
+        "cost_stats": state.get("cost_stats"),
+        "progress": progress,
+        "node_timings": node_timings,
+        "latency": round(latency, 4),
+        "error": error,
+    }
+
+async def run_batch(queries: list, output_path: str, concurrency: int, results: list) -> list:
+    """
+    질문들을 최대 concurrency개씩 동시에 실행하고 끝나는 순서대로 결과 파일에 기록하며 results에 추가
+    중간에 중단(Ctrl+C)되면 실행 중이던 질문도 취소하고 부분 결과와 함께 기록
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def write(f, result: dict):
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        f.flush()
+        results.append(result)
+        status = {None: "완료", "cancelled": "중단"}.get(result["error"], "오류")
+        print(f"[{len(results)}/{len(queries)}] {status} ({result['latency']:.2f}초): {result['query']}")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        pending = {asyncio.create_task(run_one(item, semaphore)) for item in queries}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    write(f, task.result())
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            # 세마포어를 기다리던(시작하지 않은) 질문은 CancelledError로 끝나므로 기록하지 않음
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, dict):
+                    write(f, result)
+            raise
+    return results
+
+def print_summary(results: list, elapsed: float):
+    latencies = np.array([r["latency"] for r in results])
+    cancelled = sum(1 for r in results if r["error"] == "cancelled")
+    failed = sum(1 for r in results if r["error"]) - cancelled
+    print("\n--- 배치 실행 결과 ---")
+    print(f" - 질문 수: {len(results)}개 (오류 {failed}개, 중단 {cancelled}개)")
+    print(f" - 전체 소요 시간: {elapsed:.2f}초")
+    if len(results):
+        print(f" - 처리량: {len(results) / elapsed:.2f} 질문/초")
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f" - 지연 시간: p50 {p50:.2f}초, p95 {p95:.2f}초, p99 {p99:.2f}초")
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 파일의 질문들을 일괄 실행하고 결과를 JSONL로 저장")
+    parser.add_argument("input", help='질문 JSONL 파일 (각 행: {"query": "...", "id": 선택})')
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="결과 JSONL 파일 경로")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="동시에 실행할 최대 질문 수")
+    parser.add_argument("--json-log", help="노드/LLM 호출 계측 이벤트를 기록할 JSONL 파일 경로 (지정하면 계측을 켬)")
+    parser.add_argument("--metrics", help="실행 후 Prometheus 텍스트 형식 지표를 저장할 파일 경로 (지정하면 계측을 켬)")
+    args = parser.parse_args()
+
+    if args.json_log or args.metrics:
+        instrumentation.enable(json_log=args.json_log)
+
+    queries = read_queries(args.input)
+    print(f"{len(queries)}개의 질문을 최대 {args.concurrency}개씩 동시에 실행합니다.")
+    started = time.perf_counter()
+    results = []
+    try:
+        asyncio.run(run_batch(queries, args.output, args.concurrency, results))
+    except KeyboardInterrupt:
+        print("\n중단됨: 지금까지의 결과만 저장합니다.")
+    print_summary(results, time.perf_counter() - started)
+    print(f"결과 저장 완료: {args.output}")
+    if args.metrics:
+        instrumentation.write_prometheus(args.metrics)
+        print(f"계측 지표 저장 완료: {args.metrics}")
+    instrumentation.close_sinks()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+파싱된 내역서의 메모리 사용량 벤치마크
+같은 합성 내역서를 세 가지 표현으로 읽고, 각각 별도 프로세스에서 상주 메모리(RSS) 증가량과
+데이터프레임 크기(memory_usage(deep=True))를 100만 행 기준으로 환산하여 비교
+ - object 문자열: 기존 행 단위 루프 파서 (모든 컬럼이 파이썬 문자열, total_cost도 문자열)
+ - arrow 문자열: 공종명/spec을 pyarrow string으로 유지하던 이전 parse_boq_file 결과
+ - 범주형 + int64: 현재 parse_boq_file 결과 (공종명/spec 사전 인코딩, 비용 int64)
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import os
+import gc
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+from benchmarks.synthetic import write_synthetic_boq
+
+def _rss_bytes():
+    # 리눅스의 /proc 정보로 현재 RSS를 읽음. 지원하지 않는 환경이면 None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _load(representation: str, file_path: str):
+    from boq.parser import parse_boq_file, STRING_DTYPE, CATEGORY_COLUMNS
+    from benchmarks.bench_parser import legacy_parse
+    if representation == "object":
+        return legacy_parse(file_path)
+    df = parse_boq_file(file_path)
+    if representation == "arrow":
+        df = df.astype({column: STRING_DTYPE for column in CATEGORY_COLUMNS})
+    return df
+
+def _measure(representation: str, file_path: str, queue):
+    # 모듈 import 등으로 늘어나는 메모리를 빼기 위해, 필요한 모듈을 먼저 읽어 둔 뒤 측정
+    _load("categorical", file_path)
+    gc.collect()
+    before = _rss_bytes()
+    start = time.perf_counter()
+    df = _load(representation, file_path)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    after = _rss_bytes()
+    queue.put({
+        "rows": len(df),
+        "seconds": elapsed,
+        "rss": after - before if before is not None and after is not None else None,
+        "frame": int(df.memory_usage(deep=True).sum()),
+        "columns": {column: int(size) for column, size in df.memory_usage(deep=True, index=False).items()},
+    })
+
+def measure(representation: str, file_path: str) -> dict:
+    # 표현마다 새 프로세스에서 측정하여 앞선 측정의 메모리가 섞이지 않도록 함
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(representation, file_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="파싱된 내역서의 메모리 사용량 비교")
+    parser.add_argument("--rows", type=int, default=1000000, help="합성 내역서의 대략적인 행 수")
+    parser.add_argument("--depth", type=int, default=6, help="record 계층 깊이")
+    args = parser.parse_args()
+
+    labels = {"object": "object 문자열", "arrow": "arrow 문자열", "categorical": "범주형 + int64"}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "synthetic_boq.txt")
+        write_synthetic_boq(file_path, args.rows, args.depth)
+        size_mb = os.path.getsize(file_path) / 1024 / 1024
+        results = {representation: measure(representation, file_path) for representation in labels}
+
+    rows = results["categorical"]["rows"]
+    scale = 1_000_000 / rows
+    print(f"행 수: {rows:,} ({size_mb:.1f} MB), 100만 행 기준으로 환산")
+    for representation, label in labels.items():
+        result = results[representation]
+        rss = f"{result['rss'] * scale / 1024 / 1024:8.1f} MB" if result['rss'] is not None else "       -   "
+        columns = ", ".join(f"{column} {size * scale / 1024 / 1024:.1f}" for column, size in result["columns"].items())
+        print(f" - {label:<14}: RSS 증가 {rss}, 데이터프레임 {result['frame'] * scale / 1024 / 1024:8.1f} MB "
+              f"({columns}), 로딩 {result['seconds']:.2f}s")
+
+    base, current = results["arrow"], results["categorical"]
+    print(f" - 이전 표현 대비 데이터프레임 크기 {current['frame'] / base['frame']:.0%}"
+          + (f", RSS 증가량 {current['rss'] / base['rss']:.0%}" if base['rss'] and current['rss'] is not None else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+공사 내역서 파서 벤치마크
+기존의 행 단위 파이썬 루프 파서와 boq.parser.parse_boq_file 의 파싱 시간을 비교
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python -m benchmarks.bench_parser --rows 300000 --repeat 3
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import pandas as pd
+
+from boq.parser import parse_boq_file
+from boq.cache import ParsedFileCache
+
+PROCESS_NAMES = ["무근콘크리트", "철근가공조립", "거푸집", "터파기", "되메우기", "아스팔트포장", "구림교", "남정교", "XX터널"]
+SPECS = ["T=30cm 미만(기계 100%)", "D13", "합판 3회", "토사", "", "L=120m"]
+
+def write_synthetic_boq(file_path: str, rows: int, seed: int = 0):
+    """record: 공종명; spec; cost 형식의 임의 내역서 파일 생성"""
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for i in range(rows):
+            record = f"토목.{i // 100000 + 1:02d}.{i // 1000 % 100:02d}.{i // 10 % 100:02d}.{i % 10:02d}"
+            f.write(f"{record}: ...-1. {rng.choice(PROCESS_NAMES)}; {rng.choice(SPECS)}; {rng.randint(0, 10**8)}\n")
+
+def legacy_parse(file_path: str) -> pd.DataFrame:
+    # 기존 Orchestrator._load_data 의 행 단위 파싱 루프
+    records = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            
+            parts = line.split(':', 1)
+            if len(parts) != 2: continue
+            record_id = parts[0].strip()
+            
+            rest_parts = parts[1].split(';')
+            
+            process_name = rest_parts[0].strip() if len(rest_parts) > 0 else "None"
+            spec = rest_parts[1].strip() if len(rest_parts) > 1 else "None"
+            total_cost = rest_parts[2].strip() if len(rest_parts) > 2 else "0"
+            
+            records.append({
+                'record': record_id, 
+                '공종명': process_name, 
+                'spec': spec,
+                'total_cost': total_cost
+            })
+    return pd.DataFrame(records)
+
+def best_time(func, file_path: str, repeat: int):
+    # CPU 경합의 영향을 줄이기 위해 여러 번 실행한 뒤 최솟값을 사용
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(file_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description="공사 내역서 파서 벤치마크")
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "synthetic_boq.txt")
+        write_synthetic_boq(file_path, args.rows)
+        size_mb = os.path.getsize(file_path) / 1024 / 1024
+
+        # 이전 결과가 메모리에 남아 다음 측정에 영향을 주지 않도록 비교에 필요한 값만 보관
+        new_time, new_df = best_time(parse_boq_file, file_path, args.repeat)
+        new_rows = new_df.astype({'total_cost': 'int64'}).astype(object).values.tolist()
+        del new_df
+        legacy_time, legacy_df = best_time(legacy_parse, file_path, args.repeat)
+        legacy_df['total_cost'] = pd.to_numeric(legacy_df['total_cost'])
+        legacy_rows = legacy_df.values.tolist()
+        del legacy_df
+
+        # 디스크 캐시가 채워진 뒤의 로딩 시간 (memory map 읽기)
+        parsed_cache = ParsedFileCache(os.path.join(tmp_dir, ".boq_cache"))
+        parsed_cache.load(file_path)
+        cached_time, cached_df = best_time(parsed_cache.load, file_path, args.repeat)
+        del cached_df
+
+    # 두 파서의 결과가 동일한지 확인
+    assert new_rows == legacy_rows, "기존 파서와 파싱 결과가 다릅니다."
+
+    print(f"행 수: {args.rows:,} ({size_mb:.1f} MB), 반복: {args.repeat}회 중 최솟값")
+    print(f" - 기존 루프 파서     : {legacy_time:.3f}s")
+    print(f" - parse_boq_file     : {new_time:.3f}s")
+    print(f" - 속도 향상          : {legacy_time / new_time:.1f}x")
+    print(f" - 디스크 캐시 로딩   : {cached_time:.3f}s ({legacy_time / cached_time:.0f}x)")
+
+if __name__ == "__main__":
+    main()
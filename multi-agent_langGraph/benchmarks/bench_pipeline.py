@@ -0,0 +1,211 @@
+"""
+전체 파이프라인 오프라인 벤치마크
+합성 내역서(benchmarks.synthetic)와 가짜 채팅 모델(benchmarks.fake_llm)로 네트워크 없이
+파싱 -> 인덱스 생성 -> 메인 그래프(app) -> 비용 분석 서브그래프(ComputeAgent)를 실행하고 아래 항목을 측정
+ - 파일별 파싱 시간, record 인덱스/후보 검색 인덱스 생성 시간, 코퍼스 적재 및 전체 프로젝트 검색 시간
+ - 노드별 지연 시간 (질문을 하나씩 실행했을 때의 평균)
+ - 프롬프트 종류별 호출 수와 추정 토큰 수
+ - 에이전트별 응답 파싱 결과 (--malformed-rate로 형식이 잘못된 응답을 섞었을 때의 로컬 보정/교정 요청/실패 수)
+ - 질문을 동시에 실행했을 때의 처리량과 지연 시간, 서브그래프 단독 실행 시간
+ - 파일별 결과 저장소: 처음 실행 / 다시 실행 / 파일 하나를 추가한 뒤 실행했을 때의 시간과 LLM 호출 수
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python -m benchmarks.bench_pipeline --files 8 --rows 20000 --depth 6 --latency 0.2
+"""
+import io
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from collections import defaultdict
+
+import numpy as np
+
+import main
+from ingest import ingest
+from batch_runner import run_one
+from boq.corpus import CorpusStore
+from boq.parser import parse_boq_file
+from boq.index import RecordIndex
+from boq.retrieval import CandidateRetriever
+from agents.prompt_layout import PROMPT_LAYOUTS, DEFAULT_PROMPT_LAYOUT
+from agents.output_parser import output_parse_stats
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.synthetic import write_synthetic_boq, synthetic_file_name, write_synthetic_corpus
+
+def build_queries(file_names: list) -> list:
+    """파일별 세부 공종 추출 질문과 일반 비용 분석 질문 (파일 토큰이 섞여 LLM 라우팅으로 넘어가는 질문 포함)"""
+    queries = []
+    for i, _ in enumerate(file_names):
+        queries.append(f"북일-남일{i} Q{i} 공사에서 교량공사" if i % 2 == 0 else f"북일-남일{i} Q{i}의 터널 공사 세부 공종")
+    if len(file_names) > 1:
+        queries.append("북일-남일0 Q1에서 다리는 어떻게 돼가?")
+    queries += ["일반적인 교량 공사 비용", "보통 터널 공사 비용은 얼마나 들어?"]
+    return [{"id": i, "query": query} for i, query in enumerate(queries, 1)]
+
+def bench_parse_and_index(data_dir: str, file_names: list) -> dict:
+    parse_times, record_index_times, retriever_times, rows = [], [], [], 0
+    for file_name in file_names:
+        start = time.perf_counter()
+        df = parse_boq_file(os.path.join(data_dir, file_name))
+        parse_times.append(time.perf_counter() - start)
+        rows += len(df)
+
+        # 전역 캐시(FrameCache)를 거치지 않고 생성 시간만 측정
+        start = time.perf_counter()
+        RecordIndex(df['record'], df['total_cost'])
+        record_index_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        CandidateRetriever(df)
+        retriever_times.append(time.perf_counter() - start)
+    return {"rows": rows, "parse": parse_times, "record_index": record_index_times, "retriever": retriever_times}
+
+def bench_corpus(data_dir: str) -> dict:
+    """코퍼스 적재 시간과 전체 프로젝트 공종명 검색 시간 (첫 검색은 역색인 생성 포함)"""
+    start = time.perf_counter()
+    ingest(data_dir)
+    ingest_time = time.perf_counter() - start
+
+    corpus = CorpusStore(os.path.join(data_dir, ".boq_cache"))
+    search_times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        rows = corpus.search("교", depths=(1, 2, 3, 4))
+        search_times.append(time.perf_counter() - start)
+    return {"ingest": ingest_time, "search_cold": search_times[0], "search": search_times[1], "matches": len(rows)}
+
+async def run_queries(queries: list, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(item, semaphore) for item in queries))
+    return results, time.perf_counter() - start
+
+@contextlib.contextmanager
+def quiet(verbose: bool):
+    # 에이전트들의 진행 로그가 결과 표를 가리지 않도록 표준 출력을 버림
+    if verbose:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def print_timings(title: str, values: list):
+    values = np.array(values) * 1000
+    print(f" - {title:<22}: 합계 {values.sum():8.1f}ms, 파일당 평균 {values.mean():7.1f}ms, 최대 {values.max():7.1f}ms")
+
+def run_compute(compute_input: dict, llm: FakeChatModel) -> tuple:
+    """서브그래프를 한 번 실행하고 (최종 상태, 실행 시간, LLM 호출 수)를 반환"""
+    llm.reset()
+    start = time.perf_counter()
+    compute_state = asyncio.run(main.compute_agent.arun(compute_input))
+    return compute_state, time.perf_counter() - start, len(llm.calls())
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="합성 데이터와 가짜 LLM으로 전체 파이프라인 성능 측정")
+    parser.add_argument("--files", type=int, default=6, help="생성할 내역서 파일 수")
+    parser.add_argument("--rows", type=int, default=5000, help="파일당 대략적인 행 수")
+    parser.add_argument("--depth", type=int, default=5, help="record 계층 깊이")
+    parser.add_argument("--structures", type=int, default=3, help="대분류별 고유 명칭 구조물(OO교, XX터널) 수")
+    parser.add_argument("--latency", type=float, default=0.1, help="가짜 LLM 호출당 지연 시간(초)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="처리량 측정 시 동시에 실행할 질문 수")
+    parser.add_argument("--search-mode", choices=["flat", "drilldown"], default="flat", help="ProcessAgent 검색 모드")
+    parser.add_argument("--prompt-layout", choices=list(PROMPT_LAYOUTS), default=DEFAULT_PROMPT_LAYOUT, help="프롬프트 구성 방식")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="가짜 LLM이 형식이 잘못된 응답을 반환하는 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="에이전트 로그 출력")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        corpus = write_synthetic_corpus(data_dir, args.files, args.rows, args.depth, args.structures, args.seed)
+        file_names = sorted(corpus)
+        parse_stats = bench_parse_and_index(data_dir, file_names)
+        with quiet(args.verbose):
+            corpus_stats = bench_corpus(data_dir)
+
+        llm = FakeChatModel(latency=args.latency, malformed_rate=args.malformed_rate)
+        output_parse_stats.reset()
+        main.build_agents(data_dir, llm=llm, prompt_layout=args.prompt_layout)
+        main.process_agent.search_mode = args.search_mode
+        queries = build_queries(file_names)
+
+        # 1) 질문을 하나씩 실행하여 노드별 지연 시간과 프롬프트 크기 측정 (첫 실행이므로 파싱/인덱스 생성 포함)
+        with quiet(args.verbose):
+            sequential_results, sequential_time = asyncio.run(run_queries(queries, 1))
+        prompt_stats = llm.prompt_stats()
+
+        # 2) 같은 질문들을 동시에 실행하여 처리량 측정 (파싱/인덱스는 캐시됨)
+        with quiet(args.verbose):
+            concurrent_results, concurrent_time = asyncio.run(run_queries(queries, args.concurrency))
+
+        # 3) 비용 분석 서브그래프 단독 실행: 저장된 결과 없이 / 전부 재사용 / 파일 하나 추가 후
+        compute_input = {
+            "original_query": "일반적인 교량 공사 비용",
+            "target_process_name": "교량 공사",
+            "available_files": file_names,
+            "data_dir": data_dir,
+        }
+        main.compute_agent.result_store.clear()
+        with quiet(args.verbose):
+            compute_state, compute_time, compute_calls = run_compute(compute_input, llm)
+            _, warm_time, warm_calls = run_compute(compute_input, llm)
+
+            new_file = synthetic_file_name(args.files)
+            corpus[new_file] = write_synthetic_boq(os.path.join(data_dir, new_file), args.rows, args.depth,
+                                                   args.structures, args.seed + args.files)
+            incremental_input = dict(compute_input, available_files=file_names + [new_file])
+            incremental_state, incremental_time, incremental_calls = run_compute(incremental_input, llm)
+
+    errors = [r for r in sequential_results + concurrent_results if r["error"]]
+    expected_bridges = sum(len(corpus[file_name]["structures"]["교"]) for file_name in file_names)
+
+    print(f"합성 데이터: 파일 {args.files}개, 총 {parse_stats['rows']:,}행 (파일당 약 {args.rows:,}행, 깊이 {args.depth}), "
+          f"가짜 LLM 지연 {args.latency}s, 검색 모드 {args.search_mode}, 프롬프트 {args.prompt_layout}")
+
+    print("\n[파싱/인덱스]")
+    print_timings("parse_boq_file", parse_stats["parse"])
+    print_timings("RecordIndex", parse_stats["record_index"])
+    print_timings("CandidateRetriever", parse_stats["retriever"])
+    print(f" - {'코퍼스 적재':<22}: {corpus_stats['ingest'] * 1000:8.1f}ms (ingest.py, 이후 질문은 코퍼스에서 파일을 읽음)")
+    print(f" - {'코퍼스 검색':<22}: {corpus_stats['search'] * 1000:8.1f}ms (첫 검색 {corpus_stats['search_cold'] * 1000:.1f}ms, "
+          f"'교' 포함 깊이 1~4 공종 {corpus_stats['matches']}행)")
+
+    print("\n[노드별 지연 시간] (질문을 하나씩 실행)")
+    node_timings = defaultdict(list)
+    for result in sequential_results:
+        for node_name, seconds in result["node_timings"].items():
+            node_timings[node_name].append(seconds)
+    for node_name, values in node_timings.items():
+        print(f" - {node_name:<22}: 평균 {np.mean(values) * 1000:8.1f}ms ({len(values)}회)")
+
+    print("\n[프롬프트 크기] (추정 토큰)")
+    for kind, stats in prompt_stats.items():
+        print(f" - {kind:<22}: {stats['calls']}회, 평균 {stats['mean_tokens']:,.0f}, 최대 {stats['max_tokens']:,}, 합계 {stats['total_tokens']:,}")
+
+    print(f"\n[응답 파싱] (형식이 잘못된 응답 비율 {args.malformed_rate:.0%})")
+    for name, counts in output_parse_stats.summary().items():
+        print(f" - {name:<22}: 정상 {counts['ok']}, 로컬 보정 {counts['repaired']}, 교정 요청으로 복구 {counts['retried']}, "
+              f"실패 {counts['failed']} (실패율 {counts['failure_rate']:.1%}, 교정 요청 {counts['repair_calls']}회)")
+
+    print("\n[처리량]")
+    for label, results, elapsed in (("순차 실행 (c=1)", sequential_results, sequential_time),
+                                    (f"동시 실행 (c={args.concurrency})", concurrent_results, concurrent_time)):
+        p50, p95 = np.percentile([r["latency"] for r in results], [50, 95])
+        print(f" - {label:<22}: {len(results) / elapsed:6.2f} 질문/초, 전체 {elapsed:6.2f}s, 지연 p50 {p50:.2f}s, p95 {p95:.2f}s")
+    print(f" - {'ComputeAgent 서브그래프':<22}: 파일 {len(file_names)}개 {compute_time:.2f}s ({len(file_names) / compute_time:.1f} 파일/초)")
+
+    print("\n[파일별 결과 저장소] (ComputeAgent 서브그래프)")
+    for label, elapsed, calls in (("처음 실행", compute_time, compute_calls),
+                                  ("다시 실행 (전부 재사용)", warm_time, warm_calls),
+                                  ("파일 1개 추가 후", incremental_time, incremental_calls)):
+        print(f" - {label:<22}: {elapsed * 1000:8.1f}ms, LLM 호출 {calls}회")
+
+    print("\n[결과 확인]")
+    print(f" - 오류: {len(errors)}건")
+    print(f" - 생성된 교량 수: {expected_bridges}개")
+    print(" - 서브그래프 결과: " + compute_state.get("final_result", "").replace("\n", " "))
+    print(" - 파일 추가 후 결과: " + incremental_state.get("final_result", "").replace("\n", " "))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,134 @@
+"""
+프롬프트 구성 방식(prompt_layout) 벤치마크
+같은 합성 내역서와 여러 질문으로 ProcessAgent/EvaluatorAgent가 LLM에 보낼 프롬프트를 (LLM 호출 없이) 만들고
+legacy / prefix 레이아웃별로 아래 항목을 비교
+ - 프롬프트 종류별 평균 토큰 수 (flat 전체 행, flat 상위 top_k행, drilldown 첫 단계, 검증 후보 목록)
+ - 프리픽스 캐시를 가정했을 때 새로 계산해야 하는 토큰 수: 같은 파일에 대해 앞서 보낸 프롬프트와
+   겹치는 가장 긴 앞부분(block 토큰 단위)을 제외한 나머지
+ - 위 토큰 수를 --prefill-tps(초당 프리필 토큰)로 나눈 추정 프리필 지연 시간
+
+토크나이저는 tiktoken(o200k_base)을 사용하고, 인코딩을 내려받을 수 없는 오프라인 환경에서는
+agents.token_utils의 추정 방식(한글 음절 1토큰, 그 외 약 4글자 1토큰)으로 나눈 조각을 토큰으로 사용
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python -m benchmarks.bench_prompt --rows 20000 --depth 6 --top-k 200
+"""
+import io
+import os
+import re
+import argparse
+import tempfile
+import contextlib
+
+import numpy as np
+
+from boq.parser import parse_boq_file
+from agents.process_agent import ProcessAgent
+from agents.evaluator_agent import EvaluatorAgent
+from agents.prompt_layout import PROMPT_LAYOUTS
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.synthetic import write_synthetic_boq, synthetic_file_name
+
+# (질문, 키워드) 목록. 같은 파일에 대해 서로 다른 질문이 이어지는 상황을 가정
+QUERIES = [
+    ("교량 공사 비용 알려줘", "교량"),
+    ("터널 공사 세부 공종", "터널"),
+    ("토공 작업은 얼마나 들어?", "토공"),
+    ("배수 시설 공사비", "배수"),
+    ("포장 공사는 어떻게 돼가?", "포장"),
+    ("다리 상부 공사 비용", "다리"),
+]
+
+# 인코딩이 없을 때 추정 토큰 조각: 한글 음절 하나, 또는 한글이 아닌 문자 최대 4글자
+_PSEUDO_TOKEN = re.compile(r"[가-힣]|[^가-힣]{1,4}", re.S)
+
+def load_tokenizer():
+    """(토큰 목록을 돌려주는 함수, 이름). tiktoken 인코딩을 쓸 수 없으면 추정 조각으로 대체"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return encoding.encode, "tiktoken o200k_base"
+    except Exception:
+        return _PSEUDO_TOKEN.findall, "추정 토큰 (tiktoken 인코딩을 불러올 수 없음)"
+
+def render(messages) -> str:
+    # 채팅 메시지를 서버가 받는 순서대로 이어 붙인 문자열 (역할 이름 + 내용)
+    return "".join(f"<{message.type}>\n{message.content}\n" for message in messages)
+
+def common_prefix(a: list, b: list) -> int:
+    size = min(len(a), len(b))
+    if not size:
+        return 0
+    differs = np.flatnonzero(np.asarray(a[:size]) != np.asarray(b[:size]))
+    return int(differs[0]) if len(differs) else size
+
+def uncached_tokens(prompts: list, block: int) -> list:
+    """앞서 보낸 프롬프트들과 겹치는 가장 긴 앞부분(block 단위로 내림)을 제외하고 새로 계산할 토큰 수"""
+    uncached = []
+    for i, tokens in enumerate(prompts):
+        shared = max((common_prefix(tokens, previous) for previous in prompts[:i]), default=0)
+        uncached.append(len(tokens) - shared // block * block)
+    return uncached
+
+def build_prompts(data, structures: dict, layout: str, top_k: int) -> dict:
+    """프롬프트 종류 -> 질문 순서대로 만든 채팅 메시지 목록"""
+    llm = FakeChatModel()
+    full = ProcessAgent(llm, top_k=None, prompt_layout=layout)
+    selected = ProcessAgent(llm, top_k=top_k, prompt_layout=layout)
+    drilldown = ProcessAgent(llm, search_mode="drilldown", prompt_layout=layout)
+    evaluator = EvaluatorAgent(llm, prompt_layout=layout)
+    candidates = [{"record": record, "name": name} for pairs in structures.values() for record, name in pairs]
+
+    prompts = {"flat (전체 행)": [], f"flat (상위 {top_k}행)": [], "drilldown 첫 단계": [], "검증 후보 목록": []}
+    # 진행 로그가 결과 표를 가리지 않도록 표준 출력을 버림
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query, keyword in QUERIES:
+            for kind, agent in (("flat (전체 행)", full), (f"flat (상위 {top_k}행)", selected)):
+                for chain_input in agent._flat_inputs(query, keyword, data):
+                    prompts[kind].append(agent.prompt_template.format_messages(**chain_input))
+            first_step = next(drilldown._drill_down(query, keyword, data))
+            prompts["drilldown 첫 단계"].append(drilldown.drilldown_prompt_template.format_messages(**first_step))
+            prompts["검증 후보 목록"].append(evaluator.prompt_template.format_messages(
+                **evaluator._chain_input(query, candidates, keyword)))
+    return prompts
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="프롬프트 구성 방식별 토큰 수와 프리픽스 캐시 효과 비교")
+    parser.add_argument("--rows", type=int, default=5000, help="합성 내역서의 대략적인 행 수")
+    parser.add_argument("--depth", type=int, default=5, help="record 계층 깊이")
+    parser.add_argument("--structures", type=int, default=3, help="대분류별 고유 명칭 구조물(OO교, XX터널) 수")
+    parser.add_argument("--top-k", type=int, default=200, help="사전 필터링 후 프롬프트에 넣을 행 수")
+    parser.add_argument("--block", type=int, default=16, help="프리픽스 캐시 블록 크기(토큰)")
+    parser.add_argument("--prefill-tps", type=float, default=5000, help="추정 지연 계산에 사용할 초당 프리필 토큰 수")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenize, tokenizer_name = load_tokenizer()
+    with tempfile.TemporaryDirectory() as data_dir:
+        file_path = os.path.join(data_dir, synthetic_file_name(0))
+        info = write_synthetic_boq(file_path, args.rows, args.depth, args.structures, args.seed)
+        data = parse_boq_file(file_path)
+
+    print(f"합성 데이터: {info['rows']:,}행 (깊이 {args.depth}), 질문 {len(QUERIES)}개, 토크나이저: {tokenizer_name}")
+    print(f"프리픽스 캐시 블록 {args.block}토큰, 추정 프리필 속도 {args.prefill_tps:,.0f} 토큰/초\n")
+
+    results = {}
+    for layout in PROMPT_LAYOUTS:
+        for kind, messages in build_prompts(data, info["structures"], layout, args.top_k).items():
+            prompts = [tokenize(render(message)) for message in messages]
+            total = sum(len(tokens) for tokens in prompts)
+            uncached = sum(uncached_tokens(prompts, args.block))
+            results[kind, layout] = (total / len(prompts), total, uncached)
+
+    kinds = dict.fromkeys(kind for kind, _ in results)
+    for kind in kinds:
+        print(f"[{kind}]")
+        base_mean, _, base_uncached = results[kind, PROMPT_LAYOUTS[0]]
+        for layout in PROMPT_LAYOUTS:
+            mean, total, uncached = results[kind, layout]
+            print(f" - {layout:<8}: 평균 {mean:9,.0f}토큰 ({mean / base_mean - 1:+.0%}), "
+                  f"새로 계산 {uncached:9,}/{total:,}토큰 ({uncached / base_uncached - 1:+.0%}), "
+                  f"추정 프리필 {uncached / args.prefill_tps:6.2f}s")
+
+if __name__ == "__main__":
+    main_cli()
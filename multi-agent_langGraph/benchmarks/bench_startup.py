@@ -0,0 +1,120 @@
+"""
+시작(콜드 스타트) 시간 벤치마크
+단계별로 새 파이썬 프로세스를 띄워 아래 시간을 반복 측정(중앙값)하고, `python -X importtime` 결과를
+최상위 패키지별로 합쳐 어떤 모듈이 시작 시간을 차지하는지 보여줌
+ - 인터프리터만: python -c pass (비교 기준)
+ - import main: 스크립트/테스트가 main을 불러오는 시간 (무거운 모듈은 처음 사용할 때 불러옴)
+ - 첫 입력 프롬프트: python main.py 실행 후 '입력:'이 출력될 때까지 (time-to-first-prompt)
+ - import pipeline: 그래프/에이전트 모듈 전체를 불러오는 시간 (pandas, langchain, langgraph 포함)
+ - 에이전트 생성 + 그래프 컴파일: 가짜 LLM으로 build_agents와 get_app까지
+ - 첫 질문 응답: 합성 내역서에 세부 공종 추출 질문 하나를 가짜 LLM으로 실행하여 결과를 받을 때까지
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python -m benchmarks.bench_startup --repeat 5 --top 12
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.synthetic import write_synthetic_corpus
+
+# multi-agent_langGraph 디렉토리 (하위 프로세스가 main, pipeline, benchmarks를 불러오는 위치)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT_MARKER = "입력:".encode("utf-8")
+
+# (단계 이름, 실행할 코드). {data_dir}는 합성 내역서 폴더로 바뀜
+STAGES = [
+    ("인터프리터만", "pass"),
+    ("import main", "import main"),
+    ("import pipeline", "import pipeline"),
+    ("에이전트 생성 + 그래프 컴파일", (
+        "import main\n"
+        "from benchmarks.fake_llm import FakeChatModel\n"
+        "main.build_agents({data_dir!r}, llm=FakeChatModel())\n"
+        "main.get_app()\n"
+    )),
+    ("첫 질문 응답 (가짜 LLM)", (
+        "import io, contextlib, main\n"
+        "from benchmarks.fake_llm import FakeChatModel\n"
+        "main.build_agents({data_dir!r}, llm=FakeChatModel())\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    state = main.run_query('북일-남일0 Q0 공사에서 교량공사')\n"
+        "assert state.get('validated_parents'), '검증된 공종이 없습니다.'\n"
+    )),
+]
+
+def run_stage(code: str, importtime: bool = False) -> tuple:
+    """코드를 새 프로세스에서 실행하고 (경과 시간, importtime 출력 줄 목록)을 반환"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - started
+    stderr = completed.stderr.decode("utf-8", errors="replace")
+    if completed.returncode != 0:
+        raise RuntimeError(f"단계 실행 실패:\n{stderr[-2000:]}")
+    return elapsed, [line for line in stderr.splitlines() if line.startswith("import time:")]
+
+def time_to_first_prompt() -> float:
+    """python main.py를 실행하고 입력 프롬프트가 출력될 때까지의 시간. 입력을 닫아 바로 종료시킴"""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "main.py"], cwd=PROJECT_DIR,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    while PROMPT_MARKER not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError("main.py가 입력 프롬프트를 출력하기 전에 종료되었습니다.")
+        output += chunk
+    elapsed = time.perf_counter() - started
+    process.stdin.close()
+    process.wait()
+    return elapsed
+
+def package_breakdown(lines: list) -> dict:
+    """importtime 출력에서 최상위 패키지별 자체 import 시간(초) 합계"""
+    totals = defaultdict(float)
+    for line in lines:
+        # 'import time: self [us] | cumulative | imported package'
+        fields = line.split(":", 1)[1].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        totals[fields[2].strip().split(".")[0]] += int(fields[0]) / 1e6
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="단계별 시작 시간과 import 시간 분석")
+    parser.add_argument("--repeat", type=int, default=3, help="단계별 반복 실행 횟수 (중앙값을 보고)")
+    parser.add_argument("--top", type=int, default=10, help="import 시간 분석에서 보여줄 패키지 수")
+    parser.add_argument("--rows", type=int, default=2000, help="첫 질문 단계의 합성 내역서 파일당 행 수")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_synthetic_corpus(data_dir, 2, args.rows)
+        print(f"파이썬 {sys.version.split()[0]}, 단계별 {args.repeat}회 실행 중앙값 (새 프로세스, 인터프리터 시작 포함)\n")
+
+        print("[시작 시간]")
+        prompt_times = [time_to_first_prompt() for _ in range(args.repeat)]
+        stages = [(name, code.format(data_dir=data_dir)) for name, code in STAGES]
+        timings = {}
+        for name, code in stages:
+            timings[name] = [run_stage(code)[0] for _ in range(args.repeat)]
+        timings["첫 입력 프롬프트 (python main.py)"] = prompt_times
+        for name, values in timings.items():
+            print(f" - {name:<30}: {np.median(values) * 1000:8.1f}ms (최소 {min(values) * 1000:8.1f}ms)")
+
+        # import 시간은 측정 오버헤드가 있으므로 위 시간과 별도로 한 번 더 실행하여 분석
+        for name in ("import main", "첫 질문 응답 (가짜 LLM)"):
+            _, lines = run_stage(dict(stages)[name], importtime=True)
+            breakdown = package_breakdown(lines)
+            print(f"\n[import 시간: {name}] 모듈 {len(lines)}개, 합계 {sum(breakdown.values()) * 1000:.1f}ms")
+            for package, seconds in list(breakdown.items())[:args.top]:
+                print(f" - {package:<22}: {seconds * 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    main_cli()
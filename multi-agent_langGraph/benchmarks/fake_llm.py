@@ -0,0 +1,180 @@
+"""
+네트워크 없이 그래프 전체를 실행하기 위한 결정적(deterministic) 가짜 채팅 모델
+프롬프트 종류(Orchestrator / ProcessAgent / drilldown / EvaluatorAgent)를 시스템 프롬프트로 구분하고,
+공종 리스트에서 'OO교', 'XX터널'처럼 키워드에 해당하는 고유 명칭을 규칙으로 골라 실제 모델과 같은 JSON 형식으로 응답
+호출마다 latency초를 기다려 원격 모델의 응답 지연을 흉내내고, 프롬프트 크기를 기록
+malformed_rate를 주면 그 비율의 응답을 코드 블록/뒤에 붙은 설명/작은따옴표 객체처럼 형식이 잘못된 문자열로 반환
+"""
+import re
+import ast
+import json
+import time
+import zlib
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from agents.query_router import FileResolver, classify_intent, extract_process_name
+from agents.token_utils import estimate_tokens
+
+# 키워드에 포함된 대상 -> 공종명의 접미사 ('교량 공사'는 '구림교', '남정교' 등을 찾음)
+STRUCTURE_SUFFIXES = {"교량": "교", "다리": "교", "터널": "터널"}
+
+# to_string 정렬 표의 행과 prefix 레이아웃의 'record|공종명' 행
+_PROMPT_ROW = re.compile(r"^\s*(\S+\.\S+)\s+(.+?)\s*$")
+_DELIMITED_ROW = re.compile(r"^([^|]+\.[^|]+)\|(.+)$")
+
+def _section(text: str, title: str) -> str:
+    """'[title]' 줄(뒤에 설명이 붙어 있어도 됨) 다음 줄부터 빈 줄 전까지의 내용"""
+    match = re.search(rf"\[{re.escape(title)}\][^\n]*\n(.*?)\n\n", text, re.S)
+    return match.group(1) if match else ""
+
+def _target(keyword: str) -> tuple:
+    """키워드에서 (찾을 공종명 접미사, 펼칠 분류 항목 단어)를 결정"""
+    keyword = keyword.strip("'\" ")
+    for word, suffix in STRUCTURE_SUFFIXES.items():
+        if word in keyword:
+            return suffix, word
+    word = re.sub(r"\s*공사$", "", keyword)
+    return word, word
+
+# 형식이 잘못된 응답의 종류 (앞의 둘은 로컬 보정으로, 마지막은 교정 요청으로 복구됨)
+_MALFORMED = (
+    lambda content: f"```json\n{content}\n```",
+    lambda content: f"{content}\n\n위 결과는 공종 리스트에서 찾은 항목입니다.",
+    lambda content: repr(json.loads(content)),
+)
+
+def _rows(process_list: str) -> list:
+    """to_string 또는 'record|공종명' 형식의 공종 리스트에서 (record, 공종명) 목록 (헤더 행 제외)"""
+    rows = []
+    for line in process_list.split("\n"):
+        match = _DELIMITED_ROW.match(line) or _PROMPT_ROW.match(line)
+        if match:
+            rows.append((match.group(1), match.group(2)))
+    return rows
+
+class FakeChatModel(BaseChatModel):
+    """
+    실제 LLM 대신 규칙으로 응답하는 가짜 채팅 모델
+    - latency: 호출마다 기다리는 시간(초). 비동기 호출은 asyncio.sleep으로 기다려 동시 실행이 겹쳐짐
+    - malformed_rate: 형식이 잘못된 응답을 반환하는 비율 (프롬프트 내용으로 정해지므로 같은 프롬프트는 항상 같은 응답)
+    - calls(): 호출별 (프롬프트 종류, 글자 수, 추정 토큰 수) 기록
+    """
+    latency: float = 0.0
+    malformed_rate: float = 0.0
+    _calls: list = PrivateAttr(default_factory=list)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-boq"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": "fake-boq", "latency": self.latency, "malformed_rate": self.malformed_rate}
+
+    def calls(self) -> list:
+        with self._lock:
+            return list(self._calls)
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+
+    def prompt_stats(self) -> dict:
+        """프롬프트 종류별 {"calls", "mean_tokens", "max_tokens", "total_tokens"}"""
+        tokens = defaultdict(list)
+        for kind, _, prompt_tokens in self.calls():
+            tokens[kind].append(prompt_tokens)
+        return {
+            kind: {
+                "calls": len(values),
+                "mean_tokens": sum(values) / len(values),
+                "max_tokens": max(values),
+                "total_tokens": sum(values),
+            }
+            for kind, values in tokens.items()
+        }
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        system, human = messages[0].content, messages[-1].content
+        if "JSON 교정기" in system:
+            kind, output = "repair", self._repair(human)
+        elif "총괄 지휘관" in system:
+            kind, output = "orchestrator", self._plan(human)
+        elif "expand_records" in system:
+            kind, output = "process_drilldown", self._drill_down(human)
+        elif "validated_records" in system:
+            kind, output = "evaluator", self._validate(human)
+        elif "matching_records" in system:
+            kind, output = "process", self._match(human)
+        else:
+            kind, output = "unknown", {}
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        with self._lock:
+            self._calls.append((kind, len(prompt), estimate_tokens(prompt)))
+        content = json.dumps(output, ensure_ascii=False)
+        checksum = zlib.crc32(prompt.encode("utf-8"))
+        if kind != "repair" and checksum % 1000 < self.malformed_rate * 1000:
+            content = _MALFORMED[checksum // 1000 % len(_MALFORMED)](content)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _plan(self, human: str) -> dict:
+        queries = re.findall(r'\[사용자 질문\]: "(.*)"', human)
+        query = queries[-1] if queries else ""
+        files = [line.strip() for line in _section(human, "사용 가능한 파일 목록").split("\n") if line.strip().endswith(".txt")]
+        resolver = FileResolver(files)
+        top_files = resolver.top_files(query, 1)
+        file_name = top_files[0] if top_files and resolver.rank(query)[0][1] > 0 else "None"
+        task = classify_intent(query, has_file=file_name != "None") or "general_cost_analysis"
+        parameters = {"process_name": extract_process_name(query, resolver.tokens()) or query}
+        if task == "sub_process_extraction":
+            parameters["file_name"] = file_name
+        return {"task": task, "parameters": parameters}
+
+    def _match(self, human: str) -> dict:
+        suffix, _ = _target(_section(human, "분석 대상 키워드"))
+        rows = _rows(_section(human, "전체 공종 리스트"))
+        return {"matching_records": [{"record": record, "name": name} for record, name in rows if name.endswith(suffix)]}
+
+    def _drill_down(self, human: str) -> dict:
+        suffix, category = _target(_section(human, "분석 대상 키워드"))
+        rows = _rows(_section(human, "현재 단계 공종 리스트"))
+        return {
+            "matching_records": [{"record": record, "name": name} for record, name in rows if name.endswith(suffix)],
+            "expand_records": [record for record, name in rows if category in name and not name.endswith(suffix)],
+        }
+
+    def _validate(self, human: str) -> dict:
+        section = _section(human, "후보 상위 공종 목록")
+        try:
+            candidates = json.loads(section)
+        except json.JSONDecodeError:
+            candidates = [{"record": record, "name": name} for record, name in _rows(section)]
+        return {"validated_records": candidates}
+
+    def _repair(self, human: str) -> dict:
+        # 교정 요청: 원래 응답(작은따옴표 객체 등)을 읽어 JSON으로 다시 출력
+        match = re.search(r"\[원래 응답\]\n(.*)$", human, re.S)
+        try:
+            return ast.literal_eval(match.group(1).strip()) if match else {}
+        except (ValueError, SyntaxError):
+            return {}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
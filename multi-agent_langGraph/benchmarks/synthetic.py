@@ -0,0 +1,105 @@
+"""
+벤치마크용 합성 공사 내역서 생성기
+"record: 공종명; spec; cost" 형식으로, 대분류 아래에 'OO교', 'XX터널' 같은 고유 명칭의 구조물과
+그 하위 세부 공종이 record 계층으로 이어지는 파일을 만듦
+
+예시 (depth=5):
+    토목.02: 교량공사; ; 0
+    토목.02.01: 구림교; ; 0
+    토목.02.01.01: 하부공; ; 0
+    토목.02.01.01.01: ...-1. 무근콘크리트; T=30cm 미만(기계 100%); 10562112
+"""
+import os
+import random
+
+# 대분류(record 깊이 2)와, 그 아래 구조물에 붙는 접미사 (None이면 일반 분류)
+CATEGORIES = [
+    ("토공", None),
+    ("교량공사", "교"),
+    ("배수공", None),
+    ("터널공사", "터널"),
+    ("포장공", None),
+    ("부대공", None),
+]
+PLACE_NAMES = ["구림", "남정", "북일", "동산", "서하", "신촌", "대곡", "월평", "송정", "학산"]
+GENERAL_NAMES = ["절토", "성토", "측구", "집수정", "보조기층", "차선도색", "방호울타리", "표지판"]
+GROUP_NAMES = ["하부공", "상부공", "기초공", "구조물공", "부대시설", "가시설"]
+ITEM_NAMES = ["무근콘크리트", "철근가공조립", "거푸집", "터파기", "되메우기", "아스팔트포장", "비계", "동바리"]
+SPECS = ["T=30cm 미만(기계 100%)", "D13", "합판 3회", "토사", "", "L=120m"]
+
+def structure_names(suffix: str, count: int) -> list:
+    """'구림교', '남정교', ... 처럼 고유 명칭 count개 (지명이 모자라면 번호를 붙임)"""
+    names = []
+    for i in range(count):
+        place = PLACE_NAMES[i % len(PLACE_NAMES)]
+        number = i // len(PLACE_NAMES)
+        names.append(f"{place}{number + 1 if number else ''}{suffix}")
+    return names
+
+def _fanout(rows: int, depth: int, num_top: int) -> float:
+    """깊이 3 노드 num_top개 아래로 depth까지 자식 수 f를 같게 두었을 때 전체 행 수가 rows에 가까워지는 f"""
+    levels = depth - 3
+    if levels <= 0:
+        return 0.0
+    low, high = 1.0, float(max(rows, 2))
+    for _ in range(60):
+        mid = (low + high) / 2
+        total = num_top * sum(mid ** level for level in range(1, levels + 1))
+        low, high = (mid, high) if total < rows else (low, mid)
+    return low
+
+def write_synthetic_boq(file_path: str, rows: int = 2000, depth: int = 5, num_structures: int = 3, seed: int = 0) -> dict:
+    """
+    합성 내역서 파일 하나를 생성 (rows는 대략적인 행 수, depth는 가장 깊은 record의 단계 수)
+    반환값: {"rows": 실제 행 수, "structures": {"교": [(record, 이름), ...], "터널": [...]}}
+    """
+    depth = max(depth, 3)
+    rng = random.Random(seed)
+    lines = []
+    structures = {suffix: [] for _, suffix in CATEGORIES if suffix}
+    fanout = _fanout(rows, depth, len(CATEGORIES) * num_structures)
+
+    def children(parent: str, level: int):
+        # 자식 수를 f의 내림/올림 중 확률적으로 정해 평균 행 수를 맞춤
+        if level > depth:
+            return
+        count = int(fanout) + (rng.random() < fanout - int(fanout))
+        for i in range(1, max(count, 1) + 1):
+            record = f"{parent}.{i:02d}"
+            if level == depth:
+                lines.append(f"{record}: ...-{i}. {rng.choice(ITEM_NAMES)}; {rng.choice(SPECS)}; {rng.randint(1000, 10**8)}")
+            else:
+                lines.append(f"{record}: {rng.choice(GROUP_NAMES)}; ; 0")
+                children(record, level + 1)
+
+    for c, (category, suffix) in enumerate(CATEGORIES, 1):
+        top = f"토목.{c:02d}"
+        lines.append(f"{top}: {category}; ; 0")
+        names = structure_names(suffix, num_structures) if suffix else rng.sample(GENERAL_NAMES * num_structures, num_structures)
+        for s, name in enumerate(names, 1):
+            record = f"{top}.{s:02d}"
+            if suffix:
+                structures[suffix].append((record, name))
+            if depth == 3:
+                lines.append(f"{record}: {name}; ; {rng.randint(1000, 10**8)}")
+            else:
+                lines.append(f"{record}: {name}; ; 0")
+                children(record, 4)
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return {"rows": len(lines), "structures": structures}
+
+def synthetic_file_name(i: int) -> str:
+    # data 폴더의 실제 파일명 형식 (Orchestrator의 파일명 토큰 매칭이 그대로 동작하도록)
+    return f"2016{i:07d}_북일-남일{i}_Q{i}_S6_E1412_조달청_조사내역서.txt"
+
+def write_synthetic_corpus(data_dir: str, num_files: int, rows: int = 2000, depth: int = 5,
+                           num_structures: int = 3, seed: int = 0) -> dict:
+    """data_dir에 합성 내역서 num_files개를 생성. 반환값: {파일명: write_synthetic_boq의 반환값}"""
+    os.makedirs(data_dir, exist_ok=True)
+    corpus = {}
+    for i in range(num_files):
+        file_name = synthetic_file_name(i)
+        corpus[file_name] = write_synthetic_boq(os.path.join(data_dir, file_name), rows, depth, num_structures, seed + i)
+    return corpus
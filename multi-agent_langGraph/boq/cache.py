@@ -0,0 +1,271 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from boq.parser import parse_boq_file, table_to_frame
+from boq.index import get_record_index, register_record_index, RecordIndex
+
+# 캐시 파일 형식이 바뀌면 올려서 기존 캐시를 무효화 (3: 공종명/spec 사전 인코딩, 4: 비용의 천 단위 구분자 처리)
+CACHE_VERSION = 4
+
+def file_content_hash(file_path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# 메모리에 올려 둘 데이터프레임의 최대 크기 합계 (BOQ_DATA_CACHE_MB 환경 변수로 변경 가능)
+DEFAULT_DATA_CACHE_BYTES = int(os.environ.get("BOQ_DATA_CACHE_MB", "1024")) * 1024 * 1024
+
+class LoadedFrameCache:
+    """
+    메모리에 로딩된 데이터프레임을 원본 경로별로 보관하는 LRU 캐시 (Orchestrator와 ComputeAgent가 공유)
+    - 보관 중인 데이터프레임의 실제 메모리 사용량(memory_usage(deep=True)) 합계가 max_bytes를 넘으면
+      가장 오래 사용하지 않은 항목부터 제거하고, max_bytes보다 큰 데이터프레임은 보관하지 않음
+    - 조회할 때마다 원본의 크기/mtime을 확인하고, mtime만 바뀐 경우 내용 해시가 같으면 그대로 사용
+    """
+    def __init__(self, max_bytes: int, content_hash=file_content_hash):
+        self.max_bytes = max_bytes
+        self._content_hash = content_hash
+        # 절대 경로 -> {"frame", "bytes", "size", "mtime_ns", "content_hash"} (사용 순서대로, 마지막이 가장 최근)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _is_current(self, file_path: str, entry: dict, stat: os.stat_result) -> bool:
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return True
+        if entry['size'] != stat.st_size or self._content_hash(file_path) != entry['content_hash']:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def get(self, file_path: str, load) -> pd.DataFrame:
+        """보관 중이고 원본이 그대로면 보관된 데이터프레임을, 아니면 load()로 읽어 보관한 뒤 반환"""
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_current(key, entry, stat):
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry['frame']
+            self.invalidate(key)
+
+        # 로딩 도중 원본이 바뀌면 다음 조회 때 다시 읽도록 크기/mtime/해시는 로딩 전에 기록
+        content_hash = self._content_hash(key)
+        df = load()
+        with self._lock:
+            self.misses += 1
+        self._put(key, df, stat, content_hash)
+        return df
+
+    def _put(self, key: str, df: pd.DataFrame, stat: os.stat_result, content_hash: str):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old['bytes']
+            self._entries[key] = {
+                'frame': df,
+                'bytes': size,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'content_hash': content_hash,
+            }
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['bytes']
+                self.evictions += 1
+
+    def invalidate(self, file_path: str):
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(file_path), None)
+            if entry is not None:
+                self._bytes -= entry['bytes']
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+class ParsedFileCache:
+    """
+    파싱된 공사 내역서를 디스크에 Feather(Arrow IPC, 비압축) 형식으로 저장하는 캐시
+    - 원본 경로별로 메타데이터(크기, mtime, 내용 해시)를 함께 저장하고, 원본이 바뀌면 자동으로 다시 파싱
+    - 크기와 mtime이 같으면 해시 계산 없이 바로 사용하고, mtime만 바뀐 경우 내용 해시로 재확인
+    - 캐시 파일은 memory map으로 읽으므로 큰 파일도 텍스트 파싱 없이 바로 로딩됨
+    - record 인덱스의 정렬 순서와 하위 공종 비용 합계도 함께 저장하여 다시 계산하지 않음
+    - 원본 내용이 바뀐 것을 감지하면 등록된 리스너에 원본 경로를 알림 (LLM 응답 캐시 무효화 등)
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._invalidation_listeners = []
+
+    def add_invalidation_listener(self, listener):
+        """원본 파일이 바뀌었거나 캐시가 무효화될 때 listener(원본 절대 경로)를 호출"""
+        self._invalidation_listeners.append(listener)
+
+    def _notify_invalidated(self, file_path: str):
+        for listener in self._invalidation_listeners:
+            listener(os.path.abspath(file_path))
+
+    def _entry_key(self, file_path: str) -> str:
+        return hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:20]
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_meta(self, key: str) -> dict:
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        for name in (meta['data_file'], meta['index_file']):
+            if not os.path.exists(os.path.join(self.cache_dir, name)):
+                return None
+        return meta
+
+    def _write_meta(self, key: str, meta: dict):
+        # 다른 프로세스가 쓰다 만 메타데이터를 읽지 않도록 임시 파일에 쓴 뒤 교체
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json.tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path(key))
+
+    def lookup(self, file_path: str) -> dict:
+        """원본 파일에 대해 유효한 캐시 메타데이터를 반환. 없거나 원본이 바뀌었으면 None"""
+        key = self._entry_key(file_path)
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+
+        stat = os.stat(file_path)
+        if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+            return meta
+        if meta['size'] != stat.st_size:
+            return None
+
+        # mtime만 바뀐 경우(복사, touch 등) 내용이 같으면 메타데이터만 갱신해서 재사용
+        if file_content_hash(file_path) != meta['content_hash']:
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        self._write_meta(key, meta)
+        return meta
+
+    def content_hash(self, file_path: str) -> str:
+        """원본 파일의 내용 해시. 캐시가 유효하면(크기/mtime 동일) 파일을 읽지 않고 저장된 값을 사용"""
+        meta = self.lookup(file_path)
+        return meta['content_hash'] if meta is not None else file_content_hash(file_path)
+
+    def _read_feather(self, file_name: str) -> pa.Table:
+        return feather.read_table(os.path.join(self.cache_dir, file_name), memory_map=True)
+
+    def _write_feather(self, table: pa.Table, file_name: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".feather.tmp")
+        os.close(fd)
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, os.path.join(self.cache_dir, file_name))
+
+    def _read_entry(self, meta: dict) -> pd.DataFrame:
+        df = table_to_frame(self._read_feather(meta['data_file']))
+        register_record_index(df, RecordIndex.from_table(df, self._read_feather(meta['index_file'])))
+        return df
+
+    def _store(self, file_path: str, df: pd.DataFrame, stat: os.stat_result, content_hash: str) -> dict:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self._entry_key(file_path)
+
+        # 파일명에 내용 해시를 포함시켜, 이전 버전이 memory map으로 열려 있어도 덮어쓰지 않음
+        data_file = f"{key}-{content_hash[:16]}.feather"
+        index_file = f"{key}-{content_hash[:16]}.index.feather"
+        # pandas 메타데이터를 빼고 저장해야 읽을 때 문자열 컬럼이 arrow 기반 dtype으로 그대로 복원됨 (범주형은 사전 인코딩으로 저장)
+        self._write_feather(pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None), data_file)
+        self._write_feather(get_record_index(df).to_table(), index_file)
+
+        old_meta = self._read_meta(key)
+        meta = {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'content_hash': content_hash,
+            'data_file': data_file,
+            'index_file': index_file,
+        }
+        self._write_meta(key, meta)
+
+        # 원본이 바뀌어 더 이상 쓰지 않는 이전 데이터 파일 정리
+        if old_meta and old_meta['data_file'] != data_file:
+            self._remove_files([old_meta['data_file'], old_meta['index_file']])
+        if old_meta and old_meta['content_hash'] != content_hash:
+            self._notify_invalidated(file_path)
+        return meta
+
+    def _remove_files(self, file_names: list):
+        for name in file_names:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def load(self, file_path: str) -> pd.DataFrame:
+        """캐시가 유효하면 캐시에서, 아니면 원본을 파싱하고 캐시에 저장한 뒤 반환"""
+        meta = self.lookup(file_path)
+        if meta is not None:
+            self.hits += 1
+            return self._read_entry(meta)
+
+        self.misses += 1
+        # 파싱 도중 원본이 바뀌면 다음 로딩 때 다시 파싱되도록 크기/mtime/해시는 파싱 전에 기록
+        stat = os.stat(file_path)
+        content_hash = file_content_hash(file_path)
+        df = parse_boq_file(file_path)
+        try:
+            self._store(file_path, df, stat, content_hash)
+        except OSError as e:
+            print(f"파싱 캐시 저장 실패: {os.path.basename(file_path)} - {e}")
+        return df
+
+    def invalidate(self, file_path: str):
+        key = self._entry_key(file_path)
+        meta = self._read_meta(key)
+        self._remove_files([f"{key}.json"])
+        if meta is not None:
+            self._remove_files([meta['data_file'], meta['index_file']])
+        self._notify_invalidated(file_path)
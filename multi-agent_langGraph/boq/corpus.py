@@ -0,0 +1,316 @@
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from boq.parser import parse_boq_file, table_to_frame, empty_boq_frame, CATEGORY_COLUMNS
+from boq.index import RecordIndex, get_record_index, register_record_index
+from boq.retrieval import char_ngrams, CANDIDATE_DEPTHS
+
+# 코퍼스 저장 형식이 바뀌면 올려서 기존 코퍼스를 무효화 (2: spec 사전 인코딩, 3: 비용의 천 단위 구분자 처리)
+CORPUS_VERSION = 3
+
+_WHITESPACE = re.compile(r'\s+')
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub('', str(text)).lower()
+
+def _level_columns(records: pa.ChunkedArray, max_depth: int) -> dict:
+    """record를 '.' 기준으로 나눈 레벨 컬럼들 (level_1, level_2, ...). 깊이가 얕은 행은 null"""
+    parts = pc.split_pattern(records, '.')
+    lengths = pc.list_value_length(parts)
+    null_parts = pa.scalar(None, type=parts.type)
+    return {
+        f"level_{level}": pc.dictionary_encode(pc.list_element(pc.if_else(pc.greater(lengths, level - 1), parts, null_parts), level - 1))
+        for level in range(1, max_depth + 1)
+    }
+
+class NameIndex:
+    """
+    고유 공종명(코퍼스의 공종명 사전)에 대한 문자 1~2-gram 역색인
+    한국어 공종명은 띄어쓰기가 일정하지 않으므로 단어 대신 글자 n-gram을 토큰으로 사용하고,
+    질의의 모든 n-gram을 가진 공종명만 추린 뒤 부분 문자열 포함 여부로 확인
+    """
+    def __init__(self, names: list):
+        self.names = [_normalize(name) for name in names]
+        postings = defaultdict(list)
+        for code, name in enumerate(self.names):
+            for gram in set(char_ngrams(name)):
+                postings[gram].append(code)
+        self._postings = {gram: np.array(codes, dtype=np.int32) for gram, codes in postings.items()}
+
+    def lookup(self, text: str) -> np.ndarray:
+        """공백을 무시하고 text를 포함하는 공종명 코드들"""
+        text = _normalize(text)
+        if not text:
+            return np.arange(len(self.names), dtype=np.int32)
+        grams = set(char_ngrams(text, 2, 2)) or {text}
+        postings = sorted((self._postings.get(gram, np.array([], dtype=np.int32)) for gram in grams), key=len)
+        codes = postings[0]
+        for posting in postings[1:]:
+            if len(codes) == 0:
+                break
+            codes = np.intersect1d(codes, posting, assume_unique=True)
+        return np.array([code for code in codes if text in self.names[code]], dtype=np.int32)
+
+class CorpusStore:
+    """
+    data 폴더의 모든 내역서를 하나의 컬럼 테이블(Feather, memory map)로 모은 코퍼스 저장소
+    - 컬럼: file_id, record, depth, level_1.., 공종명/spec(사전 인코딩), total_cost(float64),
+      그리고 파일별 record 인덱스(sort_order, descendant_total)
+    - manifest(corpus.json)에 파일별 이름, 내용 해시, 행 구간, 비용 dtype을 저장
+    - ingest()는 내용 해시가 같은 파일은 기존 코퍼스의 행을 그대로 옮기고 바뀐 파일만 다시 읽음
+    - search()는 공종명 역색인(NameIndex)으로 모든 프로젝트의 행을 LLM 호출 없이 바로 필터링
+    - frame()은 파일 하나의 행을 parse_boq_file과 같은 형식의 데이터프레임으로 반환 (record 인덱스 포함)
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        # (manifest 파일의 mtime, manifest, 테이블, 파일명 -> manifest 항목)
+        self._loaded = (None, None, None, {})
+        # 검색용 컬럼을 만든 테이블과 (공종명 사전 코드, 파일 번호, 깊이) 배열, 공종명 역색인
+        self._search_cache = (None, None, None)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, "corpus.json")
+
+    ############################ 생성 ############################
+    def _file_table(self, file_id: int, df: pd.DataFrame) -> pa.Table:
+        index_table = get_record_index(df).to_table()
+        return pa.table({
+            'file_id': pa.array(np.full(len(df), file_id, dtype=np.int32)),
+            'record': pa.array(df['record'], type=pa.string()),
+            '공종명': pa.array(df['공종명'], type=pa.string()),
+            'spec': pa.array(df['spec'], type=pa.string()),
+            'total_cost': pa.array(df['total_cost'].to_numpy(dtype=np.float64)),
+            'sort_order': pa.array(index_table['order'].to_numpy().astype(np.int64)),
+            'descendant_total': pa.array(index_table['descendant_total'].to_numpy().astype(np.float64)),
+        })
+
+    def _reused_table(self, table: pa.Table, entry: dict, file_id: int) -> pa.Table:
+        part = table.slice(entry['offset'], entry['rows'])
+        return pa.table({
+            'file_id': pa.array(np.full(entry['rows'], file_id, dtype=np.int32)),
+            'record': part['record'],
+            '공종명': pc.cast(part['공종명'], pa.string()),
+            'spec': pc.cast(part['spec'], pa.string()),
+            'total_cost': part['total_cost'],
+            'sort_order': part['sort_order'],
+            'descendant_total': part['descendant_total'],
+        })
+
+    def ingest(self, data_dir: str, file_names: list, content_hash, load=parse_boq_file) -> dict:
+        """
+        file_names의 내역서들로 코퍼스를 (다시) 만들고 저장
+        content_hash(file_path)로 바뀐 파일을 찾고, load(file_path)로 데이터프레임을 읽음 (ParsedFileCache.load 등)
+        반환값: {"files", "rows", "reused", "loaded", "failed"}
+        """
+        _, old_manifest, old_table, old_entries = self._load()
+        parts, entries, offset = [], [], 0
+        stats = {"files": 0, "rows": 0, "reused": 0, "loaded": 0, "failed": []}
+        for file_name in sorted(file_names):
+            file_path = os.path.join(data_dir, file_name)
+            try:
+                file_hash = content_hash(file_path)
+                old_entry = old_entries.get(file_name)
+                if old_entry is not None and old_entry['content_hash'] == file_hash:
+                    table, cost_type = self._reused_table(old_table, old_entry, len(entries)), old_entry['cost_type']
+                    stats["reused"] += 1
+                else:
+                    df = load(file_path)
+                    table, cost_type = self._file_table(len(entries), df), str(df['total_cost'].dtype)
+                    stats["loaded"] += 1
+            except Exception as e:
+                print(f"코퍼스 적재 실패: {file_name} - {e}")
+                stats["failed"].append(file_name)
+                continue
+            entries.append({
+                'file_name': file_name,
+                'content_hash': file_hash,
+                'offset': offset,
+                'rows': len(table),
+                'cost_type': cost_type,
+            })
+            parts.append(table)
+            offset += len(table)
+
+        table = pa.concat_tables(parts) if parts else self._file_table(0, empty_boq_frame())
+        self._write(self._finish_table(table), entries, old_manifest)
+        stats.update(files=len(entries), rows=offset)
+        return stats
+
+    def _finish_table(self, table: pa.Table) -> pa.Table:
+        # 깊이와 레벨 컬럼을 붙이고, 반복이 많은 문자열 컬럼은 사전 인코딩하여 저장 크기와 비교 비용을 줄임
+        records = table['record']
+        depths = pc.add(pc.count_substring(records, '.'), 1)
+        max_depth = pc.max(depths).as_py() or 0
+        columns = {
+            'file_id': table['file_id'],
+            'record': records,
+            'depth': pc.cast(depths, pa.int8()),
+            **_level_columns(records, max_depth),
+            '공종명': pc.dictionary_encode(table['공종명']),
+            'spec': pc.dictionary_encode(table['spec']),
+            'total_cost': table['total_cost'],
+            'sort_order': table['sort_order'],
+            'descendant_total': table['descendant_total'],
+        }
+        return pa.table(columns).combine_chunks()
+
+    def _write(self, table: pa.Table, entries: list, old_manifest: dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 다른 프로세스가 이전 코퍼스를 memory map으로 열고 있어도 덮어쓰지 않도록 매번 새 파일명 사용
+        data_file = f"corpus-{time.time_ns():x}.feather"
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".feather.tmp")
+        os.close(fd)
+        # 사전 인코딩 컬럼이 하나의 사전을 쓰도록 한 덩어리(record batch)로 저장
+        feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(len(table), 1))
+        os.replace(tmp_path, os.path.join(self.cache_dir, data_file))
+
+        manifest = {'version': CORPUS_VERSION, 'data_file': data_file, 'files': entries}
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json.tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+        if old_manifest and old_manifest['data_file'] != data_file:
+            try:
+                os.remove(os.path.join(self.cache_dir, old_manifest['data_file']))
+            except OSError:
+                pass
+
+    ############################ 조회 ############################
+    def _load(self) -> tuple:
+        """manifest가 바뀌었으면(다른 프로세스의 ingest 등) 다시 읽음. 코퍼스가 없으면 (None, None, None, {})"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return (None, None, None, {})
+        with self._lock:
+            if self._loaded[0] == mtime:
+                return self._loaded
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') != CORPUS_VERSION:
+                    return (None, None, None, {})
+                table = feather.read_table(os.path.join(self.cache_dir, manifest['data_file']), memory_map=True)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return (None, None, None, {})
+            self._loaded = (mtime, manifest, table, {entry['file_name']: entry for entry in manifest['files']})
+            return self._loaded
+
+    def _search_columns(self, table: pa.Table) -> tuple:
+        # (공종명 사전 코드, 파일 번호, 깊이) numpy 배열과 공종명 역색인. 테이블마다 처음 검색할 때 한 번만 만듦
+        # 만든 테이블과 함께 보관하여, 그 사이 코퍼스가 바뀌어도 이전 테이블의 컬럼을 새 테이블에 쓰지 않음
+        with self._lock:
+            cached_table, columns, name_index = self._search_cache
+            if cached_table is table:
+                return columns, name_index
+        names = table['공종명'].combine_chunks()
+        columns = (
+            names.indices.to_numpy(zero_copy_only=False),
+            table['file_id'].to_numpy(),
+            table['depth'].to_numpy(),
+        )
+        name_index = NameIndex(names.dictionary.to_pylist())
+        with self._lock:
+            # 최신 코퍼스의 테이블일 때만 보관 (이전 스냅샷으로 조회한 경우는 이번 호출에만 사용)
+            if self._loaded[2] is table:
+                self._search_cache = (table, columns, name_index)
+        return columns, name_index
+
+    @staticmethod
+    def _find_entry(entries: dict, file_name: str, content_hash: str = None) -> dict:
+        # 같은 _load() 스냅샷의 manifest 항목에서 찾음 (행 구간을 다른 스냅샷의 테이블에 적용하지 않도록)
+        entry = entries.get(file_name)
+        if entry is None or (content_hash is not None and entry['content_hash'] != content_hash):
+            return None
+        return entry
+
+    def entry(self, file_name: str, content_hash: str = None) -> dict:
+        """파일의 manifest 항목. 코퍼스에 없거나 content_hash가 다르면(원본이 바뀜) None"""
+        return self._find_entry(self._load()[3], file_name, content_hash)
+
+    def files(self) -> list:
+        return [entry['file_name'] for entry in self._load()[3].values()]
+
+    def has_candidates(self, file_name: str, content_hash: str = None):
+        """파일에 ProcessAgent가 살펴볼 깊이(1~4)의 행이 있는지. 코퍼스에 없는 파일이면 None"""
+        _, _, table, entries = self._load()
+        entry = self._find_entry(entries, file_name, content_hash)
+        if entry is None:
+            return None
+        (_, _, depths), _ = self._search_columns(table)
+        rows = depths[entry['offset']:entry['offset'] + entry['rows']]
+        return bool(np.isin(rows, CANDIDATE_DEPTHS).any())
+
+    def frame(self, file_name: str, content_hash: str = None) -> pd.DataFrame:
+        """
+        파일 하나의 행을 parse_boq_file과 같은 컬럼/dtype의 데이터프레임으로 반환하고 저장된 record 인덱스를 등록
+        코퍼스에 없거나 원본이 바뀌었으면 None
+        """
+        _, _, table, entries = self._load()
+        entry = self._find_entry(entries, file_name, content_hash)
+        if entry is None:
+            return None
+        part = table.slice(entry['offset'], entry['rows'])
+        cost_type = pa.from_numpy_dtype(np.dtype(entry['cost_type']))
+        # 코퍼스 전체의 사전 대신 이 파일에 나오는 값만으로 다시 인코딩 (parse_boq_file과 같은 범주 순서)
+        categories = {column: pc.dictionary_encode(pc.cast(part[column], pa.string())) for column in CATEGORY_COLUMNS}
+        df = table_to_frame(pa.table({
+            'record': part['record'],
+            **categories,
+            'total_cost': pc.cast(part['total_cost'], cost_type),
+        }))
+        register_record_index(df, RecordIndex.from_table(df, pa.table({
+            'order': part['sort_order'],
+            'descendant_total': pc.cast(part['descendant_total'], cost_type),
+        })))
+        return df
+
+    def search(self, text: str, file_names: list = None, depths: tuple = None) -> pd.DataFrame:
+        """
+        모든 프로젝트에서 공종명에 text가 포함된 행 (공백 무시, file_names/depths로 범위 제한)
+        반환 컬럼: file_name, record, depth, 공종명, spec, total_cost, subtree_cost(하위 공종 비용 합계, 0이면 자신의 비용)
+        """
+        _, _, table, entries = self._load()
+        if table is None:
+            return pd.DataFrame(columns=['file_name', 'record', 'depth', '공종명', 'spec', 'total_cost', 'subtree_cost'])
+        (name_codes, file_ids, row_depths), name_index = self._search_columns(table)
+
+        mask = np.isin(name_codes, name_index.lookup(text))
+        if depths is not None:
+            mask &= np.isin(row_depths, depths)
+        id_to_name = [entry['file_name'] for entry in entries.values()]
+        if file_names is not None:
+            mask &= np.isin(file_ids, [i for i, name in enumerate(id_to_name) if name in set(file_names)])
+
+        rows = table.take(pa.array(np.flatnonzero(mask)))
+        total_cost = rows['total_cost'].to_numpy()
+        descendant_total = rows['descendant_total'].to_numpy()
+        return pd.DataFrame({
+            'file_name': np.array(id_to_name, dtype=object)[rows['file_id'].to_numpy()] if len(rows) else np.array([], dtype=object),
+            'record': rows['record'].to_pandas(),
+            'depth': rows['depth'].to_numpy(),
+            '공종명': pc.cast(rows['공종명'], pa.string()).to_pandas(),
+            'spec': pc.cast(rows['spec'], pa.string()).to_pandas(),
+            'total_cost': total_cost,
+            'subtree_cost': np.where(descendant_total == 0, total_cost, descendant_total),
+        })
+
+    def stats(self) -> dict:
+        _, manifest, table, _ = self._load()
+        if table is None:
+            return {"files": 0, "rows": 0}
+        return {"files": len(manifest['files']), "rows": len(table)}
@@ -0,0 +1,70 @@
+import os
+import pandas as pd
+from typing import Optional, TypedDict
+
+from boq.parser import parse_boq_file
+from boq.cache import ParsedFileCache, LoadedFrameCache, DEFAULT_DATA_CACHE_BYTES, file_content_hash
+from boq.corpus import CorpusStore
+
+class DatasetHandle(TypedDict):
+    """그래프 상태에 데이터프레임 대신 넣는 데이터셋 참조"""
+    path: str       # 원본 파일의 절대 경로
+    version: str    # 핸들을 만들 때의 원본 내용 해시
+    rows: int       # 행 수 (계측 이벤트 등에 사용)
+
+class StaleDatasetError(RuntimeError):
+    """핸들을 만든 뒤 원본 파일 내용이 바뀌어 같은 데이터를 돌려줄 수 없을 때 발생"""
+
+class DatasetRegistry:
+    """
+    데이터셋 핸들(파일 경로 + 내용 해시)을 데이터프레임으로 바꿔 주는 레지스트리 (Orchestrator와 ComputeAgent가 공유)
+    그래프 상태에는 핸들만 들어가므로 체크포인트나 스트림 이벤트의 크기가 데이터 크기와 관계없이 일정함
+    데이터프레임은 코퍼스 -> 파싱 캐시 -> 파일 전체 파싱 순서로 읽어 메모리 캐시(LoadedFrameCache)에 보관
+    """
+    def __init__(self, parsed_cache: Optional[ParsedFileCache] = None, corpus: Optional[CorpusStore] = None,
+                 data_cache: Optional[LoadedFrameCache] = None):
+        self.parsed_cache = parsed_cache
+        self.corpus = corpus
+        self.data_cache = data_cache if data_cache is not None else LoadedFrameCache(DEFAULT_DATA_CACHE_BYTES, content_hash=self.content_hash)
+        # 파싱 캐시가 없을 때 사용: 절대 경로 -> (크기, mtime_ns, 내용 해시)
+        self._hashes = {}
+
+    def content_hash(self, file_path: str) -> str:
+        """원본 내용 해시. 크기/mtime이 그대로면 이전에 계산한 값을 사용"""
+        if self.parsed_cache is not None:
+            return self.parsed_cache.content_hash(file_path)
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        cached = self._hashes.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        content_hash = file_content_hash(key)
+        self._hashes[key] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def _read(self, path: str, version: str) -> pd.DataFrame:
+        # 코퍼스의 내용 해시가 원본과 같으면 코퍼스 테이블에서 바로 읽음
+        if self.corpus is not None:
+            df = self.corpus.frame(os.path.basename(path), version)
+            if df is not None:
+                return df
+        if self.parsed_cache is not None:
+            return self.parsed_cache.load(path)
+        return parse_boq_file(path)
+
+    def open(self, file_path: str, version: Optional[str] = None) -> DatasetHandle:
+        """
+        파일을 읽어(메모리 캐시에 있으면 그대로 사용) 핸들을 만듦
+        version(내용 해시)을 주면 원본이 그 내용일 때만 열고, 다르면 StaleDatasetError
+        """
+        path = os.path.abspath(file_path)
+        handle = {"path": path, "version": version or self.content_hash(path), "rows": 0}
+        handle["rows"] = len(self.resolve(handle))
+        return handle
+
+    def resolve(self, handle: DatasetHandle) -> pd.DataFrame:
+        """핸들이 가리키는 데이터프레임. 원본 내용이 핸들의 버전과 다르면 StaleDatasetError"""
+        path, version = handle['path'], handle['version']
+        if self.content_hash(path) != version:
+            raise StaleDatasetError(f"데이터 파일 내용이 변경되었습니다 - {path}")
+        return self.data_cache.get(path, lambda: self._read(path, version))
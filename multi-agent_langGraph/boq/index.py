@@ -0,0 +1,157 @@
+import bisect
+import weakref
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# '.' 바로 다음 문자. "X." 로 시작하는 모든 문자열은 정렬 순서상 ["X.", "X/") 구간에 모임
+_AFTER_DOT = chr(ord('.') + 1)
+
+def _as_py(scalar):
+    return scalar.as_py()
+
+class RecordIndex:
+    """
+    'record' 컬럼(예: 토목.01.02.03)의 계층 구조 인덱스
+    record를 정렬해 두고 bisect로 구간을 찾기 때문에,
+    특정 record의 행 위치, 하위 공종 전체(서브트리), 깊이를 O(log n) 이하로 조회할 수 있음
+    생성 시 정렬된 순서의 누적합으로 모든 record의 하위 공종 비용 합계를 한 번에 계산해 둠
+    반환하는 위치는 모두 원본 데이터프레임 기준의 정수 위치(iloc)
+    """
+    def __init__(self, records: pd.Series, costs: pd.Series, order: np.ndarray = None, descendant_totals: np.ndarray = None):
+        records = pa.array(records, type=pa.string())
+        costs = costs.to_numpy()
+        self._costs = costs
+        if order is None:
+            order = pc.sort_indices(records).to_numpy()
+        self._order = order
+        self._sorted = pc.take(records, pa.array(order))
+        self.depths = (pc.count_substring(records, '.').to_numpy() + 1).astype(np.int16)
+
+        if descendant_totals is None:
+            descendant_totals = self._rollup(costs)
+        self.descendant_totals = descendant_totals
+        # 하위 공종 비용 합계가 0이면 자신의 비용을 사용 (비용 집계 규칙)
+        self.rollup_costs = np.where(descendant_totals == 0, costs, descendant_totals)
+
+    def _rollup(self, costs: np.ndarray) -> np.ndarray:
+        # 정렬된 순서의 비용 누적합에서 각 record의 하위 구간 ["X.", "X/") 합계를 한 번에 계산
+        sorted_records = self._sorted.to_numpy(zero_copy_only=False)
+        prefix = np.concatenate([[0], np.cumsum(costs[self._order])])
+        lo = np.searchsorted(sorted_records, sorted_records + '.')
+        hi = np.searchsorted(sorted_records, sorted_records + _AFTER_DOT)
+        descendant_totals = np.empty_like(prefix[1:])
+        descendant_totals[self._order] = prefix[hi] - prefix[lo]
+        return descendant_totals
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def _bisect(self, key: str, lo: int = 0, right: bool = False) -> int:
+        if right:
+            return bisect.bisect_right(self._sorted, key, lo, key=_as_py)
+        return bisect.bisect_left(self._sorted, key, lo, key=_as_py)
+
+    def positions(self, record: str) -> np.ndarray:
+        """record와 정확히 일치하는 행들의 위치"""
+        lo = self._bisect(record)
+        hi = self._bisect(record, lo, right=True)
+        return np.sort(self._order[lo:hi])
+
+    def position(self, record: str):
+        """record와 일치하는 첫 번째 행의 위치. 없으면 None"""
+        matched = self.positions(record)
+        return int(matched[0]) if len(matched) else None
+
+    def descendant_positions(self, record: str) -> np.ndarray:
+        """record의 모든 하위 공종('record.'으로 시작하는 행)의 위치 (원본 순서)"""
+        lo = self._bisect(record + '.')
+        hi = self._bisect(record + _AFTER_DOT, lo)
+        return np.sort(self._order[lo:hi])
+
+    def subtree_positions(self, record: str) -> np.ndarray:
+        """record 자신과 모든 하위 공종의 위치. 자신의 행이 먼저 오고, 하위 공종은 원본 순서"""
+        return np.concatenate([self.positions(record), self.descendant_positions(record)])
+
+    def subtree_cost(self, record: str):
+        """
+        record의 하위 공종 비용 합계 (0이면 자신의 비용). record와 하위 공종이 모두 없으면 None
+        그래프 상태나 체크포인트에 그대로 넣을 수 있도록 numpy 스칼라가 아닌 파이썬 int/float로 반환
+        """
+        position = self.position(record)
+        if position is not None:
+            return self.rollup_costs[position].item()
+        # record 행 자체는 없고 하위 공종만 있는 경우
+        descendants = self.descendant_positions(record)
+        return self._costs[descendants].sum().item() if len(descendants) else None
+
+    @staticmethod
+    def depth(record: str) -> int:
+        return record.count('.') + 1
+
+    def to_table(self) -> pa.Table:
+        """디스크 캐시에 함께 저장할 정렬 순서와 하위 비용 합계"""
+        return pa.table({'order': self._order, 'descendant_total': self.descendant_totals})
+
+    @classmethod
+    def from_table(cls, df: pd.DataFrame, table: pa.Table) -> "RecordIndex":
+        return cls(
+            df['record'], df['total_cost'],
+            order=table['order'].to_numpy(),
+            descendant_totals=table['descendant_total'].to_numpy(),
+        )
+
+def record_segments(records) -> np.ndarray:
+    """
+    record를 '.' 단위 조각으로 나누어 단계별 정수 코드로 바꾼 (행 수, 최대 깊이) int32 배열. 깊이가 얕은 행의 빈 단계는 -1
+    같은 단계의 조각이 같으면 코드도 같으므로, 두 행의 level단계 상위 record가 같은지는 앞 level개 코드 비교로 확인 가능
+    """
+    records = pa.array(records, type=pa.string())
+    if isinstance(records, pa.ChunkedArray):
+        records = records.combine_chunks()
+    parts = pc.split_pattern(records, '.')
+    lengths = pc.list_value_length(parts).to_numpy(zero_copy_only=False).astype(np.intp)
+    max_depth = int(lengths.max()) if len(records) else 0
+    segments = np.full((len(records), max_depth), -1, dtype=np.int32)
+    # 조각들을 한 번에 사전 인코딩한 뒤, 행마다 몇 번째 조각인지에 따라 해당 단계 칸에 배치
+    codes = pc.dictionary_encode(pc.list_flatten(parts)).indices.to_numpy(zero_copy_only=False)
+    rows = np.repeat(np.arange(len(records)), lengths)
+    levels = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    segments[rows, levels] = codes
+    return segments
+
+class FrameCache:
+    """
+    데이터프레임별로 파생 객체(인덱스 등)를 한 번만 만들기 위한 캐시
+    데이터프레임이 사라지면 해당 항목도 함께 제거됨
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, df: pd.DataFrame, value):
+        key = id(df)
+        with self._lock:
+            self._entries[key] = (weakref.ref(df, lambda _, key=key: self._entries.pop(key, None)), value)
+
+    def get(self, df: pd.DataFrame):
+        with self._lock:
+            entry = self._entries.get(id(df))
+            if entry is not None and entry[0]() is df:
+                return entry[1]
+
+        value = self._factory(df)
+        self.register(df, value)
+        return value
+
+_record_indexes = FrameCache(lambda df: RecordIndex(df['record'], df['total_cost']))
+
+def register_record_index(df: pd.DataFrame, index: RecordIndex):
+    _record_indexes.register(df, index)
+
+def get_record_index(df: pd.DataFrame) -> RecordIndex:
+    """로딩된 데이터프레임의 RecordIndex를 반환. 처음 요청될 때 한 번만 생성"""
+    return _record_indexes.get(df)
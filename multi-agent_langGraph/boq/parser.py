@@ -0,0 +1,93 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+
+# 파싱 결과 데이터프레임의 컬럼 구성
+BOQ_COLUMNS = ['record', '공종명', 'spec', 'total_cost']
+
+# 문자열 컬럼은 pyarrow 기반 string dtype으로 유지 (행마다 파이썬 문자열 객체를 만들지 않음)
+STRING_DTYPE = pd.StringDtype("pyarrow")
+# 행마다 반복이 많은 공종명/spec은 범주형(사전 인코딩)으로 저장하여 행당 1~2바이트 코드만 남김
+CATEGORY_COLUMNS = ('공종명', 'spec')
+
+def table_to_frame(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas(types_mapper={pa.string(): STRING_DTYPE, pa.large_string(): STRING_DTYPE}.get)
+
+_READ_OPTIONS = pa_csv.ReadOptions(column_names=['line'])
+# 각 행을 하나의 문자열 컬럼으로 읽기 위해 데이터에 등장하지 않는 구분자를 사용
+_PARSE_OPTIONS = pa_csv.ParseOptions(
+    delimiter='\x1f',
+    quote_char=False,
+    escape_char=False,
+    double_quote=False,
+    ignore_empty_lines=True,
+    invalid_row_handler=lambda row: 'skip',
+)
+_CONVERT_OPTIONS = pa_csv.ConvertOptions(column_types={'line': pa.string()}, strings_can_be_null=False)
+
+_INT_PATTERN = r'^[+-]?\d+$'
+_FLOAT_PATTERN = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+def _field(parts, index: int, default: str):
+    # 분리된 리스트에서 index번째 값을 꺼내고, 해당 필드가 없는 행은 기본값으로 채움
+    has_field = pc.greater(pc.list_value_length(parts), index)
+    padded = pc.if_else(has_field, parts, pa.scalar([default] * (index + 1), type=parts.type))
+    return pc.utf8_trim_whitespace(pc.list_element(padded, index))
+
+def _to_numeric(costs) -> tuple:
+    """
+    비용 문자열을 숫자 배열로 변환하여 (배열, 0으로 처리한 값 목록)을 반환
+    천 단위 구분자(1,234)는 제거하고, 그래도 숫자가 아닌 값은 0으로 처리 (빈 값은 비용 없음으로 보고 목록에서 제외)
+    정수만 있으면 int64, 소수가 있으면 float64
+    """
+    costs = pc.replace_substring(costs, ",", "")
+    is_number = pc.match_substring_regex(costs, _FLOAT_PATTERN)
+    coerced = costs.filter(pc.and_(pc.invert(is_number), pc.not_equal(costs, ""))).to_pylist()
+    costs = pc.if_else(is_number, costs, "0")
+    if pc.all(pc.match_substring_regex(costs, _INT_PATTERN)).as_py() is not False:
+        return pc.cast(costs, pa.int64()), coerced
+    return pc.cast(costs, pa.float64()), coerced
+
+def empty_boq_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'record': pd.Series(dtype=STRING_DTYPE),
+        '공종명': pd.Series(dtype='category'),
+        'spec': pd.Series(dtype='category'),
+        'total_cost': pd.Series(dtype='int64'),
+    })
+
+def parse_boq_file(file_path: str) -> pd.DataFrame:
+    """
+    "record: 공종명; spec; cost" 형식의 공사 내역서 파일 전체를 한 번에 파싱
+    - 파일을 일괄로 읽은 뒤 pyarrow compute로 컬럼 단위 분리/정제 (행 단위 파이썬 루프 없음)
+    - ':'가 없는 행과 빈 행은 건너뛰고, 세 번째 ';' 이후의 내용은 무시
+    - spec이 없으면 "None", 비용의 천 단위 구분자(,)는 제거하고, 비용이 없거나 숫자가 아니면 0
+      (숫자가 아닌 비용은 하위 공종 합계와 평균을 왜곡하므로 개수와 예시를 출력)
+    - total_cost는 숫자 dtype(int64, 소수가 있으면 float64), 공종명/spec은 범주형(category)으로 반환
+    """
+    if os.path.getsize(file_path) == 0:
+        return empty_boq_frame()
+
+    lines = pc.utf8_trim_whitespace(
+        pa_csv.read_csv(file_path, read_options=_READ_OPTIONS,
+                        parse_options=_PARSE_OPTIONS, convert_options=_CONVERT_OPTIONS)['line']
+    )
+
+    # 'record'와 나머지 부분을 첫 번째 ':' 기준으로 분리
+    head = pc.split_pattern(lines, ':', max_splits=1)
+    head = head.filter(pc.equal(pc.list_value_length(head), 2))
+    rest = pc.split_pattern(pc.list_element(head, 1), ';', max_splits=3)
+    total_cost, coerced = _to_numeric(_field(rest, 2, "0"))
+    if coerced:
+        examples = ", ".join(repr(value) for value in coerced[:3])
+        print(f"경고: {os.path.basename(file_path)} - 숫자로 읽을 수 없는 비용 {len(coerced)}개를 0으로 처리했습니다 (예: {examples})")
+
+    table = pa.table({
+        'record': pc.utf8_trim_whitespace(pc.list_element(head, 0)),
+        '공종명': pc.dictionary_encode(_field(rest, 0, "None")),
+        'spec': pc.dictionary_encode(_field(rest, 1, "None")),
+        'total_cost': total_cost,
+    })
+    return table_to_frame(table)
@@ -0,0 +1,114 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from boq.index import FrameCache, get_record_index
+
+# ProcessAgent가 상위 공종 후보로 살펴보는 record 깊이 (1~4단계)
+CANDIDATE_DEPTHS = (1, 2, 3, 4)
+
+# 질의어 가중치: 분석 대상 키워드가 원본 질문보다 더 중요
+KEYWORD_WEIGHT = 2.0
+QUERY_WEIGHT = 1.0
+
+_WHITESPACE = re.compile(r'\s+')
+
+def char_ngrams(text: str, min_n: int = 1, max_n: int = 2) -> list:
+    """공백을 제거한 문자열의 문자 n-gram 목록 (한국어 공종명은 형태소 분석 없이 글자 단위로 비교)"""
+    text = _WHITESPACE.sub('', str(text)).lower()
+    grams = []
+    for n in range(min_n, max_n + 1):
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+class NgramBM25Index:
+    """
+    문서(공종명)들의 문자 n-gram에 대한 BM25 역색인
+    n-gram별로 (문서 번호, BM25 가중치) 배열을 미리 계산해 두어, 검색은 질의 n-gram 수만큼의 배열 덧셈으로 끝남
+    """
+    def __init__(self, documents: list, k1: float = 1.2, b: float = 0.75):
+        self.num_docs = len(documents)
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(self.num_docs)
+        for doc_id, document in enumerate(documents):
+            grams = char_ngrams(document)
+            lengths[doc_id] = len(grams)
+            for gram, tf in Counter(grams).items():
+                doc_ids, tfs = postings[gram]
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        avg_length = lengths.mean() if self.num_docs and lengths.mean() > 0 else 1.0
+        self._postings = {}
+        for gram, (doc_ids, tfs) in postings.items():
+            doc_ids = np.array(doc_ids, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float64)
+            idf = math.log(1 + (self.num_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = k1 * (1 - b + b * lengths[doc_ids] / avg_length)
+            self._postings[gram] = (doc_ids, idf * tfs * (k1 + 1) / (tfs + norm))
+
+    def scores(self, query_weights: dict) -> np.ndarray:
+        """{n-gram: 가중치} 질의에 대한 문서별 BM25 점수"""
+        scores = np.zeros(self.num_docs)
+        for gram, weight in query_weights.items():
+            posting = self._postings.get(gram)
+            if posting is not None:
+                # 한 n-gram의 문서 번호는 중복이 없으므로 fancy index 덧셈으로 충분
+                scores[posting[0]] += weight * posting[1]
+        return scores
+
+def build_query(keyword: str, original_query: str) -> dict:
+    weights = Counter()
+    for gram in char_ngrams(keyword or ''):
+        weights[gram] += KEYWORD_WEIGHT
+    for gram in char_ngrams(original_query or ''):
+        weights[gram] += QUERY_WEIGHT
+    return dict(weights)
+
+class CandidateRetriever:
+    """
+    ProcessAgent 프롬프트에 넣을 공종 행을 LLM 호출 전에 로컬에서 골라내는 검색기
+    - 깊이 1~4 행의 공종명으로 BM25 인덱스를 만들고 (데이터프레임당 한 번, 같은 공종명은 한 번만 색인)
+    - 키워드/질문과 점수가 높은 상위 k개 행과 그 상위 공종(조상) 행만 원본 순서대로 반환
+    """
+    def __init__(self, df: pd.DataFrame):
+        self._record_index = get_record_index(df)
+        # 데이터프레임 자체를 참조하지 않도록 record 컬럼은 arrow 배열로 보관 (FrameCache의 weakref 유지)
+        self._records = pa.array(df['record'], type=pa.string())
+        self.positions = np.flatnonzero(np.isin(self._record_index.depths, CANDIDATE_DEPTHS))
+        # 내역서에는 같은 공종명이 반복되므로 고유 공종명만 색인하고 행별 점수는 코드로 펼침
+        self._name_codes, unique_names = pd.factorize(df['공종명'].iloc[self.positions])
+        self.index = NgramBM25Index(list(unique_names))
+
+    def _ancestor_positions(self, positions: np.ndarray) -> list:
+        ancestors = set()
+        for record in self._records.take(pa.array(positions)).to_pylist():
+            parts = record.split('.')
+            ancestors.update('.'.join(parts[:depth]) for depth in range(1, len(parts)))
+        found = [self._record_index.position(prefix) for prefix in ancestors]
+        return [position for position in found if position is not None]
+
+    def select(self, keyword: str, original_query: str, top_k: int) -> np.ndarray:
+        """상위 k개 행과 그 조상 행의 위치(원본 순서). 후보가 k개 이하이거나 일치하는 행이 없으면 전체 후보"""
+        if len(self.positions) <= top_k:
+            return self.positions
+        scores = self.index.scores(build_query(keyword, original_query))[self._name_codes]
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) == 0:
+            return self.positions
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+
+        selected = self.positions[matched]
+        ancestors = self._ancestor_positions(selected)
+        return np.unique(np.concatenate([selected, np.array(ancestors, dtype=selected.dtype)]))
+
+_retrievers = FrameCache(CandidateRetriever)
+
+def get_candidate_retriever(df: pd.DataFrame) -> CandidateRetriever:
+    """로딩된 데이터프레임의 CandidateRetriever를 반환. 처음 요청될 때 한 번만 생성"""
+    return _retrievers.get(df)
@@ -0,0 +1,229 @@
+import math
+import numpy as np
+from typing import Optional
+
+# 보고하는 분위수 (P10/P50/P90)
+QUANTILES = (0.1, 0.5, 0.9)
+# 절사 평균에서 위/아래 각각 제외하는 비율
+DEFAULT_TRIM = 0.1
+
+def _empty_summary(trim: float, outliers_removed: int = 0, approximate: bool = False) -> dict:
+    return {
+        "count": 0, "sum": 0.0, "mean": None, "median": None,
+        "p10": None, "p50": None, "p90": None, "trimmed_mean": None, "trim": trim,
+        "min": None, "max": None,
+        "outliers_removed": outliers_removed, "approximate": approximate,
+    }
+
+def _trim_count(count: int, trim: float) -> int:
+    # 양쪽에서 잘라낼 개수. 남는 값이 없으면 자르지 않음
+    cut = int(count * trim)
+    return cut if count - 2 * cut > 0 else 0
+
+def outlier_mask(values: np.ndarray, k: float = 1.5) -> np.ndarray:
+    """Tukey 울타리 [Q1 - k*IQR, Q3 + k*IQR] 안에 있는 값이면 True"""
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    return (values >= q1 - k * iqr) & (values <= q3 + k * iqr)
+
+def describe_costs(costs, trim: float = DEFAULT_TRIM, outlier_k: Optional[float] = None) -> dict:
+    """
+    비용 배열의 요약 통계 (numpy 벡터 연산, 정확한 값)
+    반환 키: count, sum, mean, median, p10, p50, p90, trimmed_mean, trim, min, max, outliers_removed, approximate
+    outlier_k를 주면 Tukey 울타리 밖의 값을 제외하고 계산 (값이 4개 미만이면 제외하지 않음)
+    """
+    values = np.asarray(costs, dtype=np.float64).ravel()
+    removed = 0
+    if outlier_k is not None and len(values) >= 4:
+        mask = outlier_mask(values, outlier_k)
+        removed = int(len(values) - mask.sum())
+        values = values[mask]
+    if not len(values):
+        return _empty_summary(trim, removed)
+
+    values = np.sort(values)
+    p10, p50, p90 = np.quantile(values, QUANTILES)
+    cut = _trim_count(len(values), trim)
+    return {
+        "count": int(len(values)),
+        "sum": float(values.sum()),
+        "mean": float(values.mean()),
+        "median": float(p50),
+        "p10": float(p10),
+        "p50": float(p50),
+        "p90": float(p90),
+        "trimmed_mean": float(values[cut:len(values) - cut].mean()),
+        "trim": trim,
+        "min": float(values[0]),
+        "max": float(values[-1]),
+        "outliers_removed": removed,
+        "approximate": False,
+    }
+
+def cost_statistics(costs_by_project: dict, trim: float = DEFAULT_TRIM, outlier_k: Optional[float] = None) -> dict:
+    """
+    프로젝트(파일)별 비용 배열로 전체 요약 통계와 프로젝트별 통계를 함께 계산
+    반환: {"overall": describe_costs 결과, "projects": {프로젝트: {count, sum, mean, median, min, max}}}
+    이상치 제외는 전체 분포 기준 울타리로 한 번 판정하여 프로젝트별 통계에도 똑같이 적용
+    """
+    names = [name for name, costs in costs_by_project.items() if len(costs)]
+    arrays = [np.asarray(costs_by_project[name], dtype=np.float64).ravel() for name in names]
+    values = np.concatenate(arrays) if arrays else np.empty(0)
+    codes = np.repeat(np.arange(len(names)), [len(array) for array in arrays])
+
+    removed = 0
+    if outlier_k is not None and len(values) >= 4:
+        mask = outlier_mask(values, outlier_k)
+        removed = int(len(values) - mask.sum())
+        values, codes = values[mask], codes[mask]
+
+    overall = describe_costs(values, trim=trim)
+    overall["outliers_removed"] = removed
+    if not len(values):
+        return {"overall": overall, "projects": {}}
+
+    # 프로젝트별 통계: (프로젝트, 비용) 순으로 한 번 정렬한 뒤 프로젝트 구간의 시작/끝/가운데 위치로 계산
+    counts = np.bincount(codes, minlength=len(names))
+    present = np.nonzero(counts)[0]
+    counts = counts[present]
+    ordered = values[np.lexsort((values, codes))]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sums = np.add.reduceat(ordered, starts)
+    medians = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+    projects = {
+        str(names[code]): {
+            "count": int(count),
+            "sum": float(total),
+            "mean": float(total / count),
+            "median": float(median),
+            "min": float(ordered[start]),
+            "max": float(ordered[start + count - 1]),
+        }
+        for code, count, start, total, median in zip(present, counts, starts, sums, medians)
+    }
+    return {"overall": overall, "projects": projects}
+
+class CostSketch:
+    """
+    비용을 하나씩 보관하지 않고 고정된 메모리로 누적하는 스트리밍 통계
+    - 개수/합계/최소/최대는 정확하게 유지
+    - 분위수(P10/P50/P90)와 절사 평균은 로그 간격 구간 히스토그램으로 추정 (구간 대표값의 상대 오차 relative_accuracy 이내)
+    - 구간 수는 값의 범위에 따라서만 늘어남 (1원 ~ 1조원이 1% 정확도에서 약 1,400개)
+    - merge로 여러 스케치(파일별 등)를 합칠 수 있음
+    """
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        # 양수/음수(절대값) 각각 구간 번호 -> 개수 (offset부터 시작하는 연속 배열)
+        self._bins = {1: (0, np.zeros(0, dtype=np.int64)), -1: (0, np.zeros(0, dtype=np.int64))}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _add_keys(self, sign: int, keys: np.ndarray, weights: Optional[np.ndarray] = None):
+        if not len(keys):
+            return
+        offset, counts = self._bins[sign]
+        if not len(counts):
+            offset = int(keys.min())
+        lo, hi = min(offset, int(keys.min())), max(offset + len(counts), int(keys.max()) + 1)
+        grown = np.zeros(hi - lo, dtype=np.int64)
+        grown[offset - lo:offset - lo + len(counts)] = counts
+        grown += np.bincount(keys - lo, weights=weights, minlength=hi - lo).astype(np.int64)
+        self._bins[sign] = (lo, grown)
+
+    def add(self, costs) -> "CostSketch":
+        """비용 배열(또는 리스트)을 한 번에 누적"""
+        values = np.asarray(costs, dtype=np.float64).ravel()
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.zeros += int((values == 0).sum())
+        for sign in (1, -1):
+            magnitudes = values[values * sign > 0] * sign
+            self._add_keys(sign, np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64))
+        return self
+
+    def merge(self, other: "CostSketch") -> "CostSketch":
+        """같은 정확도로 만든 다른 스케치의 누적 결과를 합침"""
+        if other._gamma != self._gamma:
+            raise ValueError("relative_accuracy가 다른 CostSketch는 합칠 수 없습니다.")
+        if not other.count:
+            return self
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        for sign in (1, -1):
+            offset, counts = other._bins[sign]
+            present = np.nonzero(counts)[0]
+            self._add_keys(sign, present + offset, counts[present])
+        return self
+
+    def _bucket_values(self, sign: int):
+        # 구간 (gamma^(k-1), gamma^k]의 대표값 2*gamma^k/(gamma+1)과 개수
+        offset, counts = self._bins[sign]
+        return 2 * self._gamma ** np.arange(offset, offset + len(counts)) / (self._gamma + 1), counts
+
+    def _histogram(self):
+        # 오름차순 구간 대표값과 개수 (음수 -> 0 -> 양수), 대표값은 실제 최소/최대 범위로 제한
+        negative_values, negative_counts = self._bucket_values(-1)
+        positive_values, positive_counts = self._bucket_values(1)
+        values = np.concatenate([-negative_values[::-1], [0.0], positive_values])
+        counts = np.concatenate([negative_counts[::-1], [self.zeros], positive_counts])
+        present = counts > 0
+        return np.clip(values[present], self.min, self.max), counts[present]
+
+    @staticmethod
+    def _weighted_quantiles(values: np.ndarray, counts: np.ndarray, quantiles) -> np.ndarray:
+        ranks = np.asarray(quantiles) * (counts.sum() - 1)
+        return values[np.searchsorted(np.cumsum(counts), ranks, side='right')]
+
+    def summary(self, trim: float = DEFAULT_TRIM, outlier_k: Optional[float] = None) -> dict:
+        """describe_costs와 같은 형식의 요약 통계 (approximate=True)"""
+        if not self.count:
+            return _empty_summary(trim, approximate=True)
+        values, counts = self._histogram()
+        total, count, low, high = self.sum, self.count, self.min, self.max
+
+        removed = 0
+        if outlier_k is not None and count >= 4:
+            q1, q3 = self._weighted_quantiles(values, counts, (0.25, 0.75))
+            keep = (values >= q1 - outlier_k * (q3 - q1)) & (values <= q3 + outlier_k * (q3 - q1))
+            removed = int(counts[~keep].sum())
+            if removed:
+                # 제외한 뒤의 합계/최소/최대는 구간 대표값으로 추정
+                values, counts = values[keep], counts[keep]
+                count = int(counts.sum())
+                if not count:
+                    return _empty_summary(trim, removed, approximate=True)
+                total = float((values * counts).sum())
+                low, high = float(values[0]), float(values[-1])
+
+        p10, p50, p90 = (float(q) for q in self._weighted_quantiles(values, counts, QUANTILES))
+        # 절사 평균: 누적 개수에서 앞뒤 cut개를 뺀 구간의 가중 평균
+        cut = _trim_count(count, trim)
+        upper = np.cumsum(counts)
+        kept = np.clip(np.minimum(upper, count - cut) - np.maximum(upper - counts, cut), 0, None)
+        return {
+            "count": int(count),
+            "sum": float(total),
+            "mean": float(total / count),
+            "median": p50,
+            "p10": p10,
+            "p50": p50,
+            "p90": p90,
+            "trimmed_mean": float((values * kept).sum() / kept.sum()),
+            "trim": trim,
+            "min": float(low),
+            "max": float(high),
+            "outliers_removed": removed,
+            "approximate": True,
+        }
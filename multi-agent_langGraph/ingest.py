@@ -0,0 +1,49 @@
+"""
+data 폴더의 모든 공사 내역서(.txt)를 하나의 코퍼스(boq.corpus.CorpusStore)로 적재
+적재된 파일은 Orchestrator와 ComputeAgent가 파일을 따로 파싱하지 않고 코퍼스에서 바로 읽음
+다시 실행하면 내용이 바뀐 파일과 새 파일만 다시 읽음
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python ingest.py
+    python ingest.py --search "교량" --depths 1 2 3 4
+"""
+import os
+import time
+import argparse
+from pathlib import Path
+
+from boq.cache import ParsedFileCache
+from boq.corpus import CorpusStore
+
+def ingest(data_dir: str) -> dict:
+    cache_dir = os.path.join(data_dir, ".boq_cache")
+    # 파싱 캐시를 거쳐 읽어 두면, 실행 중 원본이 바뀌었는지 확인할 때 내용 해시를 다시 계산하지 않음
+    parsed_cache = ParsedFileCache(cache_dir)
+    file_names = [f for f in os.listdir(data_dir) if f.endswith('.txt')]
+    return CorpusStore(cache_dir).ingest(data_dir, file_names, parsed_cache.content_hash, parsed_cache.load)
+
+def main():
+    parser = argparse.ArgumentParser(description="공사 내역서 전체를 하나의 코퍼스로 적재")
+    parser.add_argument("--data-dir", default=str(Path(__file__).resolve().parent / "data"), help="내역서(.txt) 폴더")
+    parser.add_argument("--search", help="적재 후 모든 프로젝트에서 공종명에 이 문자열이 포함된 행을 검색")
+    parser.add_argument("--depths", type=int, nargs="*", help="검색할 record 깊이 (기본값: 전체)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = ingest(args.data_dir)
+    print(f"코퍼스 적재 완료: 파일 {stats['files']}개, {stats['rows']:,}행 "
+          f"(새로 읽음 {stats['loaded']}개, 재사용 {stats['reused']}개), {time.perf_counter() - start:.2f}s")
+    if stats['failed']:
+        print(f"적재 실패: {', '.join(stats['failed'])}")
+
+    if args.search:
+        corpus = CorpusStore(os.path.join(args.data_dir, ".boq_cache"))
+        start = time.perf_counter()
+        rows = corpus.search(args.search, depths=tuple(args.depths) if args.depths else None)
+        elapsed = time.perf_counter() - start
+        print(f"\n'{args.search}' 검색 결과: {len(rows):,}행, {rows['file_name'].nunique()}개 파일 ({elapsed * 1000:.1f}ms, 색인 생성 포함)")
+        if len(rows):
+            print(rows[['file_name', 'record', '공종명', 'subtree_cost']].head(20).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
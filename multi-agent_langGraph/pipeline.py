@@ -0,0 +1,321 @@
+"""
+메인 그래프(Orchestrator -> 세부 공종 추출 / 일반 비용 분석)의 상태, 노드, 흐름 정의와 실행 함수
+pandas, langchain, langgraph를 불러오므로 main.py는 이 모듈을 처음 사용할 때 import함
+에이전트는 build_agents를 호출하거나 처음 접근할 때(orchestrator, app 등) 기본 데이터 디렉토리로 생성하고,
+그래프(app)는 처음 실행할 때 컴파일
+"""
+import os
+import asyncio
+import threading
+import pandas as pd
+from pathlib import Path
+from typing import TypedDict, List, Optional, Callable
+
+from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
+
+from agents.orchestrator import Orchestrator
+from agents.process_agent import ProcessAgent
+from agents.evaluator_agent import EvaluatorAgent
+from agents.compute_agent import ComputeAgent, format_progress, summarize_progress
+from agents.llm_cache import llm_cache_scope
+from agents.result_store import FileResultStore
+from agents.instrumentation import instrumentation
+from agents.prompt_layout import DEFAULT_PROMPT_LAYOUT
+from boq.index import get_record_index
+from boq.datasets import DatasetHandle
+
+current_file_path = Path(__file__).resolve()
+current_dir = current_file_path.parent
+
+DEFAULT_DATA_DIR = current_dir/"data"
+# 에이전트 생성과 그래프 컴파일을 한 번만 하도록 보호 (CLI의 백그라운드 초기화, 서버의 요청 스레드가 동시에 접근)
+_agents_lock = threading.RLock()
+_AGENT_NAMES = ("orchestrator", "process_agent", "evaluator_agent", "compute_agent")
+
+def build_agents(data_dir, llm=None, prompt_layout=DEFAULT_PROMPT_LAYOUT):
+    """
+    에이전트들을 생성하여 그래프 노드들이 사용하는 모듈 전역 변수로 설정
+    벤치마크처럼 다른 데이터 디렉토리나 LLM으로 같은 그래프(app)를 실행할 때 다시 호출
+    prompt_layout="prefix"이면 서버 프리픽스 캐시를 활용하는 프롬프트 구성을 사용 (agents/prompt_layout.py)
+    """
+    global orchestrator, process_agent, evaluator_agent, compute_agent
+    with _agents_lock:
+        orchestrator = Orchestrator(data_dir=data_dir, llm=llm)
+        process_agent = ProcessAgent(llm=orchestrator.llm, prompt_layout=prompt_layout)
+        evaluator_agent = EvaluatorAgent(llm=orchestrator.llm, prompt_layout=prompt_layout)
+        # 파일별 비용 분석 결과를 저장해 두고 다음 실행에서는 새 파일이나 바뀐 파일만 처리
+        result_store = FileResultStore(os.path.join(data_dir, ".boq_cache", "file_results.sqlite"))
+        instrumentation.register_gauges("boq_result_store", result_store.stats)
+        compute_agent = ComputeAgent(
+            process_agent=process_agent,
+            evaluator_agent=evaluator_agent,
+            parsed_cache=orchestrator.parsed_cache,
+            result_store=result_store,
+            corpus=orchestrator.corpus,
+            datasets=orchestrator.datasets
+        )
+
+def _ensure_agents():
+    # build_agents를 아직 호출하지 않았으면 기본 데이터 디렉토리로 에이전트를 생성
+    with _agents_lock:
+        if "orchestrator" not in globals():
+            build_agents(DEFAULT_DATA_DIR)
+
+def __getattr__(name: str):
+    """에이전트(orchestrator 등)와 컴파일된 그래프(app)는 처음 접근할 때 생성"""
+    if name in _AGENT_NAMES:
+        _ensure_agents()
+        return globals()[name]
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+########################## 그래프 상태 정의 ##########################
+class AgentState(TypedDict):
+    user_query: str
+    available_files: List[str]
+    task: Optional[str]
+    parameters: Optional[dict]
+    # 로딩한 파일의 데이터셋 핸들 (데이터프레임은 orchestrator.datasets에서 꺼내므로 상태 크기가 일정함)
+    dataset: Optional[DatasetHandle]
+    parent_candidates: Optional[list]
+    validated_parents: Optional[list]
+    final_result: Optional[str]
+    # 일반 비용 분석의 구조화된 통계 (전체 요약 + 프로젝트별)
+    cost_stats: Optional[dict]
+
+########################## 노드(Node) 함수 정의 ##########################
+def orchestrate_node(state: AgentState):
+    print("--- 노드 실행: Orchestrator ---")
+    task_plan = orchestrator.plan_task(state['user_query'], state['available_files'])
+    return {"task": task_plan.get("task"), "parameters": task_plan.get("parameters")}
+
+async def aorchestrate_node(state: AgentState):
+    print("--- 노드 실행: Orchestrator ---")
+    task_plan = await orchestrator.aplan_task(state['user_query'], state['available_files'])
+    return {"task": task_plan.get("task"), "parameters": task_plan.get("parameters")}
+
+def load_data_node(state: AgentState):
+    print("--- 노드 실행: 데이터 로딩 ---")
+    file_name = state["parameters"].get("file_name")
+    if not file_name:
+        raise ValueError("데이터 로딩 노드: 파일명이 없습니다.")
+    dataset = orchestrator.open_dataset(file_name) # Orchestrator의 로딩 기능 재사용
+    return {"dataset": dataset}
+
+async def aload_data_node(state: AgentState):
+    # 파일 파싱은 CPU 작업이므로 이벤트 루프를 막지 않도록 스레드에서 실행
+    return await asyncio.to_thread(load_data_node, state)
+
+def _data_file_path(state: AgentState) -> str:
+    return os.path.abspath(os.path.join(orchestrator.data_dir, state["parameters"].get("file_name")))
+
+def _target_data(state: AgentState) -> Optional[pd.DataFrame]:
+    # 로딩에 실패한 경우(핸들 없음)에는 None
+    return orchestrator.datasets.resolve(state['dataset']) if state.get('dataset') else None
+
+def process_node(state: AgentState):
+    print("--- 노드 실행: ProcessAgent ---")
+    with llm_cache_scope(_data_file_path(state)):
+        candidates = process_agent.find_parent_processes(
+            original_query=state['user_query'],
+            keyword=state['parameters'].get("process_name"),
+            full_data=_target_data(state)
+        )
+    return {"parent_candidates": candidates}
+
+async def aprocess_node(state: AgentState):
+    print("--- 노드 실행: ProcessAgent ---")
+    with llm_cache_scope(_data_file_path(state)):
+        candidates = await process_agent.afind_parent_processes(
+            original_query=state['user_query'],
+            keyword=state['parameters'].get("process_name"),
+            full_data=_target_data(state)
+        )
+    return {"parent_candidates": candidates}
+
+def evaluate_node(state: AgentState):
+    print("--- 노드 실행: EvaluatorAgent ---")
+    with llm_cache_scope(_data_file_path(state)):
+        validated = evaluator_agent.validate_parent_processes(
+            original_query=state['user_query'],
+            candidates=state['parent_candidates'],
+            full_data=_target_data(state),
+            keyword=state['parameters'].get("process_name")
+        )
+    
+    # ############################ 결과 출력 코드 ################################
+    # # 출력 결과를 파일로 저장하는 코드
+    # try:
+    #     file_name = state["parameters"].get("file_name")
+    #     if file_name:
+    #         output_dir = current_dir/"교량/output4"
+    #         os.makedirs(output_dir, exist_ok=True)
+            
+    #         results_to_save = {
+    #             "parent_candidates": state.get('parent_candidates', []),
+    #             "validated_parents": validated
+    #         }
+
+    #         base_filename = os.path.splitext(file_name)[0]
+    #         output_filepath = os.path.join(output_dir, f"{base_filename}_results.json")
+            
+    #         with open(output_filepath, 'w', encoding='utf-8') as f:
+    #             json.dump(results_to_save, f, ensure_ascii=False, indent=4)
+    #         print(f"--- 중간 결과 저장 완료: {output_filepath} ---")
+            
+    # except Exception as e:
+    #     print(f"--- 중간 결과 저장 중 오류 발생: {e} ---")
+    # ##########################################################################
+    return {"validated_parents": validated}
+
+async def aevaluate_node(state: AgentState):
+    print("--- 노드 실행: EvaluatorAgent ---")
+    with llm_cache_scope(_data_file_path(state)):
+        validated = await evaluator_agent.avalidate_parent_processes(
+            original_query=state['user_query'],
+            candidates=state['parent_candidates'],
+            full_data=_target_data(state),
+            keyword=state['parameters'].get("process_name")
+        )
+    return {"validated_parents": validated}
+
+def finalize_sub_process_node(state: AgentState):
+    validated_parents = state.get("validated_parents")
+    if not validated_parents:
+        return {"final_result": f"'{state['parameters'].get('process_name')}'과 직접 관련된 공종을 찾을 수 없습니다."}
+
+    all_sub_processes = []
+    target_data = _target_data(state)
+    record_index = get_record_index(target_data)
+    # 검증된 각 상위 공종 및 그 하위 공종들을 모두 찾아서 리스트에 추가
+    for parent in validated_parents:
+        parent_id = parent.get("record")
+        if parent_id:
+            subtree_positions = record_index.subtree_positions(parent_id)
+            if len(subtree_positions): all_sub_processes.append(target_data.iloc[subtree_positions])
+    
+    if not all_sub_processes:
+        return {"final_result": "관련된 세부 공종 내역이 없습니다."}
+    
+    final_df = pd.concat(all_sub_processes)
+    return {"final_result": final_df.to_string()}
+
+def _compute_input(state: AgentState) -> dict:
+    return {
+        "original_query": state['user_query'],
+        "target_process_name": state['parameters'].get('process_name'),
+        "available_files": state['available_files'],
+        "data_dir": orchestrator.data_dir,
+    }
+
+def compute_node(state: AgentState):
+    print("--- 노드 실행: ComputeAgent Subgraph ---")
+    # 파일별 누적 통계를 메인 그래프의 custom 스트림으로 전달 (custom 모드로 스트리밍하지 않으면 무시됨)
+    subgraph_final_state = compute_agent.run(_compute_input(state), on_progress=get_stream_writer())
+    result_string = subgraph_final_state.get("final_result", "서브그래프에서 결과를 가져오는 데 실패했습니다.")
+    return {"final_result": result_string, "cost_stats": subgraph_final_state.get("cost_stats")}
+
+async def acompute_node(state: AgentState):
+    print("--- 노드 실행: ComputeAgent Subgraph ---")
+    subgraph_final_state = await compute_agent.arun(_compute_input(state), on_progress=get_stream_writer())
+    result_string = subgraph_final_state.get("final_result", "서브그래프에서 결과를 가져오는 데 실패했습니다.")
+    return {"final_result": result_string, "cost_stats": subgraph_final_state.get("cost_stats")}
+
+
+########################### 그래프 흐름 정의 및 컴파일 ##########################
+def route_task(state: AgentState):
+    # Orchestrator의 결과에 따라 다음 노드 결정
+    if state['task'] == "sub_process_extraction":
+        return "load_data_node"
+    elif state['task'] == "general_cost_analysis":
+        return "compute_node"
+    else:
+        return END
+
+workflow = StateGraph(AgentState)
+
+# 함수들을 그래프의 노드로 추가 (동기/비동기 구현을 함께 등록하여 app.invoke와 app.ainvoke 모두 지원)
+# 모든 노드는 계측 래퍼로 감싸며, 계측이 꺼져 있으면 플래그 확인만 하고 원래 함수를 실행
+workflow.add_node("orchestrator", instrumentation.node("orchestrator", orchestrate_node, aorchestrate_node))
+workflow.add_node("load_data_node", instrumentation.node("load_data_node", load_data_node, aload_data_node))
+workflow.add_node("process_agent", instrumentation.node("process_agent", process_node, aprocess_node))
+workflow.add_node("evaluator_agent", instrumentation.node("evaluator_agent", evaluate_node, aevaluate_node))
+workflow.add_node("finalize_sub_process", instrumentation.node("finalize_sub_process", finalize_sub_process_node))
+workflow.add_node("compute_node", instrumentation.node("compute_node", compute_node, acompute_node))
+
+# 그래프의 시작점을 'orchestrator' 노드로 설정
+workflow.set_entry_point("orchestrator")
+
+# 'orchestrator' 노드 다음에 어떤 노드로 갈지 'route_task' 함수를 통해 조건부로 결정
+workflow.add_conditional_edges("orchestrator", route_task, {
+    "load_data_node": "load_data_node",
+    "compute_node": "compute_node",
+    END: END
+})
+
+############################ 경로 정의 ############################
+# 세부 공종 추출 경로
+workflow.add_edge('load_data_node', 'process_agent')
+workflow.add_edge('process_agent', 'evaluator_agent')
+workflow.add_edge('evaluator_agent', 'finalize_sub_process')
+workflow.add_edge('finalize_sub_process', END)
+
+# 일반 비용 분석 경로
+workflow.add_edge('compute_node', END)
+
+def compile_app(checkpointer=None):
+    """
+    그래프를 컴파일. checkpointer를 주면 단계마다 상태를 저장하여 같은 thread_id로 중단된 실행을 이어갈 수 있음
+    (상태에는 데이터프레임 대신 데이터셋 핸들만 들어가므로 체크포인트 크기가 데이터 크기와 무관함)
+    """
+    return workflow.compile(checkpointer=checkpointer)
+
+def get_app():
+    """기본 그래프(체크포인터 없음)를 처음 호출할 때 컴파일하여 재사용. 에이전트가 없으면 기본 데이터 디렉토리로 생성"""
+    global app
+    with _agents_lock:
+        _ensure_agents()
+        if "app" not in globals():
+            # 정의된 워크플로우를 실행 가능한 객체로 컴파일
+            app = compile_app()
+    return app
+
+def build_initial_state(query: str) -> dict:
+    # 데이터 디렉토리가 바뀌었을 때만(파일 추가/삭제) 파일 목록을 다시 읽음
+    _ensure_agents()
+    orchestrator.refresh_file_list()
+    return {
+        "user_query": query,
+        "available_files": orchestrator.available_files
+    }
+
+GRAPH_CONFIG = {"recursion_limit": 200}
+
+def run_query(query: str, on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    질문 하나를 동기로 실행하고 최종 상태를 반환
+    on_progress가 주어지면 일반 비용 분석에서 파일 하나가 끝날 때마다 누적 통계(cost_progress 이벤트)로 호출
+    """
+    if on_progress is None:
+        return get_app().invoke(build_initial_state(query), config=GRAPH_CONFIG)
+    final_state = {}
+    for mode, chunk in get_app().stream(build_initial_state(query), config=GRAPH_CONFIG, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            on_progress(chunk)
+        else:
+            final_state = chunk
+    return final_state
+
+async def arun_query(query: str, on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """질문 하나를 비동기로 실행하고 최종 상태를 반환. 여러 질문을 하나의 이벤트 루프에서 동시에 처리할 수 있음"""
+    if on_progress is None:
+        return await get_app().ainvoke(build_initial_state(query), config=GRAPH_CONFIG)
+    final_state = {}
+    async for mode, chunk in get_app().astream(build_initial_state(query), config=GRAPH_CONFIG, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            on_progress(chunk)
+        else:
+            final_state = chunk
+    return final_state
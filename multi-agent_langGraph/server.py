@@ -0,0 +1,236 @@
+"""
+상주 질의 서버
+한 번 시작하면 에이전트, 컴파일된 그래프, 캐시(파싱 결과, 메모리 데이터, record/후보 인덱스, LLM 응답)를 메모리에 유지하고
+로컬 HTTP 또는 유닉스 소켓 엔드포인트로 질문을 받아 JSON으로 결과를 반환
+ - POST /query   {"query": "...", "id": 선택, "timeout": 선택(초)} -> batch_runner.run_one과 같은 형식의 결과
+ - POST /reload  데이터 디렉토리를 다시 읽고 코퍼스 적재와 데이터/인덱스 미리 올리기를 다시 실행
+ - GET  /health  서버 상태 (파일 수, 실행 중/처리한/오류/시간 초과 질문 수, 가동 시간, 메모리 데이터 캐시)
+ - GET  /metrics Prometheus 텍스트 형식 지표 (노드/LLM 계측, 캐시, 응답 파싱, 서버 통계)
+
+실행 (multi-agent_langGraph 디렉토리에서):
+    python server.py --port 8765 -c 4 --timeout 300
+    python server.py --unix /tmp/boq.sock
+    curl -s localhost:8765/query -d '{"query": "일반적인 교량 비용"}'
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import main
+from ingest import ingest
+from batch_runner import run_one
+from boq.index import get_record_index
+from boq.retrieval import get_candidate_retriever
+from agents.instrumentation import instrumentation
+
+DEFAULT_PORT = 8765
+# 질문 하나의 최대 실행 시간(초). 동시 실행 한도 때문에 기다린 시간도 포함
+DEFAULT_TIMEOUT = 300.0
+
+class QueryService:
+    """
+    백그라운드 이벤트 루프 하나에서 그래프를 실행하는 질의 서비스
+    요청 스레드들은 이 루프에 질문을 넘기고 결과를 기다리므로, 모든 요청이 같은 에이전트와 캐시를 공유함
+    동시에 실행하는 질문은 concurrency개로 제한하고, 시간 초과 시 일반 비용 분석은 그때까지의 부분 통계를 반환
+    """
+    def __init__(self, data_dir: str, concurrency: int = 4, timeout: float = DEFAULT_TIMEOUT):
+        self.data_dir = data_dir
+        self.timeout = timeout
+        self.started = time.time()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "in_flight": 0, "completed": 0, "errors": 0, "timeouts": 0, "latency_seconds_total": 0.0}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="boq-query-loop", daemon=True)
+        self._thread.start()
+        instrumentation.register_gauges("boq_server", self.stats)
+
+    def preload(self) -> dict:
+        """
+        코퍼스를 갱신(바뀐 파일만 다시 읽음)하고 각 파일의 데이터프레임과 record/후보 인덱스를 메모리에 미리 올림
+        메모리 데이터 캐시 한도를 넘으면 LoadedFrameCache가 오래 쓰지 않은 파일부터 내림
+        """
+        started = time.perf_counter()
+        if os.path.isdir(self.data_dir):
+            ingest(self.data_dir)
+        orchestrator = main.orchestrator
+        files = orchestrator.refresh_file_list()
+        rows, failed = 0, []
+        for file_name in files:
+            try:
+                handle = orchestrator.datasets.open(os.path.join(self.data_dir, file_name))
+                df = orchestrator.datasets.resolve(handle)
+                get_record_index(df)
+                get_candidate_retriever(df)
+                rows += handle['rows']
+            except Exception as e:
+                print(f"미리 올리기 실패: {file_name} - {e}")
+                failed.append(file_name)
+        return {"files": len(files), "rows": rows, "failed": failed, "seconds": round(time.perf_counter() - started, 3)}
+
+    async def _run(self, item: dict, timeout: float) -> dict:
+        # 파일 목록은 질문마다 build_initial_state에서 갱신되므로 새로 추가된 내역서도 바로 분석 대상에 포함
+        started = time.perf_counter()
+        try:
+            # run_one은 취소되면 그때까지의 결과(일반 비용 분석은 부분 통계)를 반환하므로 시간 초과 시에도 결과가 있음
+            result = await asyncio.wait_for(run_one(item, self._semaphore), timeout)
+        except asyncio.TimeoutError:
+            # 동시 실행 한도 때문에 시작하지도 못한 경우
+            result = {"id": item["id"], "query": item["query"], "final_result": None,
+                      "latency": round(time.perf_counter() - started, 4), "error": "cancelled"}
+        if result["error"] == "cancelled":
+            result["error"] = "timeout"
+        return result
+
+    def query(self, query: str, query_id=None, timeout: float = None) -> dict:
+        """질문 하나를 실행하고 결과를 반환 (요청 스레드에서 호출)"""
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["in_flight"] += 1
+            # 동시에 들어온 요청이 같은 id를 받지 않도록 증가시킨 값을 잠금 안에서 읽음
+            request_number = self._counts["requests"]
+        item = {"id": query_id if query_id is not None else request_number, "query": query}
+        try:
+            result = asyncio.run_coroutine_threadsafe(self._run(item, timeout or self.timeout), self.loop).result()
+        finally:
+            with self._lock:
+                self._counts["in_flight"] -= 1
+        with self._lock:
+            outcome = {None: "completed", "timeout": "timeouts"}.get(result["error"], "errors")
+            self._counts[outcome] += 1
+            self._counts["latency_seconds_total"] += result["latency"]
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "uptime_seconds": round(time.time() - self.started, 1)}
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "data_dir": self.data_dir,
+            "files": len(main.orchestrator.available_files),
+            **self.stats(),
+            "data_cache": main.orchestrator.loaded_data_cache.stats(),
+        }
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """JSON 요청/응답 핸들러 (self.server.service의 QueryService를 사용)"""
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("요청 본문은 JSON 객체여야 합니다.")
+        return body
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send_json(200, service.health())
+        elif self.path == "/metrics":
+            self._send(200, instrumentation.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send_json(404, {"error": f"알 수 없는 경로입니다: {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        if self.path not in ("/query", "/reload"):
+            self._send_json(404, {"error": f"알 수 없는 경로입니다: {self.path}"})
+            return
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"error": f"잘못된 JSON 요청입니다: {e}"})
+            return
+
+        if self.path == "/reload":
+            self._send_json(200, service.preload())
+            return
+        query, timeout = body.get("query"), body.get("timeout")
+        if not isinstance(query, str) or not query.strip():
+            self._send_json(400, {"error": "'query' 필드(문자열)가 필요합니다."})
+            return
+        if timeout is not None and (not isinstance(timeout, (int, float)) or timeout <= 0):
+            self._send_json(400, {"error": "'timeout'은 0보다 큰 숫자(초)여야 합니다."})
+            return
+        result = service.query(query.strip(), body.get("id"), timeout)
+        self._send_json(504 if result["error"] == "timeout" else 200, result)
+
+    def address_string(self) -> str:
+        # 유닉스 소켓 연결은 클라이언트 주소가 없음
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def create_server(service: QueryService, host: str = "127.0.0.1", port: int = DEFAULT_PORT, unix_socket: str = None):
+    """HTTP(host:port) 또는 유닉스 소켓 서버를 만들어 서비스를 연결 (요청마다 스레드 하나)"""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, QueryRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), QueryRequestHandler)
+    server.service = service
+    return server
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="에이전트와 캐시를 메모리에 유지하며 로컬 엔드포인트로 질문을 처리하는 상주 서버")
+    parser.add_argument("--data-dir", default=str(main.current_dir / "data"), help="내역서(.txt) 폴더")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP 서버 주소")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="HTTP 서버 포트")
+    parser.add_argument("--unix", help="HTTP 대신 이 경로의 유닉스 소켓으로 서비스")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="동시에 실행할 최대 질문 수")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="질문 하나의 기본 최대 실행 시간(초)")
+    parser.add_argument("--no-preload", action="store_true", help="시작할 때 코퍼스 적재와 데이터/인덱스 미리 올리기를 생략")
+    parser.add_argument("--json-log", help="노드/LLM 호출 계측 이벤트를 기록할 JSONL 파일 경로")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    main.build_agents(data_dir)
+    # 에이전트와 그래프는 처음 사용할 때 만들어지므로, 첫 요청이 기다리지 않도록 시작할 때 컴파일
+    main.get_app()
+    # /metrics로 노드/LLM 지표를 내보내기 위해 계측을 켬
+    instrumentation.enable(json_log=args.json_log)
+
+    service = QueryService(data_dir, args.concurrency, args.timeout)
+    if not args.no_preload:
+        stats = service.preload()
+        print(f"미리 올리기 완료: 파일 {stats['files']}개, {stats['rows']:,}행, {stats['seconds']:.2f}s")
+    server = create_server(service, args.host, args.port, args.unix)
+    print(f"질의 서버 시작: {'unix:' + args.unix if args.unix else f'http://{args.host}:{args.port}'} "
+          f"(동시 실행 {args.concurrency}개, 시간 제한 {args.timeout:g}초)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n질의 서버 종료")
+    finally:
+        server.server_close()
+        service.close()
+        instrumentation.close_sinks()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+if __name__ == "__main__":
+    main_cli()